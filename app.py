@@ -1,33 +1,146 @@
-import tkinter as tk
-from tkinter import scrolledtext, messagebox, filedialog
 import subprocess
 import os
+import sys
 import shlex
 import threading
+import queue
+import mmap
+import array
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import json
+import asyncio
+import socket
+import uuid
 import time
+import sqlite3
+import fnmatch
+import functools
+import hashlib
+import hmac
+import secrets
+import heapq
+import bisect
+import random
+import re
 import psutil
 import logging
-import pyttsx3
-import google.generativeai as genai
+import logging.handlers
 import platform
 from pathlib import Path
-import pyperclip
-from PIL import ImageGrab
 from datetime import datetime
 
 
 API_KEY = "<gemini_api>"      
 MODEL = "gemini-2.0-flash"
 LOGFILE = "assistant_actions.log"
+LOG_LEVEL = logging.INFO
+LOG_JSON = False
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 24 * 3600
+LOG_BACKUP_COUNT = 5
+LOG_TIMING_FIELDS = ("duration_ms", "queued_ms")
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+LLM_STREAMING = True
+LLM_BACKEND_URL = None
+LLM_HTTP_TIMEOUT = 60
+LLM_REQUESTS_PER_MINUTE = 15
+LLM_BURST = 3
+LLM_CONCURRENCY = 4
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_RECENT_SHARE = 0.6
+CONTEXT_SUMMARY_CHUNK = 8
+CONTEXT_MAX_SUMMARIES = 6
+CONTEXT_SUMMARY_CHARS = 600
+
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".desktop_assistant")
+LLM_CACHE_SIZE = 256
+LLM_CACHE_PERSIST = True
+LLM_CACHE_DB = os.path.join(APP_DATA_DIR, "llm_cache.db")
+LLM_CACHE_TTL = 24 * 3600
+LLM_CACHE_MAX_ENTRIES = 5000
+FILE_INDEX_DB = os.path.join(APP_DATA_DIR, "file_index.db")
+FILE_INDEX_ROOTS = [os.path.expanduser("~")]
+FILE_INDEX_REFRESH = 300
+SEARCH_EXCLUDES = [".git", "node_modules", "__pycache__", ".cache", ".desktop_assistant"]
+SEARCH_WORKERS = min(16, (os.cpu_count() or 2) * 2)
+GREP_MAX_FILE_BYTES = 32 * 1024**2
+GREP_MAX_MATCHES_PER_FILE = 5
+GREP_PROCESS_THRESHOLD = 2000
+GREP_BATCH_SIZE = 64
+DISK_USAGE_DB = os.path.join(APP_DATA_DIR, "disk_usage.db")
+DISK_USAGE_TOP = 10
+DISK_USAGE_PROGRESS_INTERVAL = 2.0
+DUPLICATES_DB = os.path.join(APP_DATA_DIR, "file_hashes.db")
+DUPLICATE_MIN_SIZE = 1
+DUPLICATE_BLOCK_SIZE = 64 * 1024
+DUPLICATE_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+DUPLICATE_MAX_LISTED = 100
+METRICS_INTERVAL = 1.0
+METRICS_MAX_OVERHEAD = 0.01
+SHELL_TIMEOUT = 600
+JOB_MAX_CONCURRENT = 4
+JOB_BUFFER_LINES = 500
+JOB_SPILL_DIR = os.path.join(APP_DATA_DIR, "jobs")
+PROCESS_PRIME_INTERVAL = 0.5
+PROCESS_MAX_SAMPLE_AGE = 10.0
+METRICS_HISTORY_FILE = os.path.join(APP_DATA_DIR, "metrics_history.bin")
+METRICS_HISTORY_RESOLUTIONS = [(1, 3600), (60, 24 * 60), (3600, 24 * 30)]
+METRICS_HISTORY_METRICS = ["cpu", "memory", "disk"]
+METRIC_ALIASES = {"mem": "memory", "ram": "memory"}
+MOUNT_INTERVAL = 10.0
+MOUNT_TIMEOUT = 2.0
+MOUNT_REFRESH_INTERVAL = 60.0
+PSEUDO_FILESYSTEMS = {"proc", "sysfs", "devtmpfs", "devpts", "tmpfs", "cgroup", "cgroup2", "debugfs",
+                      "tracefs", "securityfs", "pstore", "bpf", "mqueue", "hugetlbfs", "configfs",
+                      "fusectl", "autofs", "binfmt_misc", "squashfs", "nsfs", "rpc_pipefs", "efivarfs"}
+IO_DEVICE_EXCLUDES = r"(loop|ram|zram|fd|sr)\d+$|lo$"
+
+SCREENSHOT_DIR = os.path.join(os.path.expanduser("~"), "Screenshots")
+SCREENSHOT_FORMAT = "png"
+SCREENSHOT_LEVELS = {"png": 6, "jpeg": 85, "webp": 80}
+SCREENSHOT_REGION = (0, 0, 1024, 768)
+SCREENSHOT_HASH_SIZE = (64, 36)
+SCREENSHOT_MIN_CHANGED_BLOCKS = 3
+SCREENSHOT_MAX_FRAMES = 1000
+PROMPT_WORKERS = 4
+DAEMON_SOCKET = os.path.join(APP_DATA_DIR, "assistant.sock")
+DAEMON_PORT = 8766
+DAEMON_TOKEN_FILE = os.path.join(APP_DATA_DIR, "daemon.token")
+DAEMON_MAX_CONCURRENT = 8
+DAEMON_MAX_PENDING = 64
+DAEMON_MAX_LINE = 1024 * 1024
+BATCH_CONCURRENCY = 4
+UI_POLL_MS = 30
+UI_FRAME_BUDGET_MS = 12
+CHAT_MAX_LINES = 5000
+CHAT_HISTORY_LIMIT = 2000
+CHAT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), "ChatHistory")
+CHAT_DB = os.path.join(APP_DATA_DIR, "chat_history.db")
+CHAT_PAGE_SIZE = 200
+SPEECH_MAX_CHARS = 200
+PERF_SAMPLES = 1000
+PROFILE_DIR = os.path.join(APP_DATA_DIR, "profiles")
+PROFILE_TOP_FUNCTIONS = 15
 
 ALERT_THRESHOLDS = {
     "cpu": 80,
     "memory": 85,
-    "disk": 90
+    "disk": 90,
+    "disk_io": 200,
+    "net_io": 100
 }
+ALERT_HYSTERESIS = 5
+ALERT_SUSTAIN = 10
+ALERT_PROCESS_INTERVAL = 5.0
+HOST_ALERT_METRICS = ("cpu", "memory", "disk", "load", "disk_io", "net_io")
+DEVICE_ALERT_METRICS = ("disk", "disk_read", "disk_write", "disk_io", "net_recv", "net_sent", "net_io")
+ALERT_UNITS = {"disk_io": " MB/s", "net_io": " MB/s"}
+PROCESS_ALERT_METRICS = {"cpu": "cpu_percent", "memory": "memory_percent", "io": "io_rate"}
 
 THEME_CONFIG = {
     "dark": {
@@ -52,47 +165,923 @@ THEME_CONFIG = {
     }
 }
 
-genai.configure(api_key=API_KEY)
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL,
+                 backup_count=LOG_BACKUP_COUNT):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.interval = interval
+        # The start of the current period lives in a sidecar file, so restarts (and log writes,
+        # which move the file's mtime) never push the next time-based rotation back
+        self.stamp_path = self.baseFilename + ".rotated"
+        self.rollover_at = self._period_start() + interval
+
+    def _period_start(self):
+        try:
+            with open(self.stamp_path, encoding="utf-8") as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            return self._mark_period_start()
+
+    def _mark_period_start(self):
+        now = time.time()
+        try:
+            with open(self.stamp_path, "w", encoding="utf-8") as f:
+                f.write(repr(now))
+        except OSError:
+            pass
+        return now
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._mark_period_start() + self.interval
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock handler formats on the calling thread; keep msg/args intact so the
+    # listener does the formatting. Log arguments here are strings and numbers.
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class TextLogFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        duration = getattr(record, "duration_ms", None)
+        return line if duration is None else f"{line} [{duration:.1f} ms]"
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+            "queued_ms": round((time.time() - record.created) * 1000, 3),
+        }
+        for field in LOG_TIMING_FIELDS:
+            if field in record.__dict__:
+                entry[field] = record.__dict__[field]
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def setup_logging(logfile=LOGFILE, level=LOG_LEVEL, json_format=LOG_JSON):
+    handler = RotatingLogHandler(logfile)
+    handler.setFormatter(JsonLogFormatter() if json_format else TextLogFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    listener.start()
+    return listener
+
+class PerfSpan:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.record(self.name, time.perf_counter() - self.started, failed=exc_type is not None)
+        return False
+
+class PerfRecorder:
+    def __init__(self, samples=PERF_SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}
+            self.counts = {}
+            self.errors = {}
+            self.totals = {}
+
+    def span(self, name):
+        return PerfSpan(self, name)
+
+    def record(self, name, seconds, failed=False):
+        with self.lock:
+            if name not in self.latencies:
+                self.latencies[name] = deque(maxlen=self.samples)
+                self.counts[name] = self.errors[name] = 0
+                self.totals[name] = 0.0
+            self.latencies[name].append(seconds)
+            self.counts[name] += 1
+            self.totals[name] += seconds
+            if failed:
+                self.errors[name] += 1
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        with self.lock:
+            samples = sorted(self.latencies.get(name, ()))
+        if not samples:
+            return {}
+        return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] for p in points}
+
+    def report(self):
+        with self.lock:
+            names = sorted(self.latencies, key=lambda n: self.totals[n], reverse=True)
+        if not names:
+            return "No timings recorded yet"
+        lines = [f"{'span':<28} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'total s':>8}"]
+        for name in names:
+            pct = self.percentiles(name)
+            lines.append(f"{name:<28} {self.counts[name]:6d} {self.errors[name]:4d} "
+                         f"{pct[50] * 1000:9.1f} {pct[95] * 1000:9.1f} {pct[99] * 1000:9.1f} "
+                         f"{self.totals[name]:8.2f}")
+        lines.append(f"(percentiles over the last {self.samples} samples per span)")
+        return "\n".join(lines)
+
+perf = PerfRecorder()
+
+def perf_timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with perf.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class CommandProfiler:
+    def __init__(self, profile_dir=PROFILE_DIR):
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.remaining = 0
+        self.stats = None
+        self.on_done = None
+
+    def arm(self, commands, on_done=None):
+        with self.lock:
+            self.remaining = commands
+            self.stats = None
+            self.on_done = on_done
+        return f"Profiling the next {commands} commands"
+
+    def run(self, fn, *args):
+        with self.lock:
+            armed = self.remaining > 0
+        if not armed:
+            return fn(*args)
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another command is already being profiled on a different thread
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profiler.disable()
+            self._collect(profiler)
+
+    def _collect(self, profiler):
+        import pstats
+        with self.lock:
+            if self.remaining <= 0:
+                return
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.remaining -= 1
+            if self.remaining:
+                return
+            stats, on_done, self.stats = self.stats, self.on_done, None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+        stats.dump_stats(path)
+        logging.info("Command profile written: %s", path)
+        if on_done:
+            on_done(f"Profile written to {path}\n\n{self.summary(stats)}")
+
+    def summary(self, stats, limit=PROFILE_TOP_FUNCTIONS):
+        import io
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats("cumulative").print_stats(limit)
+        return "\n".join(line for line in buffer.getvalue().splitlines() if line.strip())
+
+command_profiler = CommandProfiler()
+
+def split_sentences(text):
+    parts = re.split(r"(?<=[.!?])\s+", text)
+    return [p for p in parts[:-1] if p.strip()], parts[-1]
+
+def chunk_for_speech(sentence, max_chars=SPEECH_MAX_CHARS):
+    chunks = []
+    while len(sentence) > max_chars:
+        # Prefer breaking after a comma; fall back to the last space in the window
+        cut = sentence.rfind(", ", 0, max_chars)
+        if cut <= 0:
+            cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        chunks.append(sentence[:cut + 1].strip())
+        sentence = sentence[cut + 1:]
+    if sentence.strip():
+        chunks.append(sentence.strip())
+    return chunks
+
+def create_tts_engine():
+    import pyttsx3
+    return pyttsx3.init()
+
+class SpeechWorker:
+    def __init__(self, engine_factory=create_tts_engine):
+        self.engine_factory = engine_factory
+        self.engine = None
+        self.queue = queue.Queue()
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.thread = None
+        self.speaking = False
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.cancel()
+        self.queue.put((None, None))
+
+    def _run(self):
+        try:
+            self.engine = self.engine_factory()
+        except Exception:
+            logging.exception("Text-to-speech engine unavailable")
+            return
+        while True:
+            generation, text = self.queue.get()
+            if text is None:
+                return
+            if generation != self.generation:
+                continue
+            self.speaking = True
+            try:
+                with perf.span("tts:utterance"):
+                    self.engine.say(text)
+                    self.engine.runAndWait()
+            except Exception:
+                logging.exception("Speech failed")
+            finally:
+                self.speaking = False
+
+    def enqueue(self, sentence, generation=None):
+        self.start()
+        for chunk in chunk_for_speech(sentence):
+            self.queue.put((self.generation if generation is None else generation, chunk))
+
+    def say(self, text):
+        sentences, rest = split_sentences(text.strip())
+        generation = self.generation
+        for sentence in sentences + [rest]:
+            self.enqueue(sentence, generation)
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.speaking and self.engine is not None:
+            try:
+                self.engine.stop()
+            except Exception:
+                pass
 
+    def stream(self):
+        return SpeechStream(self)
 
-logging.basicConfig(filename=LOGFILE, level=logging.INFO,
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+class SpeechStream:
+    def __init__(self, worker):
+        self.worker = worker
+        self.generation = worker.generation
+        self.buffer = ""
+
+    def feed(self, chunk):
+        sentences, self.buffer = split_sentences(self.buffer + chunk)
+        for sentence in sentences:
+            self.worker.enqueue(sentence, self.generation)
+
+    def close(self):
+        if self.buffer.strip():
+            self.worker.enqueue(self.buffer, self.generation)
+        self.buffer = ""
+
+speech_worker = SpeechWorker()
 
-tts_engine = pyttsx3.init()
 def speak(text):
-    try:
-        tts_engine.say(text)
-        tts_engine.runAndWait()
-    except Exception:
-        pass
-def call_llm(prompt):
-    for attempt in range(MAX_RETRIES):
+    speech_worker.say(text)
+
+def stop_speaking():
+    speech_worker.cancel()
+class GeminiBackend:
+    def __init__(self, model=MODEL):
+        self.model = model
+        self.client = None
+        self.lock = threading.Lock()
+
+    def _client(self):
+        with self.lock:
+            if self.client is None:
+                import google.generativeai as genai
+                genai.configure(api_key=API_KEY)
+                self.client = genai.GenerativeModel(self.model)
+            return self.client
+
+    def warm_up(self):
+        self._client()
+
+    def generate(self, prompt):
+        response = self._client().generate_content(prompt)
+        return response.text if response.text else "[No response from Gemini]"
+
+    def stream(self, prompt):
+        for chunk in self._client().generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+class HTTPBackend:
+    def __init__(self, url, model="local", timeout=LLM_HTTP_TIMEOUT):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+
+    def _post(self, prompt, stream):
+        import urllib.request
+        body = json.dumps({"model": self.model, "prompt": prompt, "stream": stream}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def generate(self, prompt):
+        with self._post(prompt, False) as response:
+            text = json.loads(response.read().decode("utf-8")).get("text", "")
+        return text or "[No response from Gemini]"
+
+    def stream(self, prompt):
+        with self._post(prompt, True) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                message = json.loads(line.decode("utf-8"))
+                if message.get("text"):
+                    yield message["text"]
+                if message.get("done"):
+                    return
+        raise ConnectionError("model server closed the stream before it finished")
+
+llm_backend = HTTPBackend(LLM_BACKEND_URL) if LLM_BACKEND_URL else GeminiBackend()
+
+def set_llm_backend(backend):
+    global llm_backend
+    llm_backend = backend
+
+class LLMStreamInterrupted(Exception):
+    def __init__(self, partial, cause):
+        super().__init__(str(cause))
+        self.partial = partial
+
+def is_rate_limit_error(error_msg):
+    return "429" in error_msg or "Resource exhausted" in error_msg
+
+def retry_hint(error):
+    headers = getattr(error, "headers", None)
+    if headers is not None and headers.get("Retry-After"):
         try:
-            model = genai.GenerativeModel(MODEL)
-            response = model.generate_content(prompt)
-            text = response.text if response.text else "[No response from Gemini]"
-            return text
-        except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg or "Resource exhausted" in error_msg:
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)
-                    logging.warning(f"Rate limited. Retrying in {wait_time}s... (Attempt {attempt + 1}/{MAX_RETRIES})")
-                    time.sleep(wait_time)
+            return float(headers.get("Retry-After"))
+        except ValueError:
+            pass
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1) or match.group(2))
+    return None
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def refund(self):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+class LLMScheduler:
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, burst=LLM_BURST,
+                 workers=LLM_CONCURRENCY, max_attempts=MAX_RETRIES, base_delay=RETRY_DELAY):
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.heap = []
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.threads = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttle_wait = 0.0
+        self.waits = deque(maxlen=500)
+
+    def _ensure_workers(self):
+        while len(self.threads) < self.workers:
+            t = threading.Thread(target=self._worker, daemon=True)
+            self.threads.append(t)
+            t.start()
+
+    def submit(self, fn, priority=PRIORITY_INTERACTIVE):
+        future = Future()
+        with self.cond:
+            self._ensure_workers()
+            heapq.heappush(self.heap, (priority, self.seq, time.monotonic(), 0, fn, future))
+            self.seq += 1
+            self.cond.notify()
+        return future
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.heap:
+                    self.cond.wait()
+            throttled = self.bucket.acquire()
+            with self.cond:
+                if not self.heap:
+                    self.bucket.refund()
                     continue
+                priority, seq, queued, attempt, fn, future = heapq.heappop(self.heap)
+                self.running += 1
+                self.throttle_wait += throttled
+                if attempt == 0:
+                    self.waits.append(time.monotonic() - queued)
+            try:
+                if attempt > 0 or future.set_running_or_notify_cancel():
+                    self._run(priority, seq, queued, attempt, fn, future)
+            finally:
+                with self.cond:
+                    self.running -= 1
+
+    def _run(self, priority, seq, queued, attempt, fn, future):
+        try:
+            result = fn()
+        except Exception as e:
+            if (is_rate_limit_error(str(e)) and not isinstance(e, LLMStreamInterrupted)
+                    and attempt < self.max_attempts - 1):
+                hint = retry_hint(e)
+                if hint is not None:
+                    delay = hint + random.uniform(0, 1)
                 else:
-                    logging.error("Max retries reached for rate limiting")
-                    return "[LLM error] API rate limit exceeded. Please try again in a moment."
+                    delay = random.uniform(self.base_delay, self.base_delay * (2 ** (attempt + 1)))
+                logging.warning("Rate limited. Retrying in %.1fs... (Attempt %d/%d)", delay, attempt + 1, self.max_attempts)
+                self.bucket.pause(delay)
+                with self.cond:
+                    self.retries += 1
+                    heapq.heappush(self.heap, (priority, seq, queued, attempt + 1, fn, future))
+                    self.cond.notify()
+                return
+            with self.cond:
+                self.failed += 1
+            future.set_exception(e)
+            return
+        with self.cond:
+            self.completed += 1
+        future.set_result(result)
+
+    def stats(self):
+        with self.cond:
+            depth = len(self.heap)
+            interactive = sum(1 for job in self.heap if job[0] <= PRIORITY_INTERACTIVE)
+            waits = sorted(self.waits)
+            avg_wait = sum(waits) / len(waits) if waits else 0.0
+            p95_wait = waits[int(len(waits) * 0.95)] if waits else 0.0
+            return (f"LLM scheduler: {self.running} running, {depth} queued ({interactive} interactive)\n"
+                    f"Completed: {self.completed}, failed: {self.failed}, rate-limit retries: {self.retries}\n"
+                    f"Queue wait: avg {avg_wait:.2f}s, p95 {p95_wait:.2f}s over last {len(waits)} requests\n"
+                    f"Token bucket: {self.bucket.rate * 60:g}/min, burst {self.bucket.capacity}, "
+                    f"total throttle wait {self.throttle_wait:.1f}s")
+
+llm_scheduler = LLMScheduler()
+
+@perf_timed("llm:round_trip")
+def call_llm_uncached(prompt, priority=PRIORITY_INTERACTIVE):
+    try:
+        return llm_scheduler.submit(lambda: llm_backend.generate(prompt), priority).result()
+    except Exception as e:
+        error_msg = str(e)
+        if is_rate_limit_error(error_msg):
+            logging.error("Max retries reached for rate limiting")
+            return "[LLM error] API rate limit exceeded. Please try again in a moment."
+        logging.exception("LLM call failed")
+        return f"[LLM error] {error_msg}"
+
+@perf_timed("llm:stream")
+def stream_llm_uncached(prompt, on_chunk, priority=PRIORITY_INTERACTIVE):
+    def attempt():
+        parts = []
+        try:
+            for chunk in llm_backend.stream(prompt):
+                parts.append(chunk)
+                on_chunk(chunk)
+        except Exception as e:
+            if parts:
+                logging.warning("LLM stream interrupted after %d chunks: %s", len(parts), e)
+                raise LLMStreamInterrupted("".join(parts), e)
+            raise
+        return "".join(parts) or "[No response from Gemini]"
+
+    try:
+        return llm_scheduler.submit(attempt, priority).result()
+    except LLMStreamInterrupted:
+        raise
+    except Exception as e:
+        error_msg = str(e)
+        if is_rate_limit_error(error_msg):
+            logging.error("Max retries reached for rate limiting")
+            return "[LLM error] API rate limit exceeded. Please try again in a moment."
+        logging.exception("LLM stream failed")
+        return f"[LLM error] {error_msg}"
+
+def is_llm_error(text):
+    return text.startswith("[LLM error]") or text == "[No response from Gemini]"
+
+class LLMCache:
+    def __init__(self, capacity=LLM_CACHE_SIZE, db_path=LLM_CACHE_DB if LLM_CACHE_PERSIST else None,
+                 ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.capacity = capacity
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.conn = None
+        self.writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    @staticmethod
+    def make_key(prompt, model):
+        normalized = " ".join(prompt.split()).casefold()
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL,
+                created REAL NOT NULL, accessed REAL NOT NULL)""")
+        return self.conn
+
+    def _load(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self.db_lock:
+                conn = self._connect()
+                row = conn.execute("SELECT response, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] + self.ttl < time.time():
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                return row[0]
+        except sqlite3.Error:
+            logging.exception("LLM cache read failed")
+            return None
+
+    def _store(self, key, model, text):
+        if not self.db_path:
+            return
+        try:
+            with self.db_lock:
+                conn = self._connect()
+                now = time.time()
+                conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)", (key, model, text, now, now))
+                self.writes += 1
+                if self.writes % 50 == 0:
+                    conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,))
+                    conn.execute("""DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+                conn.commit()
+        except sqlite3.Error:
+            logging.exception("LLM cache write failed")
+
+    def _remember(self, key, text):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, text)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, prompt, model, compute):
+        key = self.make_key(prompt, model)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            waiter = self.inflight.get(key)
+            if waiter is None:
+                future = self.inflight[key] = Future()
             else:
-                logging.exception("LLM call failed")
-                return f"[LLM error] {error_msg}"
-    
-    return "[LLM error] Failed to get response from Gemini API"
+                self.shared += 1
+        if waiter is not None:
+            return waiter.result()
+        try:
+            text = self._load(key)
+            if text is not None:
+                with self.lock:
+                    self.disk_hits += 1
+            else:
+                with self.lock:
+                    self.misses += 1
+                text = compute()
+                if not is_llm_error(text):
+                    self._store(key, model, text)
+            if not is_llm_error(text):
+                self._remember(key, text)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.db_path:
+            with self.db_lock:
+                self._connect().execute("DELETE FROM llm_cache")
+                self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses + self.shared
+            hit_rate = (self.hits + self.disk_hits + self.shared) / lookups * 100 if lookups else 0.0
+            return (f"LLM cache: {len(self.entries)}/{self.capacity} in memory, "
+                    f"persistent store {'on' if self.db_path else 'off'}\n"
+                    f"Hits: {self.hits} memory, {self.disk_hits} disk, {self.shared} shared in-flight\n"
+                    f"Misses: {self.misses}\n"
+                    f"Hit rate: {hit_rate:.1f}%")
+
+llm_cache = LLMCache()
+
+def call_llm(prompt, use_cache=True, priority=PRIORITY_INTERACTIVE):
+    if not use_cache:
+        return call_llm_uncached(prompt, priority)
+    return llm_cache.get_or_compute(prompt, llm_backend.model, lambda: call_llm_uncached(prompt, priority))
+
+def call_llm_stream(prompt, on_chunk, use_cache=True, priority=PRIORITY_INTERACTIVE):
+    emitted = []
+
+    def forward(chunk):
+        emitted.append(True)
+        on_chunk(chunk)
+
+    def compute():
+        return stream_llm_uncached(prompt, forward, priority)
+
+    try:
+        if use_cache:
+            text = llm_cache.get_or_compute(prompt, llm_backend.model, compute)
+        else:
+            text = compute()
+    except LLMStreamInterrupted as e:
+        notice = f"\n[Reply interrupted: {e}]"
+        if not emitted:
+            on_chunk(e.partial)
+        on_chunk(notice)
+        return e.partial + notice
+    if not emitted:
+        on_chunk(text)
+    return text
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def summarize_with_llm(text):
+    prompt = ("Summarize this excerpt of a conversation between a user and a desktop assistant in at most "
+              "three sentences. Keep names, file paths, numbers and decisions.\n\n" + text)
+    summary = call_llm(prompt, priority=PRIORITY_BACKGROUND)
+    return None if is_llm_error(summary) else summary.strip()
+
+class ConversationContext:
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summarizer=summarize_with_llm, background=True):
+        self.budget = budget
+        self.summarizer = summarizer
+        self.executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self.turns = deque()
+        self.turn_tokens = 0
+        self.summaries = deque()
+        self.next_summary = 0
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.build_time = 0.0
+        self.max_build_time = 0.0
+        self.prompt_tokens = deque(maxlen=200)
+        self.summaries_made = 0
+
+    def reset(self):
+        with self.lock:
+            self.turns.clear()
+            self.summaries.clear()
+            self.turn_tokens = 0
+
+    def add(self, role, text):
+        with self.lock:
+            tokens = estimate_tokens(text)
+            self.turns.append((role, text, tokens))
+            self.turn_tokens += tokens
+            recent_budget = self.budget * CONTEXT_RECENT_SHARE
+            while len(self.turns) > CONTEXT_SUMMARY_CHUNK and self.turn_tokens > recent_budget:
+                chunk = [self.turns.popleft() for _ in range(CONTEXT_SUMMARY_CHUNK)]
+                self.turn_tokens -= sum(t[2] for t in chunk)
+                self._fold("\n".join(f"{role}: {text}" for role, text, _ in chunk))
+            while len(self.summaries) > CONTEXT_MAX_SUMMARIES:
+                first = self.summaries.popleft()
+                second = self.summaries.popleft()
+                self._fold(first["text"] + "\n" + second["text"], front=True)
+
+    def _fold(self, text, front=False):
+        # Keep a truncated excerpt until the real summary arrives
+        excerpt = text if len(text) <= CONTEXT_SUMMARY_CHARS else text[:CONTEXT_SUMMARY_CHARS] + "..."
+        summary = {"id": self.next_summary, "text": excerpt, "tokens": estimate_tokens(excerpt)}
+        self.next_summary += 1
+        if front:
+            self.summaries.appendleft(summary)
+        else:
+            self.summaries.append(summary)
+        if self.executor is not None:
+            self.executor.submit(self._summarize, summary["id"], text)
+        else:
+            self._summarize(summary["id"], text, locked=True)
+
+    def _summarize(self, summary_id, text, locked=False):
+        try:
+            result = self.summarizer(text)
+        except Exception:
+            logging.exception("Conversation summary failed")
+            return
+        if not result:
+            return
+        if not locked:
+            self.lock.acquire()
+        try:
+            for summary in self.summaries:
+                if summary["id"] == summary_id:
+                    summary["text"] = result
+                    summary["tokens"] = estimate_tokens(result)
+                    self.summaries_made += 1
+                    break
+        finally:
+            if not locked:
+                self.lock.release()
+
+    def build(self, prompt):
+        started = time.perf_counter()
+        with self.lock:
+            remaining = self.budget - estimate_tokens(prompt)
+            recent = []
+            for role, text, tokens in reversed(self.turns):
+                if tokens > remaining:
+                    break
+                recent.append(f"{role}: {text}")
+                remaining -= tokens
+            recent.reverse()
+            summaries = []
+            for summary in reversed(self.summaries):
+                if summary["tokens"] > remaining:
+                    break
+                summaries.append(summary["text"])
+                remaining -= summary["tokens"]
+            summaries.reverse()
+        if not recent and not summaries:
+            full = prompt
+        else:
+            parts = []
+            if summaries:
+                parts.append("Summary of earlier conversation:\n" + "\n".join(f"- {s}" for s in summaries))
+            if recent:
+                parts.append("Recent conversation:\n" + "\n".join(recent))
+            parts.append(f"you: {prompt}")
+            full = "\n\n".join(parts)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.builds += 1
+            self.build_time += elapsed
+            self.max_build_time = max(self.max_build_time, elapsed)
+            self.prompt_tokens.append(estimate_tokens(full))
+        return full
+
+    def stats(self):
+        with self.lock:
+            sizes = list(self.prompt_tokens)
+            avg_build = self.build_time / self.builds * 1000 if self.builds else 0.0
+            return (f"Conversation context: {len(self.turns)} recent turns ({self.turn_tokens} tokens), "
+                    f"{len(self.summaries)} summaries, budget {self.budget} tokens\n"
+                    f"Prompt size: last {sizes[-1] if sizes else 0}, avg {sum(sizes) // len(sizes) if sizes else 0}, "
+                    f"max {max(sizes) if sizes else 0} tokens\n"
+                    f"Build latency: avg {avg_build:.3f} ms, max {self.max_build_time * 1000:.3f} ms over {self.builds} requests\n"
+                    f"LLM summaries completed: {self.summaries_made}")
+
+# tkinter is loaded only for the GUI, so --daemon and --batch run on machines without Tk
+tk = scrolledtext = messagebox = filedialog = None
+
+def load_tk():
+    global tk, scrolledtext, messagebox, filedialog
+    import tkinter
+    import tkinter.simpledialog
+    from tkinter import scrolledtext, messagebox, filedialog
+    tk = tkinter
+
+def ask_user_confirmation(action_desc):
+    load_tk()
+    return messagebox.askyesno("Confirm action", f"Allow this action?\n\n{action_desc}")
+
+confirm_policy = ask_user_confirmation
+
+def set_confirm_policy(policy):
+    global confirm_policy
+    confirm_policy = policy
+
+def make_confirm_policy(mode="deny", allow=()):
+    if mode == "ask":
+        return ask_user_confirmation
+    if mode == "allow":
+        return lambda action_desc: True
+    if mode != "deny":
+        raise ValueError(f"Unknown confirm policy: {mode}")
+    patterns = tuple(allow)
+    return lambda action_desc: any(fnmatch.fnmatch(action_desc, p) for p in patterns)
+
 def confirm_and_run(action_desc, fn, *args, **kwargs):
-    if not messagebox.askyesno("Confirm action", f"Allow this action?\n\n{action_desc}"):
-        logging.info(f"User denied action: {action_desc}")
+    if not confirm_policy(action_desc):
+        logging.info("User denied action: %s", action_desc)
         return "Action cancelled by user."
-    logging.info(f"User approved action: {action_desc}")
+    logging.info("User approved action: %s", action_desc)
     try:
         result = fn(*args, **kwargs)
         return result
@@ -108,22 +1097,283 @@ def open_application(path_or_command):
             subprocess.Popen(shlex.split(path_or_command), shell=True)
     return confirm_and_run(f"Open app/command: {path_or_command}", _open)
 
-def list_top_processes(n=10):
-    procs = []
-    for p in psutil.process_iter(['pid','name','cpu_percent','memory_percent']):
-        try:
-            procs.append(p.info)
-        except Exception:
-            pass
-    procs = sorted(procs, key=lambda x: x.get('cpu_percent',0), reverse=True)
-    out = "\n".join([f"{i+1}. {p['name']} (pid={p['pid']}) CPU%={p['cpu_percent']} MEM%={round(p['memory_percent'],2)}" for i,p in enumerate(procs[:n])])
+class ProcessTable:
+    SORT_KEYS = {"cpu": "cpu_percent", "memory": "memory_percent", "io": "io_rate"}
+
+    def __init__(self):
+        self.entries = {}
+        self.refreshed_at = 0.0
+        self.refreshed_io = False
+        self.viewed = None
+        self.lock = threading.Lock()
+        self.has_io = hasattr(psutil.Process, "io_counters")
+
+    def refresh(self, with_io=False):
+        attrs = ['pid', 'name', 'cpu_times', 'memory_percent', 'create_time']
+        if with_io and self.has_io:
+            attrs.append('io_counters')
+        now = time.monotonic()
+        entries = {}
+        for p in psutil.process_iter(attrs):
+            info = p.info
+            times = info.get('cpu_times')
+            io = info.get('io_counters')
+            entry = {
+                "pid": info['pid'],
+                "name": info.get('name') or "?",
+                "create_time": info.get('create_time'),
+                "memory_percent": info.get('memory_percent') or 0.0,
+                "cpu_total": times.user + times.system if times else None,
+                "io_total": io.read_bytes + io.write_bytes if io else None,
+                "cpu_percent": None,
+                "io_rate": None,
+            }
+            prev = self.entries.get(entry["pid"])
+            if prev is not None and prev["create_time"] == entry["create_time"]:
+                elapsed = now - self.refreshed_at
+                if elapsed > 0 and entry["cpu_total"] is not None and prev["cpu_total"] is not None:
+                    entry["cpu_percent"] = max(0.0, (entry["cpu_total"] - prev["cpu_total"]) / elapsed * 100)
+                if elapsed > 0 and entry["io_total"] is not None and prev["io_total"] is not None:
+                    entry["io_rate"] = max(0.0, (entry["io_total"] - prev["io_total"]) / elapsed)
+            entries[entry["pid"]] = entry
+        self.entries = entries
+        self.refreshed_at = now
+        self.refreshed_io = 'io_counters' in attrs
+
+    def top(self, n=10, sort_by="cpu"):
+        key = self.SORT_KEYS.get(sort_by, "cpu_percent")
+        with_io = sort_by == "io"
+        with self.lock:
+            stale = time.monotonic() - self.refreshed_at > PROCESS_MAX_SAMPLE_AGE
+            primed = stale or (with_io and self.has_io and not self.refreshed_io)
+            if primed:
+                self.refresh(with_io)
+        if primed:
+            # Wait for the deltas outside the lock so other readers of the table are not held up
+            time.sleep(PROCESS_PRIME_INTERVAL)
+        with self.lock:
+            self.refresh(with_io)
+            top = heapq.nlargest(n, self.entries.values(), key=lambda e: e[key] or 0.0)
+            current = {(pid, e["create_time"]): e["name"] for pid, e in self.entries.items()}
+            if self.viewed is None:
+                started, exited = [], []
+            else:
+                started = [(pid, name) for (pid, ct), name in current.items() if (pid, ct) not in self.viewed]
+                exited = [(pid, name) for (pid, ct), name in self.viewed.items() if (pid, ct) not in current]
+            self.viewed = current
+            return top, started, exited, len(self.entries)
+
+    def current(self, max_age, with_io=False):
+        with self.lock:
+            if time.monotonic() - self.refreshed_at > max_age or (with_io and not self.refreshed_io):
+                self.refresh(with_io)
+            return list(self.entries.values())
+
+process_table = ProcessTable()
+
+def _format_process_changes(label, procs, limit=10):
+    names = ", ".join(f"{name} ({pid})" for pid, name in procs[:limit])
+    more = f" and {len(procs) - limit} more" if len(procs) > limit else ""
+    return f"{label} since last view ({len(procs)}): {names}{more}"
+
+@perf_timed("psutil:processes")
+def list_top_processes(n=10, sort_by="cpu"):
+    top, started, exited, total = process_table.top(n, sort_by)
+    lines = []
+    for i, p in enumerate(top):
+        cpu = f"{p['cpu_percent']:.1f}" if p['cpu_percent'] is not None else "n/a"
+        line = f"{i+1}. {p['name']} (pid={p['pid']}) CPU%={cpu} MEM%={round(p['memory_percent'],2)}"
+        if sort_by == "io":
+            io = f"{p['io_rate'] / 1024**2:.2f} MB/s" if p['io_rate'] is not None else "n/a"
+            line += f" IO={io}"
+        lines.append(line)
+    out = f"Top {len(top)} of {total} processes by {sort_by}:\n" + "\n".join(lines)
+    if started:
+        out += "\n\n" + _format_process_changes("Started", started)
+    if exited:
+        out += "\n" + ("" if started else "\n") + _format_process_changes("Exited", exited)
     logging.info("Listed processes")
     return out
 
-def run_shell_command(cmd):
+def kill_process_tree(pid):
+    try:
+        parent = psutil.Process(pid)
+        procs = parent.children(recursive=True) + [parent]
+    except psutil.Error:
+        return
+    for p in procs:
+        try:
+            p.kill()
+        except psutil.Error:
+            pass
+
+class ShellJob:
+    def __init__(self, job_id, cmd, timeout, buffer_lines=JOB_BUFFER_LINES, spill_dir=JOB_SPILL_DIR):
+        self.id = job_id
+        self.cmd = cmd
+        self.timeout = timeout
+        self.status = "queued"
+        self.returncode = None
+        self.started = None
+        self.ended = None
+        self.lines = deque()
+        self.buffer_lines = buffer_lines
+        self.spill_dir = spill_dir
+        self.spill_path = None
+        self.spill_file = None
+        self.spilled = 0
+        self.total_lines = 0
+        self.process = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def add_line(self, line):
+        with self.lock:
+            self.lines.append(line)
+            self.total_lines += 1
+            if len(self.lines) > self.buffer_lines:
+                if self.spill_file is None:
+                    os.makedirs(self.spill_dir, exist_ok=True)
+                    self.spill_path = os.path.join(self.spill_dir, f"job_{self.id}_{datetime.now():%Y%m%d_%H%M%S}.log")
+                    self.spill_file = open(self.spill_path, "w", encoding="utf-8")
+                self.spill_file.write(self.lines.popleft() + "\n")
+                self.spilled += 1
+
+    def close(self):
+        with self.lock:
+            if self.spill_file is not None:
+                self.spill_file.close()
+                self.spill_file = None
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.time()) - self.started
+
+    def summary(self):
+        text = f"Job #{self.id} {self.status}"
+        if self.returncode is not None:
+            text += f" (return code {self.returncode})"
+        text += f" after {self.elapsed():.1f}s, {self.total_lines} lines of output: {self.cmd}"
+        if self.spill_path:
+            text += f"\nFull output ({self.spilled} earlier lines spilled): {self.spill_path}"
+        return text
+
+    def result_text(self):
+        with self.lock:
+            output = "\n".join(self.lines)
+        text = f"Return code: {self.returncode}\n\nOUTPUT:\n{output}"
+        if self.spill_path:
+            text += f"\n\n({self.spilled} earlier lines written to {self.spill_path})"
+        if self.status in ("cancelled", "timed out"):
+            text += f"\n\nJob {self.status}."
+        return text
+
+class JobRunner:
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, spill_dir=JOB_SPILL_DIR):
+        self.slots = threading.Semaphore(max_concurrent)
+        self.spill_dir = spill_dir
+        self.jobs = OrderedDict()
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def submit(self, cmd, on_output=None, on_done=None, timeout=SHELL_TIMEOUT):
+        with self.lock:
+            job = ShellJob(self.next_id, cmd, timeout, spill_dir=self.spill_dir)
+            self.jobs[job.id] = job
+            self.next_id += 1
+            while len(self.jobs) > 50:
+                oldest = next(iter(self.jobs.values()))
+                if not oldest.done.is_set():
+                    break
+                self.jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, on_output, on_done), daemon=True).start()
+        return job
+
+    def _run(self, job, on_output, on_done):
+        timer = None
+        try:
+            with self.slots:
+                if job.cancelled.is_set():
+                    job.status = "cancelled"
+                    return
+                job.started = time.time()
+                job.status = "running"
+                job.process = subprocess.Popen(job.cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                               stdin=subprocess.DEVNULL, text=True, errors="replace", bufsize=1)
+                if job.timeout:
+                    timer = threading.Timer(job.timeout, self._expire, args=(job,))
+                    timer.daemon = True
+                    timer.start()
+                for line in job.process.stdout:
+                    line = line.rstrip("\r\n")
+                    job.add_line(line)
+                    if on_output:
+                        on_output(job, line)
+                job.returncode = job.process.wait()
+                if job.status == "running":
+                    job.status = "finished" if job.returncode == 0 else "failed"
+        except Exception as e:
+            logging.exception("Shell job %d failed", job.id)
+            job.status = "failed"
+            job.add_line(f"Action error: {e}")
+        finally:
+            if timer is not None:
+                timer.cancel()
+            job.ended = time.time()
+            job.close()
+            job.done.set()
+            logging.info("Shell job %d %s: %s", job.id, job.status, job.cmd,
+                         extra={"duration_ms": (job.ended - (job.started or job.ended)) * 1000})
+            if on_done:
+                on_done(job)
+
+    def _expire(self, job):
+        if job.status == "running":
+            job.status = "timed out"
+            kill_process_tree(job.process.pid)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return f"No such job: {job_id}"
+        if job.done.is_set():
+            return f"Job #{job_id} already {job.status}"
+        job.cancelled.set()
+        if job.process is not None:
+            job.status = "cancelled"
+            kill_process_tree(job.process.pid)
+        return f"Cancelling job #{job_id}"
+
+    def describe(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        if not jobs:
+            return "No shell jobs"
+        return "Shell jobs:\n" + "\n".join(
+            f"#{job.id} [{job.status}] {job.elapsed():.1f}s, {job.total_lines} lines: {job.cmd}" for job in jobs)
+
+    def tail(self, job_id, n=20):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return f"No such job: {job_id}"
+        with job.lock:
+            lines = list(job.lines)[-n:]
+        return job.summary() + "\n\n" + "\n".join(lines)
+
+job_runner = JobRunner()
+
+def run_shell_command(cmd, on_output=None, on_done=None, timeout=SHELL_TIMEOUT):
     def _run():
-        completed = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
-        return f"Return code: {completed.returncode}\n\nSTDOUT:\n{completed.stdout}\n\nSTDERR:\n{completed.stderr}"
+        job = job_runner.submit(cmd, on_output=on_output, on_done=on_done, timeout=timeout)
+        if on_output is not None:
+            return f"Started job #{job.id}: {cmd}\n(type 'jobs' to list, 'kill job {job.id}' to cancel)"
+        job.wait()
+        return job.result_text()
     return confirm_and_run(f"Run shell command: {cmd}", _run)
 
 def delete_path(path):
@@ -139,12 +1389,417 @@ def delete_path(path):
             return "Path not found."
     return confirm_and_run(f"Delete path: {path}", _delete)
 
+class DeviceMonitor:
+    def __init__(self, interval=MOUNT_INTERVAL, timeout=MOUNT_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.partitions = []
+        self.partitions_at = None
+        self.mounts_at = None
+        self.pending = {}
+        self.usage = {}
+        self.io_prev = None
+
+    def _refresh_partitions(self, now):
+        seen = set()
+        partitions = []
+        for part in psutil.disk_partitions(all=True):
+            if part.fstype in PSEUDO_FILESYSTEMS or not part.fstype or "cdrom" in part.opts:
+                continue
+            # Bind mounts repeat the same block device; report it once, at its first mountpoint.
+            # Network shares can mount one export at several places with different contents, so keep them all
+            if part.device in seen and part.device.startswith("/dev/"):
+                continue
+            seen.add(part.device)
+            partitions.append(part.mountpoint)
+        self.partitions = partitions
+        self.partitions_at = now
+        with self.lock:
+            self.usage = {mp: u for mp, u in self.usage.items() if mp in partitions}
+
+    def _query(self, mountpoint, done):
+        try:
+            usage = psutil.disk_usage(mountpoint)
+        except Exception:
+            usage = None
+        with self.lock:
+            self.pending.pop(mountpoint, None)
+            if usage is None:
+                self.usage.pop(mountpoint, None)
+            else:
+                self.usage[mountpoint] = usage
+        done.release()
+
+    def mounts(self):
+        now = time.monotonic()
+        if self.mounts_at is None or now - self.mounts_at >= self.interval:
+            first = self.mounts_at is None
+            self.mounts_at = now
+            if self.partitions_at is None or now - self.partitions_at >= MOUNT_REFRESH_INTERVAL:
+                self._refresh_partitions(now)
+            done = threading.Semaphore(0)
+            started = 0
+            for mountpoint in self.partitions:
+                with self.lock:
+                    # A mount whose last statfs never returned is not asked again until it does
+                    if mountpoint in self.pending:
+                        continue
+                    self.pending[mountpoint] = now
+                # Daemon threads, not a pool: a statfs stuck on a dead network mount must not block exit
+                threading.Thread(target=self._query, args=(mountpoint, done), daemon=True).start()
+                started += 1
+            if first:
+                deadline = now + self.timeout
+                for _ in range(started):
+                    if not done.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                        break
+        with self.lock:
+            result = dict(self.usage)
+            for mountpoint, since in self.pending.items():
+                if now - since > self.timeout or mountpoint not in result:
+                    result[mountpoint] = None
+        return result
+
+    def rates(self):
+        now = time.monotonic()
+        disks = {k: v for k, v in (psutil.disk_io_counters(perdisk=True) or {}).items()
+                 if not re.match(IO_DEVICE_EXCLUDES, k)}
+        nics = {k: v for k, v in (psutil.net_io_counters(pernic=True) or {}).items()
+                if not re.match(IO_DEVICE_EXCLUDES, k)}
+        prev, self.io_prev = self.io_prev, (now, disks, nics)
+        if prev is None or now <= prev[0]:
+            return {}, {}
+        elapsed = now - prev[0]
+        disk_rates = {name: (max(0, c.read_bytes - prev[1][name].read_bytes) / elapsed,
+                             max(0, c.write_bytes - prev[1][name].write_bytes) / elapsed)
+                      for name, c in disks.items() if name in prev[1]}
+        net_rates = {name: (max(0, c.bytes_recv - prev[2][name].bytes_recv) / elapsed,
+                            max(0, c.bytes_sent - prev[2][name].bytes_sent) / elapsed)
+                     for name, c in nics.items() if name in prev[2]}
+        return disk_rates, net_rates
+
+device_monitor = DeviceMonitor()
+
+def format_rate(bytes_per_second):
+    return f"{bytes_per_second / 1024**2:.2f} MB/s"
+
+def describe_mounts(snapshot):
+    lines = []
+    for mountpoint, usage in sorted((snapshot.get("mounts") or {}).items()):
+        if usage is None:
+            lines.append(f"  {mountpoint}: not responding")
+        else:
+            lines.append(f"  {mountpoint}: {usage.used / 1024**3:.2f} / {usage.total / 1024**3:.2f} GB "
+                         f"({usage.percent}%), {usage.free / 1024**3:.2f} GB free")
+    return lines
+
+def describe_io_rates(snapshot):
+    lines = []
+    for name, (read, written) in sorted((snapshot.get("disk_io") or {}).items()):
+        lines.append(f"  {name}: read {format_rate(read)}, write {format_rate(written)}")
+    for name, (received, sent) in sorted((snapshot.get("net_io") or {}).items()):
+        lines.append(f"  {name}: down {format_rate(received)}, up {format_rate(sent)}")
+    return lines
+
+def alert_metrics(snapshot):
+    metrics = {"cpu": snapshot["cpu"], "memory": snapshot["memory"].percent, "load": snapshot["load"][0]}
+    mounts = {mp: u.percent for mp, u in (snapshot.get("mounts") or {}).items() if u is not None}
+    for mountpoint, percent in mounts.items():
+        metrics[f"disk:{mountpoint}"] = percent
+    metrics["disk"] = max(mounts.values(), default=snapshot["disk"].percent)
+    mb = 1024**2
+    metrics["disk_io"] = metrics["net_io"] = 0.0
+    disks = snapshot.get("disk_io") or {}
+    for name, (read, written) in disks.items():
+        metrics[f"disk_read:{name}"] = read / mb
+        metrics[f"disk_write:{name}"] = written / mb
+        metrics[f"disk_io:{name}"] = (read + written) / mb
+        # Partitions (sda1, nvme0n1p2) are also counted under their whole disk
+        if not any(re.fullmatch(re.escape(disk) + r"p?\d+", name) for disk in disks if disk != name):
+            metrics["disk_io"] += (read + written) / mb
+    for name, (received, sent) in (snapshot.get("net_io") or {}).items():
+        metrics[f"net_recv:{name}"] = received / mb
+        metrics[f"net_sent:{name}"] = sent / mb
+        metrics[f"net_io:{name}"] = (received + sent) / mb
+        metrics["net_io"] += (received + sent) / mb
+    return metrics
+
+def resource_alerts(snapshot):
+    metrics = alert_metrics(snapshot)
+    alerts = []
+    for mountpoint, usage in sorted((snapshot.get("mounts") or {}).items()):
+        if usage is None:
+            alerts.append(f"🟡 MOUNT {mountpoint} is not responding")
+        elif usage.percent > ALERT_THRESHOLDS["disk"]:
+            alerts.append(f"🔴 DISK ALERT {mountpoint}: {usage.percent}% (Threshold: {ALERT_THRESHOLDS['disk']}%)")
+    for kind, label in (("disk_io", "DISK IO"), ("net_io", "NETWORK IO")):
+        for key, value in metrics.items():
+            if key.startswith(kind + ":") and value > ALERT_THRESHOLDS[kind]:
+                alerts.append(f"🔴 {label} ALERT {key.split(':', 1)[1]}: {value:.1f} MB/s "
+                              f"(Threshold: {ALERT_THRESHOLDS[kind]} MB/s)")
+    return alerts
+
+class MetricsSampler:
+    def __init__(self, interval=METRICS_INTERVAL, max_overhead=METRICS_MAX_OVERHEAD):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.latest = None
+        self.ready = threading.Event()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.samples = 0
+        self.cost = 0.0
+        self.elapsed = 0.0
+        self.listeners = []
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            psutil.cpu_percent(interval=None)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    @perf_timed("psutil:sample")
+    def collect(self):
+        disk_io, net_io = device_monitor.rates()
+        return {
+            "time": time.time(),
+            "cpu": psutil.cpu_percent(interval=None),
+            "memory": psutil.virtual_memory(),
+            "disk": psutil.disk_usage('/'),
+            "load": psutil.getloadavg(),
+            "mounts": device_monitor.mounts(),
+            "disk_io": disk_io,
+            "net_io": net_io,
+        }
+
+    def _run(self):
+        # Give cpu_percent a short first window so the first snapshot is meaningful
+        self.stop_event.wait(0.2)
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            cpu_started = time.thread_time()
+            try:
+                snapshot = self.collect()
+            except Exception:
+                logging.exception("Metrics sample failed")
+                snapshot = None
+            cost = time.thread_time() - cpu_started
+            if snapshot is not None:
+                with self.lock:
+                    self.latest = snapshot
+                    self.samples += 1
+                    self.cost += cost
+                self.ready.set()
+                for callback in self.listeners:
+                    try:
+                        callback(snapshot)
+                    except Exception:
+                        logging.exception("Metrics listener failed")
+            if cost > self.interval * self.max_overhead:
+                self.interval = min(60.0, cost / self.max_overhead)
+                logging.warning("Metrics sampling too expensive (%.1f ms), interval raised to %.1fs", cost * 1000, self.interval)
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+            with self.lock:
+                self.elapsed += time.monotonic() - started
+
+    def snapshot(self):
+        self.start()
+        self.ready.wait(1.0)
+        with self.lock:
+            if self.latest is not None:
+                return self.latest
+        return self.collect()
+
+    def overhead(self):
+        with self.lock:
+            return self.cost / self.elapsed * 100 if self.elapsed else 0.0
+
+metrics_sampler = MetricsSampler()
+
+class MetricsHistory:
+    FIELDS = 5
+    MAGIC = 0x4D484953
+
+    def __init__(self, path=METRICS_HISTORY_FILE, resolutions=METRICS_HISTORY_RESOLUTIONS,
+                 metrics=METRICS_HISTORY_METRICS):
+        self.path = path
+        self.resolutions = resolutions
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.data = None
+        self.mm = None
+        self.file = None
+        self.bases = {}
+        offset = 2
+        for metric in metrics:
+            for step, slots in resolutions:
+                self.bases[(metric, step)] = offset
+                offset += slots * self.FIELDS
+        self.size = offset
+        self.layout = float(hash(tuple(resolutions)) % 1000003 + len(metrics))
+        self.added = 0
+
+    def open(self):
+        with self.lock:
+            if self.data is not None:
+                return
+            nbytes = self.size * 8
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, "a+b")
+                if os.fstat(self.file.fileno()).st_size != nbytes:
+                    self.file.truncate(0)
+                    self.file.truncate(nbytes)
+                self.mm = mmap.mmap(self.file.fileno(), nbytes)
+                self.data = memoryview(self.mm).cast("d")
+            else:
+                self.data = array.array("d", bytes(nbytes))
+            if self.data[0] != self.MAGIC or self.data[1] != self.layout:
+                for i in range(self.size):
+                    self.data[i] = 0.0
+                self.data[0] = self.MAGIC
+                self.data[1] = self.layout
+
+    def add(self, timestamp, values):
+        self.open()
+        data = self.data
+        with self.lock:
+            for metric, value in values.items():
+                for step, slots in self.resolutions:
+                    bucket = int(timestamp // step)
+                    off = self.bases[(metric, step)] + (bucket % slots) * self.FIELDS
+                    if data[off] != bucket * step or data[off + 4] == 0:
+                        data[off] = bucket * step
+                        data[off + 1] = value
+                        data[off + 2] = value
+                        data[off + 3] = value
+                        data[off + 4] = 1
+                    else:
+                        data[off + 1] = min(data[off + 1], value)
+                        data[off + 2] = max(data[off + 2], value)
+                        data[off + 3] += value
+                        data[off + 4] += 1
+            self.added += 1
+            if self.mm is not None and self.added % 60 == 0:
+                self.mm.flush()
+
+    def record(self, snapshot):
+        self.add(snapshot["time"], {
+            "cpu": snapshot["cpu"],
+            "memory": snapshot["memory"].percent,
+            "disk": snapshot["disk"].percent,
+        })
+
+    def buckets(self, metric, start, end):
+        self.open()
+        span = end - start
+        step, slots = next(((st, sl) for st, sl in self.resolutions if st * sl >= span), self.resolutions[-1])
+        base = self.bases[(metric, step)]
+        last = int(end // step)
+        first = max(int(start // step), last - slots + 1)
+        rows = []
+        with self.lock:
+            for bucket in range(first, last + 1):
+                off = base + (bucket % slots) * self.FIELDS
+                if self.data[off] == bucket * step and self.data[off + 4] > 0:
+                    rows.append((self.data[off], self.data[off + 1], self.data[off + 2],
+                                 self.data[off + 3], self.data[off + 4]))
+        return step, rows
+
+    def summarize(self, metric, start, end):
+        step, rows = self.buckets(metric, start, end)
+        if not rows:
+            return None
+        total = sum(r[3] for r in rows)
+        count = sum(r[4] for r in rows)
+        peak = max(rows, key=lambda r: r[2])
+        return {
+            "step": step,
+            "min": min(r[1] for r in rows),
+            "max": peak[2],
+            "peak_time": peak[0],
+            "avg": total / count,
+            "samples": int(count),
+        }
+
+    def chart(self, metric, start, end, width=60):
+        step, rows = self.buckets(metric, start, end)
+        if not rows:
+            return None
+        columns = [[] for _ in range(width)]
+        span = max(end - start, step)
+        for row in rows:
+            col = min(width - 1, max(0, int((row[0] - start) / span * width)))
+            columns[col].append(row[3] / row[4])
+        bars = "▁▂▃▄▅▆▇█"
+        line = "".join(bars[min(7, int(sum(c) / len(c) / 100 * 8))] if c else " " for c in columns)
+        return step, line
+
+metrics_history = MetricsHistory()
+
+def parse_time_window(text, default=3600):
+    text = text.strip().lower()
+    now = time.time()
+    if text == "today":
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return midnight, now, "today"
+    match = re.fullmatch(r"(?:last\s+)?(\d+)?\s*(s|sec|secs|seconds?|m|min|mins|minutes?|h|hr|hrs|hours?|d|days?)", text)
+    if not match:
+        return now - default, now, f"last {default // 60}m"
+    amount = int(match.group(1) or 1)
+    unit = {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)[0]]
+    return now - amount * unit, now, f"last {amount}{match.group(2)[0]}"
+
+def parse_duration(text):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(s|sec|secs|seconds?|m|min|mins|minutes?|h|hr|hrs|hours?|d|days?)",
+                         text.strip().lower())
+    if not match:
+        return None
+    return float(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)[0]]
+
+def describe_step(step):
+    return {1: "1s", 60: "1m", 3600: "1h"}.get(step, f"{step}s")
+
+def get_metric_history(metric, window="1h", with_chart=True):
+    try:
+        metric = METRIC_ALIASES.get(metric.lower(), metric.lower())
+        if metric not in METRICS_HISTORY_METRICS:
+            return f"Unknown metric: {metric}. Available: {', '.join(METRICS_HISTORY_METRICS)}"
+        start, end, label = parse_time_window(window)
+        summary = metrics_history.summarize(metric, start, end)
+        if summary is None:
+            return f"No {metric} history recorded for {label}"
+        peak_at = datetime.fromtimestamp(summary["peak_time"]).strftime("%Y-%m-%d %H:%M:%S")
+        report = (f"{metric.upper()} usage, {label} ({describe_step(summary['step'])} resolution):\n"
+                  f"Min: {summary['min']:.1f}%  Avg: {summary['avg']:.1f}%  Max: {summary['max']:.1f}% at {peak_at}")
+        if with_chart:
+            chart = metrics_history.chart(metric, start, end)
+            if chart:
+                report += f"\n0-100% |{chart[1]}|"
+        logging.info("Metric history queried: %s %s", metric, label)
+        return report
+    except Exception as e:
+        logging.exception("Failed to query metric history")
+        return f"History error: {e}"
+
 def get_system_info():
     try:
+        snapshot = metrics_sampler.snapshot()
         cpu_count = psutil.cpu_count()
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        cpu_percent = snapshot["cpu"]
+        memory = snapshot["memory"]
+        disk = snapshot["disk"]
+        load = snapshot["load"]
         boot_time = time.ctime(psutil.boot_time())
         
         info = f"""
@@ -156,6 +1811,7 @@ Machine: {platform.machine()}
 Processor: {platform.processor()}
 CPU Cores: {cpu_count}
 CPU Usage: {cpu_percent}%
+Load Average: {load[0]:.2f} {load[1]:.2f} {load[2]:.2f}
 RAM Total: {round(memory.total / (1024**3), 2)} GB
 RAM Used: {round(memory.used / (1024**3), 2)} GB ({memory.percent}%)
 RAM Available: {round(memory.available / (1024**3), 2)} GB
@@ -163,31 +1819,50 @@ Disk Total: {round(disk.total / (1024**3), 2)} GB
 Disk Used: {round(disk.used / (1024**3), 2)} GB ({disk.percent}%)
 Disk Free: {round(disk.free / (1024**3), 2)} GB
 Boot Time: {boot_time}
-        """
+Metrics Sampler: every {metrics_sampler.interval:.1f}s ({metrics_sampler.overhead():.2f}% CPU)
+        """.strip()
+        mounts = describe_mounts(snapshot)
+        if mounts:
+            info += "\nMounts:\n" + "\n".join(mounts)
+        rates = describe_io_rates(snapshot)
+        if rates:
+            info += "\nIO Rates:\n" + "\n".join(rates)
         logging.info("System info retrieved")
-        return info.strip()
+        return info
     except Exception as e:
         logging.exception("Failed to get system info")
         return f"Error retrieving system info: {e}"
 
 def get_health_status():
     try:
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        cpu_percent = psutil.cpu_percent(interval=1)
+        snapshot = metrics_sampler.snapshot()
+        memory = snapshot["memory"]
+        disk = snapshot["disk"]
+        cpu_percent = snapshot["cpu"]
         
         status = "🟢 HEALTHY"
         alerts = []
         
-        if cpu_percent > 80:
+        if cpu_percent > ALERT_THRESHOLDS["cpu"]:
             alerts.append(f"⚠️ High CPU usage: {cpu_percent}%")
             status = "🟡 WARNING"
-        if memory.percent > 85:
+        if memory.percent > ALERT_THRESHOLDS["memory"]:
             alerts.append(f"⚠️ High memory usage: {memory.percent}%")
             status = "🟡 WARNING"
-        if disk.percent > 90:
+        if not snapshot.get("mounts") and disk.percent > ALERT_THRESHOLDS["disk"]:
             alerts.append(f"⚠️ Low disk space: {disk.percent}% used")
             status = "🔴 CRITICAL"
+        for alert in resource_alerts(snapshot):
+            alerts.append(alert)
+            if alert.startswith("🔴 DISK"):
+                status = "🔴 CRITICAL"
+            elif status == "🟢 HEALTHY":
+                status = "🟡 WARNING"
+        sustained = alert_engine.active_alerts()
+        if sustained:
+            alerts.append("Sustained alerts:\n" + "\n".join(sustained))
+            if status == "🟢 HEALTHY":
+                status = "🟡 WARNING"
         
         health_report = f"System Health Status: {status}\n"
         if alerts:
@@ -201,39 +1876,979 @@ def get_health_status():
         logging.exception("Failed to get health status")
         return f"Error retrieving health status: {e}"
 
-def search_files(filename, search_path=None, max_results=20):
-    try:
-        if search_path is None:
-            search_path = os.path.expanduser("~")
-        
+@functools.lru_cache(maxsize=32)
+def _exclude_pattern(excludes):
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in excludes) or "(?!)")
+
+def is_excluded(name, excludes=SEARCH_EXCLUDES):
+    return _exclude_pattern(tuple(excludes)).match(name) is not None
+
+def subtree_range(path):
+    prefix = path.rstrip(os.sep) + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def format_search_match(path, is_dir):
+    if is_dir:
+        return f"{path}/ [FOLDER]"
+    size = os.stat(path).st_size / (1024**2)
+    return f"{path} ({size:.2f} MB)"
+
+class FileIndex:
+    def __init__(self, db_path=FILE_INDEX_DB, roots=None, refresh_interval=FILE_INDEX_REFRESH):
+        self.db_path = db_path
+        self.roots = [os.path.abspath(r) for r in (roots or FILE_INDEX_ROOTS)]
+        self.refresh_interval = refresh_interval
+        self.local = threading.local()
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.fts = True
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                parent TEXT NOT NULL,
+                name TEXT NOT NULL,
+                is_dir INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+            CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, indexed_at REAL NOT NULL);
+        """)
+        try:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entry_names
+                    USING fts5(name, content='entries', content_rowid='id', tokenize='trigram');
+                CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                    INSERT INTO entry_names(rowid, name) VALUES (new.id, new.name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                    INSERT INTO entry_names(entry_names, rowid, name) VALUES ('delete', old.id, old.name);
+                END;
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 trigram support; fall back to LIKE scans
+            self.fts = False
+        self.local.conn = conn
+        return conn
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def refresh_now(self):
+        self.wake_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            for root in self.roots:
+                if self.stop_event.is_set():
+                    break
+                try:
+                    started = time.time()
+                    self.refresh(root)
+                    logging.info("File index refreshed for %s", root,
+                                 extra={"duration_ms": (time.time() - started) * 1000})
+                except Exception:
+                    logging.exception("File index refresh failed for %s", root)
+            self.wake_event.wait(self.refresh_interval)
+            self.wake_event.clear()
+
+    def _forget_tree(self, conn, path):
+        lo, hi = subtree_range(path)
+        conn.execute("DELETE FROM entries WHERE path = ? OR (path > ? AND path < ?)", (path, lo, hi))
+        conn.execute("DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)", (path, lo, hi))
+
+    def _scan_dir(self, conn, path):
+        try:
+            mtime = os.stat(path).st_mtime
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            self._forget_tree(conn, path)
+            return []
+        rows = []
+        subdirs = []
+        for entry in entries:
+            if is_excluded(entry.name):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            rows.append((entry.path, path, entry.name, int(is_dir)))
+            if is_dir:
+                subdirs.append(entry.path)
+        old_subdirs = {row[0] for row in conn.execute(
+            "SELECT path FROM entries WHERE parent = ? AND is_dir = 1", (path,))}
+        for gone in old_subdirs.difference(subdirs):
+            self._forget_tree(conn, gone)
+        conn.execute("DELETE FROM entries WHERE parent = ?", (path,))
+        conn.executemany("INSERT OR IGNORE INTO entries(path, parent, name, is_dir) VALUES (?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO dirs(path, mtime) VALUES (?, ?)", (path, mtime))
+        return subdirs
+
+    def refresh(self, root):
+        conn = self._connect()
+        lo, hi = subtree_range(root)
+        known = dict(conn.execute(
+            "SELECT path, mtime FROM dirs WHERE path = ? OR (path > ? AND path < ?)", (root, lo, hi)))
+        stack = []
+        if root not in known:
+            stack.append(root)
+        for path, mtime in known.items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    stack.append(path)
+            except OSError:
+                self._forget_tree(conn, path)
+        # Subdirectories listed by a scanned parent but never scanned themselves
+        # are left over from an interrupted pass and still need a visit
+        stack.extend(row[0] for row in conn.execute(
+            "SELECT e.path FROM entries e LEFT JOIN dirs d ON d.path = e.path "
+            "WHERE e.is_dir = 1 AND d.path IS NULL AND e.path > ? AND e.path < ?", (lo, hi)))
+        scanned = 0
+        while stack and not self.stop_event.is_set():
+            path = stack.pop()
+            for sub in self._scan_dir(conn, path):
+                if sub not in known:
+                    stack.append(sub)
+            scanned += 1
+            if scanned % 500 == 0:
+                conn.commit()
+        if not stack and not self.stop_event.is_set():
+            conn.execute("INSERT OR REPLACE INTO roots(path, indexed_at) VALUES (?, ?)", (root, time.time()))
+        conn.commit()
+
+    def covers(self, search_path):
+        search_path = os.path.abspath(search_path)
+        try:
+            indexed = [row[0] for row in self._connect().execute("SELECT path FROM roots")]
+        except sqlite3.Error:
+            return False
+        for root in indexed:
+            if search_path == root or search_path.startswith(root.rstrip(os.sep) + os.sep):
+                return not any(is_excluded(part) for part in Path(search_path).relative_to(root).parts)
+        return False
+
+    def query(self, pattern, search_path, max_results=20):
+        conn = self._connect()
+        search_path = os.path.abspath(search_path)
+        lo, hi = subtree_range(search_path)
+        limit = max_results * 2
+        if any(c in pattern for c in "*?["):
+            sql = "SELECT path, is_dir FROM entries WHERE name GLOB ? AND path > ? AND path < ? LIMIT ?"
+            args = (f"*{pattern}*", lo, hi, limit)
+        elif self.fts and len(pattern) >= 3:
+            sql = ("SELECT e.path, e.is_dir FROM entry_names JOIN entries e ON e.id = entry_names.rowid "
+                   "WHERE entry_names MATCH ? AND e.path > ? AND e.path < ? LIMIT ?")
+            args = ('"' + pattern.replace('"', '""') + '"', lo, hi, limit)
+        else:
+            escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            sql = "SELECT path, is_dir FROM entries WHERE name LIKE ? ESCAPE '\\' AND path > ? AND path < ? LIMIT ?"
+            args = (f"%{escaped}%", lo, hi, limit)
         results = []
-        search_path = Path(search_path)
-        
-        for path in search_path.rglob(f"*{filename}*"):
+        for path, is_dir in conn.execute(sql, args):
             if len(results) >= max_results:
                 break
             try:
-                if path.is_file():
-                    size = path.stat().st_size / (1024**2)
-                    results.append(f"{path} ({size:.2f} MB)")
-                elif path.is_dir():
-                    results.append(f"{path}/ [FOLDER]")
+                results.append(format_search_match(path, is_dir))
             except (PermissionError, OSError):
                 pass
-        
-        if results:
-            search_result = f"Found {len(results)} matches for '{filename}':\n\n" + "\n".join(results)
-        else:
-            search_result = f"No files found matching '{filename}'"
-        
-        logging.info(f"File search completed for: {filename}")
+        return results
+
+file_index = FileIndex()
+
+def walk_dirs(roots, visit_dir, workers=SEARCH_WORKERS, cancel=None):
+    pending = queue.LifoQueue()
+    lock = threading.Lock()
+    remaining = [len(roots)]
+    if not roots:
+        return
+    for root in roots:
+        pending.put(root)
+
+    def worker():
+        while True:
+            path = pending.get()
+            if path is None:
+                return
+            try:
+                if cancel is None or not cancel.is_set():
+                    for sub in visit_dir(path) or ():
+                        with lock:
+                            remaining[0] += 1
+                        pending.put(sub)
+            except Exception:
+                logging.exception("Directory walk failed at %s", path)
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    finished = remaining[0] == 0
+                if finished:
+                    for _ in range(workers):
+                        pending.put(None)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+@perf_timed("fs:walk")
+def find_files(pattern, roots, on_match=None, max_results=20, excludes=SEARCH_EXCLUDES,
+               cancel=None, workers=SEARCH_WORKERS):
+    cancel = cancel or threading.Event()
+    needle = pattern.lower()
+    if any(c in needle for c in "*?["):
+        glob = f"*{needle}*"
+        matches = lambda name: fnmatch.fnmatchcase(name.lower(), glob)
+    else:
+        matches = lambda name: needle in name.lower()
+    excluded = _exclude_pattern(tuple(excludes)).match
+    results = []
+    lock = threading.Lock()
+
+    def visit(path):
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if cancel.is_set():
+                        break
+                    if excluded(entry.name):
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        subdirs.append(entry.path)
+                    if not matches(entry.name):
+                        continue
+                    try:
+                        line = format_search_match(entry.path, is_dir)
+                    except OSError:
+                        continue
+                    with lock:
+                        if len(results) >= max_results:
+                            break
+                        results.append(line)
+                        if len(results) >= max_results:
+                            cancel.set()
+                    if on_match:
+                        on_match(line)
+        except OSError:
+            pass
+        return subdirs
+
+    walk_dirs([os.path.abspath(r) for r in roots], visit, workers, cancel)
+    return results
+
+def search_files(filename, search_path=None, max_results=20, on_match=None, cancel=None):
+    try:
+        if search_path is None:
+            search_path = os.path.expanduser("~")
+        roots = [search_path] if isinstance(search_path, (str, Path)) else list(search_path)
+        cancel = cancel or threading.Event()
+        started = time.time()
+        
+        results = []
+        unindexed = []
+        for root in roots:
+            if not file_index.covers(root):
+                unindexed.append(root)
+                continue
+            for line in file_index.query(filename, root, max_results - len(results)):
+                results.append(line)
+                if on_match:
+                    on_match(line)
+            if len(results) >= max_results:
+                break
+        if unindexed and len(results) < max_results and not cancel.is_set():
+            results += find_files(filename, unindexed, on_match=on_match,
+                                  max_results=max_results - len(results), cancel=cancel)
+        cancelled = cancel.is_set() and len(results) < max_results
+        
+        if results:
+            search_result = f"Found {len(results)} matches for '{filename}'"
+            if cancelled:
+                search_result += " (search cancelled)"
+            if on_match is None:
+                search_result += ":\n\n" + "\n".join(results)
+        elif cancelled:
+            search_result = f"Search for '{filename}' cancelled"
+        else:
+            search_result = f"No files found matching '{filename}'"
+        
+        logging.info("File search completed for: %s", filename,
+                     extra={"duration_ms": (time.time() - started) * 1000})
         return search_result
     except Exception as e:
         logging.exception("File search failed")
         return f"Search error: {e}"
 
+def grep_file(path, needle, ignore_case=True, max_bytes=GREP_MAX_FILE_BYTES,
+              max_matches=GREP_MAX_MATCHES_PER_FILE):
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            limit = min(size, max_bytes)
+            if mm.find(b"\0", 0, min(limit, 8192)) != -1:
+                return []
+            pattern = re.compile(re.escape(needle), re.IGNORECASE if ignore_case else 0)
+            matches = []
+            line_no = 1
+            counted = 0
+            found = pattern.search(mm, 0, limit)
+            while found and len(matches) < max_matches:
+                start = mm.rfind(b"\n", 0, found.start()) + 1
+                end = mm.find(b"\n", found.end(), limit)
+                if end == -1:
+                    end = limit
+                line_no += mm[counted:start].count(b"\n")
+                counted = start
+                text = mm[start:min(end, start + 200)].decode("utf-8", "replace").strip()
+                matches.append((line_no, text))
+                found = pattern.search(mm, end, limit)
+            return matches
+
+def grep_batch(paths, needle, ignore_case=True, max_bytes=GREP_MAX_FILE_BYTES):
+    results = []
+    for path in paths:
+        try:
+            matches = grep_file(path, needle, ignore_case, max_bytes)
+        except (OSError, ValueError):
+            continue
+        if matches:
+            results.append((path, matches))
+    return results
+
+_grep_pool = None
+_grep_pool_lock = threading.Lock()
+
+def get_grep_process_pool():
+    global _grep_pool
+    with _grep_pool_lock:
+        if _grep_pool is None:
+            _grep_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+        return _grep_pool
+
+@perf_timed("fs:grep")
+def grep_files(text, roots, on_match=None, max_results=200, ignore_case=True,
+               excludes=SEARCH_EXCLUDES, cancel=None, max_bytes=GREP_MAX_FILE_BYTES):
+    cancel = cancel or threading.Event()
+    excluded = _exclude_pattern(tuple(excludes)).match
+    files = []
+    lock = threading.Lock()
+
+    def visit(path):
+        subdirs = []
+        local = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if excluded(entry.name):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            local.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        with lock:
+            files.extend(local)
+        return subdirs
+
+    walk_dirs([os.path.abspath(r) for r in roots], visit, cancel=cancel)
+    needle = text.encode("utf-8")
+    batches = [files[i:i + GREP_BATCH_SIZE] for i in range(0, len(files), GREP_BATCH_SIZE)]
+    if len(files) >= GREP_PROCESS_THRESHOLD:
+        pool = get_grep_process_pool()
+        owned = None
+    else:
+        pool = owned = ThreadPoolExecutor(max_workers=SEARCH_WORKERS)
+    results = []
+    matched_files = 0
+    try:
+        futures = [pool.submit(grep_batch, batch, needle, ignore_case, max_bytes) for batch in batches]
+        for future in as_completed(futures):
+            if cancel.is_set() or len(results) >= max_results:
+                break
+            for path, matches in future.result():
+                matched_files += 1
+                for line_no, line in matches:
+                    if len(results) >= max_results:
+                        break
+                    hit = f"{path}:{line_no}: {line}"
+                    results.append(hit)
+                    if on_match:
+                        on_match(hit)
+        for future in futures:
+            future.cancel()
+    finally:
+        if owned is not None:
+            owned.shutdown(wait=False, cancel_futures=True)
+    return results, matched_files, len(files)
+
+def search_file_contents(text, search_path=None, max_results=200, on_match=None, cancel=None):
+    try:
+        if search_path is None:
+            search_path = os.path.expanduser("~")
+        roots = [search_path] if isinstance(search_path, (str, Path)) else list(search_path)
+        cancel = cancel or threading.Event()
+        started = time.time()
+        results, matched_files, scanned = grep_files(text, roots, on_match=on_match,
+                                                     max_results=max_results, cancel=cancel)
+        elapsed = time.time() - started
+        if results:
+            search_result = (f"Found {len(results)} matches for '{text}' in {matched_files} files "
+                             f"(scanned {scanned} files in {elapsed:.1f}s)")
+            if cancel.is_set():
+                search_result += " (search cancelled)"
+            if on_match is None:
+                search_result += ":\n\n" + "\n".join(results)
+        elif cancel.is_set():
+            search_result = f"Content search for '{text}' cancelled"
+        else:
+            search_result = f"No files contain '{text}' (scanned {scanned} files in {elapsed:.1f}s)"
+        logging.info("Content search completed for: %s", text, extra={"duration_ms": elapsed * 1000})
+        return search_result
+    except Exception as e:
+        logging.exception("Content search failed")
+        return f"Search error: {e}"
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TB"
+
+def parse_size(text):
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Not a size: {text}")
+    return int(float(match.group(1)) * 1024 ** " kmgt".index(match.group(2).lower() or " "))
+
+def allocated_size(st):
+    # Blocks actually allocated, so sparse files and VM images count for what they occupy
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+class DiskUsageCache:
+    def __init__(self, db_path=DISK_USAGE_DB):
+        self.db_path = db_path
+        self.local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS du_dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                bytes INTEGER NOT NULL,
+                files INTEGER NOT NULL,
+                top_files TEXT NOT NULL
+            )""")
+        self.local.conn = conn
+        return conn
+
+    def load(self, root):
+        lo, hi = subtree_range(root)
+        try:
+            rows = self._connect().execute(
+                "SELECT path, parent, mtime_ns, bytes, files, top_files FROM du_dirs "
+                "WHERE path = ? OR (path > ? AND path < ?)", (root, lo, hi))
+            return {row[0]: row[1:] for row in rows}
+        except sqlite3.Error:
+            logging.exception("Failed to load disk usage cache for %s", root)
+            return {}
+
+    def save(self, rows, stale=()):
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany("DELETE FROM du_dirs WHERE path = ?", ((path,) for path in stale))
+                conn.executemany("INSERT OR REPLACE INTO du_dirs(path, parent, mtime_ns, bytes, files, top_files) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", ((path,) + row for path, row in rows.items()))
+        except sqlite3.Error:
+            logging.exception("Failed to save disk usage cache")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM du_dirs")
+
+disk_usage_cache = DiskUsageCache()
+
+@perf_timed("fs:disk_usage")
+def analyze_disk_usage(root, top=DISK_USAGE_TOP, on_progress=None, cancel=None, workers=SEARCH_WORKERS,
+                       one_filesystem=True, refresh=False, cache=disk_usage_cache):
+    root = os.path.abspath(os.path.expanduser(root))
+    cancel = cancel or threading.Event()
+    root_dev = os.stat(root).st_dev
+    known = cache.load(root) if cache is not None else {}
+    children = {}
+    for path, row in known.items():
+        if path != root and not refresh:
+            children.setdefault(row[0], []).append(path)
+    dirs = {}
+    fresh = {}
+    lock = threading.Lock()
+    progress = {"files": 0, "bytes": 0, "reported": time.monotonic()}
+
+    def visit(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return []
+        if one_filesystem and st.st_dev != root_dev:
+            return []
+        cached = None if refresh else known.get(path)
+        if cached is not None and cached[1] == st.st_mtime_ns:
+            # Entries were neither added, removed nor renamed; reuse the totals and revisit only subdirs
+            row, subdirs = cached, children.get(path, [])
+        else:
+            subdirs = []
+            size = files = 0
+            largest = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                                continue
+                            entry_size = allocated_size(entry.stat(follow_symlinks=False))
+                        except OSError:
+                            continue
+                        size += entry_size
+                        files += 1
+                        if len(largest) < top:
+                            heapq.heappush(largest, (entry_size, entry.name))
+                        elif entry_size > largest[0][0]:
+                            heapq.heapreplace(largest, (entry_size, entry.name))
+            except OSError:
+                return []
+            row = (os.path.dirname(path), st.st_mtime_ns, size, files, json.dumps(largest))
+        with lock:
+            dirs[path] = row
+            if row is not cached:
+                fresh[path] = row
+            progress["files"] += row[3]
+            progress["bytes"] += row[2]
+            now = time.monotonic()
+            report = on_progress is not None and now - progress["reported"] >= DISK_USAGE_PROGRESS_INTERVAL
+            if report:
+                progress["reported"] = now
+                message = (f"Scanned {len(dirs):,} directories, {progress['files']:,} files, "
+                           f"{format_size(progress['bytes'])} so far...")
+        if report:
+            on_progress(message)
+        return subdirs
+
+    walk_dirs([root], visit, workers, cancel)
+    cancelled = cancel.is_set()
+    if cache is not None and not cancelled:
+        # A cached row is only reused alongside its cached children, so rows from a
+        # cancelled walk would hide every subtree it never reached
+        cache.save(fresh, [path for path in known if path not in dirs])
+
+    totals = {path: row[2] for path, row in dirs.items()}
+    for path in sorted(dirs, key=lambda p: p.count(os.sep), reverse=True):
+        parent = dirs[path][0]
+        if path != root and parent in totals:
+            totals[parent] += totals[path]
+    largest_files = []
+    for path, row in dirs.items():
+        for size, name in json.loads(row[4]):
+            if len(largest_files) < top:
+                heapq.heappush(largest_files, (size, os.path.join(path, name)))
+            elif size > largest_files[0][0]:
+                heapq.heapreplace(largest_files, (size, os.path.join(path, name)))
+    return {
+        "root": root,
+        "total": totals.get(root, 0),
+        "files": sum(row[3] for row in dirs.values()),
+        "dirs": len(dirs),
+        "rescanned": len(fresh),
+        "largest_dirs": heapq.nlargest(top, ((size, path) for path, size in totals.items() if path != root)),
+        "largest_files": sorted(largest_files, reverse=True),
+        "cancelled": cancelled,
+    }
+
+def disk_usage(path=None, top=DISK_USAGE_TOP, on_progress=None, cancel=None, refresh=False):
+    try:
+        path = os.path.expanduser(path or "~")
+        if not os.path.isdir(path):
+            return f"Not a directory: {path}"
+        started = time.time()
+        result = analyze_disk_usage(path, top=top, on_progress=on_progress, cancel=cancel, refresh=refresh)
+        elapsed = time.time() - started
+        lines = [f"Disk usage for {result['root']}: {format_size(result['total'])} in {result['files']:,} files, "
+                 f"{result['dirs']:,} directories ({result['rescanned']:,} rescanned, "
+                 f"{result['dirs'] - result['rescanned']:,} cached) in {elapsed:.1f}s"]
+        if result["cancelled"]:
+            lines[0] += " (scan cancelled, totals are partial)"
+        if result["largest_dirs"]:
+            lines.append("\nLargest directories:")
+            lines += [f"  {format_size(size):>9}  {p}" for size, p in result["largest_dirs"]]
+        if result["largest_files"]:
+            lines.append("\nLargest files:")
+            lines += [f"  {format_size(size):>9}  {p}" for size, p in result["largest_files"]]
+        logging.info("Disk usage analyzed for %s", result["root"], extra={"duration_ms": elapsed * 1000})
+        return "\n".join(lines)
+    except Exception as e:
+        logging.exception("Disk usage analysis failed")
+        return f"Disk usage error: {e}"
+
+def partial_hash(path, size, block=DUPLICATE_BLOCK_SIZE):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(block))
+        if size > block:
+            f.seek(max(block, size - block))
+            digest.update(f.read(block))
+    return digest.hexdigest()
+
+def full_hash(path, chunk=1024 * 1024):
+    digest = hashlib.blake2b(digest_size=16)
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+class HashCache:
+    def __init__(self, db_path=DUPLICATES_DB):
+        self.db_path = db_path
+        self.local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                partial TEXT,
+                full TEXT,
+                PRIMARY KEY (dev, inode)
+            )""")
+        self.local.conn = conn
+        return conn
+
+    def get(self, files, chunk=500):
+        # Rows only count when size and mtime still match, so an edited file is hashed again
+        found = {}
+        try:
+            conn = self._connect()
+            for i in range(0, len(files), chunk):
+                batch = {(f.dev, f.inode): f for f in files[i:i + chunk]}
+                marks = ",".join("?" * len(batch))
+                rows = conn.execute(f"SELECT dev, inode, size, mtime_ns, partial, full FROM hashes "
+                                    f"WHERE inode IN ({marks})", [inode for _, inode in batch])
+                for dev, inode, size, mtime_ns, partial, full in rows:
+                    f = batch.get((dev, inode))
+                    if f is not None and f.size == size and f.mtime_ns == mtime_ns:
+                        found[dev, inode] = [partial, full]
+        except sqlite3.Error:
+            logging.exception("Failed to read file hash cache")
+        return found
+
+    def put(self, files, hashes):
+        try:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO hashes(dev, inode, size, mtime_ns, partial, full) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)",
+                                 ((f.dev, f.inode, f.size, f.mtime_ns) + tuple(hashes[f.dev, f.inode])
+                                  for f in files if (f.dev, f.inode) in hashes))
+        except sqlite3.Error:
+            logging.exception("Failed to save file hash cache")
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM hashes")
+
+hash_cache = HashCache()
+
+class FileEntry:
+    __slots__ = ("path", "size", "dev", "inode", "mtime_ns")
+
+    def __init__(self, path, st):
+        self.path = path
+        self.size = st.st_size
+        self.dev = st.st_dev
+        self.inode = st.st_ino
+        self.mtime_ns = st.st_mtime_ns
+
+@perf_timed("fs:duplicates")
+def find_duplicates(roots, on_group=None, on_progress=None, cancel=None, min_size=DUPLICATE_MIN_SIZE,
+                    excludes=SEARCH_EXCLUDES, workers=DUPLICATE_WORKERS, block=DUPLICATE_BLOCK_SIZE,
+                    cache=hash_cache):
+    cancel = cancel or threading.Event()
+    excluded = _exclude_pattern(tuple(excludes)).match
+    by_size = {}
+    seen = set()
+    lock = threading.Lock()
+    stats = {"files": 0, "hashed_bytes": 0, "cached": 0}
+
+    def visit(path):
+        subdirs = []
+        local = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if excluded(entry.name):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            if st.st_size >= min_size:
+                                local.append(FileEntry(entry.path, st))
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        with lock:
+            stats["files"] += len(local)
+            for f in local:
+                # Hard links share their data, so a second name for an inode is not a duplicate
+                if (f.dev, f.inode) not in seen:
+                    seen.add((f.dev, f.inode))
+                    by_size.setdefault(f.size, []).append(f)
+        return subdirs
+
+    walk_dirs([os.path.abspath(r) for r in roots], visit, cancel=cancel)
+    candidates = sorted((group for group in by_size.values() if len(group) > 1),
+                        key=lambda group: group[0].size, reverse=True)
+    files = [f for group in candidates for f in group]
+    if on_progress and files:
+        on_progress(f"{stats['files']:,} files scanned, {len(files):,} share a size with another file; hashing...")
+    hashes = cache.get(files) if cache is not None else {}
+    stats["cached"] = sum(1 for h in hashes.values() if h[0])
+    groups = []
+
+    def run_stage(stage, targets, fn, on_done=None):
+        futures = {}
+        for f in targets:
+            known = hashes.get((f.dev, f.inode))
+            if known and known[stage]:
+                if on_done:
+                    on_done(f)
+            elif not cancel.is_set():
+                futures[pool.submit(fn, f)] = f
+        for future in as_completed(futures):
+            f = futures[future]
+            try:
+                digest = future.result()
+            except CancelledError:
+                continue
+            except OSError:
+                # Still count the unreadable file as done so its group can complete without it
+                if on_done:
+                    on_done(f)
+                continue
+            hashes.setdefault((f.dev, f.inode), [None, None])[stage] = digest
+            if on_done:
+                on_done(f)
+            if cancel.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+
+    def emit(size, members):
+        group = (size, sorted(f.path for f in members))
+        groups.append(group)
+        if on_group:
+            on_group(group)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dupes")
+    try:
+        def read_partial(f):
+            with lock:
+                stats["hashed_bytes"] += min(f.size, 2 * block)
+            return partial_hash(f.path, f.size, block)
+
+        def read_full(f):
+            with lock:
+                stats["hashed_bytes"] += f.size
+            return full_hash(f.path)
+
+        run_stage(0, files, read_partial)
+        partial_groups = {}
+        for f in files:
+            known = hashes.get((f.dev, f.inode))
+            if known and known[0]:
+                partial_groups.setdefault((f.size, known[0]), []).append(f)
+        partial_groups = [g for g in partial_groups.values() if len(g) > 1]
+
+        # First and last blocks already cover files up to two blocks long
+        small = [g for g in partial_groups if g[0].size <= 2 * block]
+        large = [g for g in partial_groups if g[0].size > 2 * block]
+        remaining = {id(g): len(g) for g in large}
+        group_of = {id(f): g for g in large for f in g}
+
+        def full_done(f):
+            g = group_of[id(f)]
+            remaining[id(g)] -= 1
+            if remaining[id(g)]:
+                return
+            by_digest = {}
+            for member in g:
+                known = hashes.get((member.dev, member.inode))
+                if known and known[1]:
+                    by_digest.setdefault(known[1], []).append(member)
+            for members in by_digest.values():
+                if len(members) > 1:
+                    emit(g[0].size, members)
+
+        run_stage(1, [f for g in large for f in g], read_full, full_done)
+        if not cancel.is_set():
+            for g in small:
+                emit(g[0].size, g)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if cache is not None:
+            cache.put(files, hashes)
+    groups.sort(key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+    return {
+        "groups": groups,
+        "files": stats["files"],
+        "candidates": len(files),
+        "hashed_bytes": stats["hashed_bytes"],
+        "cached": stats["cached"],
+        "wasted": sum(size * (len(paths) - 1) for size, paths in groups),
+        "cancelled": cancel.is_set(),
+    }
+
+def format_duplicate_group(number, group):
+    size, paths = group
+    return f"#{number} {len(paths)} x {format_size(size)}: " + ", ".join(paths)
+
+def duplicate_files(search_path=None, on_group=None, on_progress=None, cancel=None, min_size=DUPLICATE_MIN_SIZE):
+    try:
+        if search_path is None:
+            search_path = os.path.expanduser("~")
+        roots = [search_path] if isinstance(search_path, (str, Path)) else list(search_path)
+        started = time.time()
+        result = find_duplicates(roots, on_group=on_group, on_progress=on_progress, cancel=cancel, min_size=min_size)
+        elapsed = time.time() - started
+        groups = result["groups"]
+        if groups:
+            text = (f"Found {len(groups)} groups of duplicate files wasting {format_size(result['wasted'])} "
+                    f"(scanned {result['files']:,} files, hashed {format_size(result['hashed_bytes'])}, "
+                    f"{result['cached']:,} from cache, in {elapsed:.1f}s)")
+        else:
+            text = f"No duplicate files found (scanned {result['files']:,} files in {elapsed:.1f}s)"
+        if result["cancelled"]:
+            text += " (search cancelled)"
+        if groups and on_group is None:
+            text += ":\n\n" + "\n".join(format_duplicate_group(i, g) for i, g in enumerate(groups, 1))
+        logging.info("Duplicate search completed for: %s", roots, extra={"duration_ms": elapsed * 1000})
+        return text, groups
+    except Exception as e:
+        logging.exception("Duplicate search failed")
+        return f"Duplicate search error: {e}", []
+
+def parse_selection(text, count):
+    text = text.strip().lower()
+    if text in ("", "all"):
+        return list(range(1, count + 1))
+    chosen = []
+    for part in re.split(r"[,\s]+", text):
+        match = re.fullmatch(r"#?(\d+)(?:-(\d+))?", part)
+        if not match:
+            raise ValueError(f"Not a group number: {part}")
+        first, last = int(match.group(1)), int(match.group(2) or match.group(1))
+        chosen.extend(n for n in range(first, last + 1) if 1 <= n <= count and n not in chosen)
+    return chosen
+
+def delete_duplicates(groups, selection=None, under=None):
+    victims = []
+    for number in selection or range(1, len(groups) + 1):
+        size, paths = groups[number - 1]
+        if under:
+            prefix = os.path.abspath(os.path.expanduser(under)).rstrip(os.sep) + os.sep
+            inside = [p for p in paths if p.startswith(prefix)]
+            keep = next((p for p in paths if not p.startswith(prefix)), paths[0])
+        else:
+            inside, keep = paths, paths[0]
+        victims.extend((p, keep, size) for p in inside if p != keep)
+    if not victims:
+        return "No duplicate files selected."
+    listing = "\n".join(f"{p} (copy of {keep})" for p, keep, _ in victims[:20])
+    if len(victims) > 20:
+        listing += f"\n... and {len(victims) - 20} more"
+    total = sum(size for _, _, size in victims)
+
+    def _delete():
+        removed, freed, skipped = 0, 0, []
+        kept_hashes = {}
+        for path, keep, size in victims:
+            try:
+                # Never remove a copy unless the one we keep is still there with identical content
+                if os.path.getsize(keep) != size or os.path.getsize(path) != size:
+                    skipped.append(path)
+                    continue
+                if keep not in kept_hashes:
+                    kept_hashes[keep] = full_hash(keep)
+                if full_hash(path) != kept_hashes[keep]:
+                    skipped.append(path)
+                    continue
+                os.remove(path)
+                removed += 1
+                freed += size
+            except OSError:
+                skipped.append(path)
+        result = f"Removed {removed} duplicate files, freed {format_size(freed)}"
+        if skipped:
+            result += f"\nSkipped {len(skipped)} files that changed or disappeared:\n" + "\n".join(skipped[:20])
+        return result
+    return confirm_and_run(f"Delete {len(victims)} duplicate files ({format_size(total)}):\n{listing}", _delete)
+
 def get_clipboard():
     try:
+        import pyperclip
         text = pyperclip.paste()
         if text:
             result = f"Clipboard content:\n{text[:500]}"
@@ -249,8 +2864,10 @@ def get_clipboard():
 
 def set_clipboard(text):
     try:
+        import pyperclip
         pyperclip.copy(text)
-        logging.info(f"Copied to clipboard: {text[:100]}")
+        logging.info("Copied %d characters to clipboard", len(text))
+        logging.debug("Clipboard text: %.100s", text)
         return f"Copied to clipboard: {text[:100]}"
     except Exception as e:
         logging.exception("Failed to set clipboard")
@@ -258,6 +2875,7 @@ def set_clipboard(text):
 
 def clear_clipboard():
     try:
+        import pyperclip
         pyperclip.copy("")
         logging.info("Clipboard cleared")
         return "Clipboard cleared"
@@ -265,36 +2883,143 @@ def clear_clipboard():
         logging.exception("Failed to clear clipboard")
         return f"Clipboard error: {e}"
 
-def take_screenshot(save_path=None):
+def normalize_image_format(fmt):
+    fmt = (fmt or SCREENSHOT_FORMAT).lower()
+    return "jpeg" if fmt == "jpg" else fmt
+
+def encode_image(image, target, fmt=SCREENSHOT_FORMAT, level=None):
+    fmt = normalize_image_format(fmt)
+    if fmt not in SCREENSHOT_LEVELS:
+        raise ValueError(f"Unsupported format: {fmt}. Available: {', '.join(SCREENSHOT_LEVELS)}")
+    level = SCREENSHOT_LEVELS[fmt] if level is None else level
+    if fmt == "png":
+        image.save(target, "PNG", compress_level=max(0, min(9, level)))
+    elif fmt == "jpeg":
+        image.convert("RGB").save(target, "JPEG", quality=max(1, min(95, level)))
+    else:
+        image.save(target, "WEBP", quality=max(1, min(100, level)), method=4)
+
+def capture_screen(region=None):
+    from PIL import ImageGrab
+    if region is not None:
+        x, y, width, height = region
+        return ImageGrab.grab(bbox=(x, y, x + width, y + height))
+    return ImageGrab.grab()
+
+def screenshot_path(prefix="screenshot", fmt=SCREENSHOT_FORMAT):
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    ext = "jpg" if normalize_image_format(fmt) == "jpeg" else normalize_image_format(fmt)
+    return os.path.join(SCREENSHOT_DIR, f"{prefix}_{timestamp}.{ext}")
+
+def image_hash(image, size=SCREENSHOT_HASH_SIZE):
+    from PIL import Image
+    return image.convert("L").resize(size, Image.BOX).tobytes()
+
+def changed_blocks(previous, current, tolerance=8):
+    return sum(abs(a - b) > tolerance for a, b in zip(previous, current))
+
+@perf_timed("screenshot:capture")
+def take_screenshot(save_path=None, region=None, fmt=SCREENSHOT_FORMAT, level=None):
     try:
         if save_path is None:
-            screenshot_dir = os.path.join(os.path.expanduser("~"), "Screenshots")
-            os.makedirs(screenshot_dir, exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            save_path = os.path.join(screenshot_dir, f"screenshot_{timestamp}.png")
+            save_path = screenshot_path("screenshot_region" if region else "screenshot", fmt)
         
-        screenshot = ImageGrab.grab()
-        screenshot.save(save_path)
-        logging.info(f"Screenshot saved: {save_path}")
-        return f"Screenshot saved: {save_path}"
+        screenshot = capture_screen(region)
+        encode_image(screenshot, save_path, fmt, level)
+        label = "Region screenshot" if region else "Screenshot"
+        logging.info("%s saved: %s", label, save_path)
+        return f"{label} saved: {save_path}"
     except Exception as e:
         logging.exception("Screenshot failed")
         return f"Screenshot error: {e}"
 
-def take_screenshot_region():
-    try:
-        screenshot_dir = os.path.join(os.path.expanduser("~"), "Screenshots")
-        os.makedirs(screenshot_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        save_path = os.path.join(screenshot_dir, f"screenshot_region_{timestamp}.png")
-        
-        screenshot = ImageGrab.grab(bbox=(0, 0, 1024, 768))
-        screenshot.save(save_path)
-        logging.info(f"Region screenshot saved: {save_path}")
-        return f"Region screenshot saved: {save_path}"
-    except Exception as e:
-        logging.exception("Region screenshot failed")
-        return f"Screenshot error: {e}"
+def take_screenshot_region(region=SCREENSHOT_REGION, fmt=SCREENSHOT_FORMAT, level=None):
+    return take_screenshot(region=region, fmt=fmt, level=level)
+
+# Created up front: the pool starts its thread on first submit, and a lazy check here could race
+_screenshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot")
+
+def take_screenshot_async(on_done, **kwargs):
+    future = _screenshot_executor.submit(take_screenshot, **kwargs)
+    future.add_done_callback(lambda f: on_done(f.result()))
+    return future
+
+class IntervalCapture:
+    def __init__(self, interval, duration=None, region=None, fmt=SCREENSHOT_FORMAT, level=None,
+                 max_frames=SCREENSHOT_MAX_FRAMES, min_changed=SCREENSHOT_MIN_CHANGED_BLOCKS, on_event=None):
+        self.interval = interval
+        self.duration = duration
+        self.region = region
+        self.fmt = fmt
+        self.level = level
+        self.max_frames = max_frames
+        self.min_changed = min_changed
+        self.on_event = on_event
+        self.stop_event = threading.Event()
+        self.saved = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        deadline = time.monotonic() + self.duration if self.duration else None
+        previous = None
+        while not self.stop_event.is_set() and self.saved < self.max_frames:
+            started = time.monotonic()
+            if deadline is not None and started >= deadline:
+                break
+            try:
+                image = capture_screen(self.region)
+                digest = image_hash(image)
+                if previous is not None and changed_blocks(previous, digest) < self.min_changed:
+                    self.skipped += 1
+                else:
+                    path = screenshot_path("capture", self.fmt)
+                    encode_image(image, path, self.fmt, self.level)
+                    self.saved += 1
+                    self.bytes_written += os.path.getsize(path)
+                    previous = digest
+            except Exception as e:
+                logging.exception("Interval capture failed")
+                if self.on_event:
+                    self.on_event(f"Interval capture stopped: {e}")
+                return
+            self.stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
+        if self.on_event:
+            self.on_event(self.summary())
+
+    def summary(self):
+        return (f"Interval capture finished: {self.saved} frames saved "
+                f"({self.bytes_written / 1024**2:.1f} MB), {self.skipped} unchanged frames skipped")
+
+def parse_screenshot_request(text):
+    options = {"region": None, "fmt": SCREENSHOT_FORMAT, "level": None, "interval": None, "duration": None}
+    text = text.lower()
+    match = re.search(r"(?:region|area)\s+(\d+)[,\s]+(\d+)[,\s]+(\d+)[,\s]+(\d+)", text)
+    if match:
+        options["region"] = tuple(int(v) for v in match.groups())
+    elif re.search(r"\b(region|area)\b", text):
+        options["region"] = SCREENSHOT_REGION
+    match = re.search(r"\b(png|jpe?g|webp)\b(?:\s+(\d+))?", text)
+    if match:
+        options["fmt"] = normalize_image_format(match.group(1))
+        if match.group(2):
+            options["level"] = int(match.group(2))
+    match = re.search(r"every\s+(\d+(?:\.\d+)?\s*[a-z]+)", text)
+    if match:
+        options["interval"] = parse_duration(match.group(1))
+    match = re.search(r"for\s+(\d+(?:\.\d+)?\s*[a-z]+)", text)
+    if match:
+        options["duration"] = parse_duration(match.group(1))
+    return options
 
 def toggle_theme(app_instance, current_theme):
     new_theme = "light" if current_theme == "dark" else "dark"
@@ -303,7 +3028,7 @@ def toggle_theme(app_instance, current_theme):
 
 def save_chat_history(chat_content, filename=None):
     try:
-        history_dir = os.path.join(os.path.expanduser("~"), "ChatHistory")
+        history_dir = CHAT_HISTORY_DIR
         os.makedirs(history_dir, exist_ok=True)
         
         if filename is None:
@@ -313,91 +3038,965 @@ def save_chat_history(chat_content, filename=None):
         filepath = os.path.join(history_dir, filename)
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(chat_content)
-        logging.info(f"Chat history saved: {filepath}")
+        logging.info("Chat history saved: %s", filepath)
         return f"Chat history saved: {filepath}"
     except Exception as e:
         logging.exception("Failed to save chat history")
         return f"Error saving chat history: {e}"
 
-def load_chat_history(filename):
+class ChatStore:
+    def __init__(self, db_path=CHAT_DB):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.writes = queue.SimpleQueue()
+        self.writer = None
+        self.lock = threading.Lock()
+        self.fts = True
+        self.sessions_started = 0
+
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                started REAL NOT NULL,
+                source TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                session_id INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                role TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id);
+        """)
+        try:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+                    USING fts5(text, content='messages', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                    INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE scans
+            self.fts = False
+        self.local.conn = conn
+        return conn
+
+    def _start_writer(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self.writes.get()]
+            while True:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for item in batch:
+                kind = item[0]
+                try:
+                    if kind == "session":
+                        cur = conn.execute("INSERT INTO sessions(started, source) VALUES (?, ?)", (time.time(), item[2]))
+                        item[1].set_result(cur.lastrowid)
+                    elif kind == "message":
+                        # Sessions are queued before their messages, so the future is settled by now
+                        if not item[1].done() or item[1].exception() is not None:
+                            logging.warning("Dropping chat message for a session that failed to start")
+                            continue
+                        conn.execute("INSERT INTO messages(session_id, ts, role, text) VALUES (?, ?, ?, ?)",
+                                     (item[1].result(), item[2], item[3], item[4]))
+                    elif kind == "flush":
+                        conn.commit()
+                        item[1].set()
+                    elif kind == "stop":
+                        stop = True
+                except Exception as e:
+                    logging.exception("Chat store write failed")
+                    if kind == "session":
+                        item[1].set_exception(e)
+                    elif kind == "flush":
+                        item[1].set()
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                logging.exception("Chat store commit failed")
+            if stop:
+                return
+
+    def start_session(self, source=None):
+        future = Future()
+        self._start_writer()
+        with self.lock:
+            self.sessions_started += 1
+            number = self.sessions_started
+        self.writes.put(("session", future, source or f"chat:{datetime.now():%Y%m%d_%H%M%S}:{os.getpid()}:{number}"))
+        return future
+
+    def append(self, session, role, text):
+        self.writes.put(("message", session, time.time(), role, text))
+
+    def flush(self, timeout=5):
+        if self.writer is None:
+            return
+        done = threading.Event()
+        self.writes.put(("flush", done))
+        done.wait(timeout)
+
+    def close(self):
+        if self.writer is not None:
+            self.flush()
+            self.writes.put(("stop",))
+
+    def sessions(self, limit=20):
+        return self._connect().execute("""
+            SELECT s.id, s.started, s.source, COUNT(m.id)
+            FROM sessions s LEFT JOIN messages m ON m.session_id = s.id
+            GROUP BY s.id ORDER BY s.id DESC LIMIT ?""", (limit,)).fetchall()
+
+    def page(self, session_id, page=1, page_size=CHAT_PAGE_SIZE):
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+        rows = conn.execute("SELECT ts, role, text FROM messages WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                            (session_id, page_size, (page - 1) * page_size)).fetchall()
+        return rows, total
+
+    def search(self, query, limit=20):
+        conn = self._connect()
+        if self.fts:
+            terms = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+            return conn.execute("""
+                SELECT m.session_id, m.ts, m.role, snippet(messages_fts, 0, '[', ']', '...', 12)
+                FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?""", (terms, limit)).fetchall()
+        return conn.execute("""
+            SELECT session_id, ts, role, substr(text, 1, 120) FROM messages
+            WHERE text LIKE ? ORDER BY id DESC LIMIT ?""", (f"%{query}%", limit)).fetchall()
+
+    def find_source(self, source):
+        row = self._connect().execute("SELECT id FROM sessions WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def import_text_file(self, filepath):
+        source = f"import:{os.path.basename(filepath)}"
+        existing = self.find_source(source)
+        if existing is not None:
+            return existing, 0
+        messages = []
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.rstrip("\n")
+                match = re.match(r"(you|assistant): (.*)", line)
+                if match:
+                    messages.append([match.group(1), match.group(2)])
+                elif messages:
+                    messages[-1][1] += "\n" + line
+                elif line.strip():
+                    messages.append(["assistant", line])
+        stamp = re.search(r"(\d{8}_\d{6})", os.path.basename(filepath))
+        if stamp:
+            started = datetime.strptime(stamp.group(1), "%Y%m%d_%H%M%S").timestamp()
+        else:
+            started = os.path.getmtime(filepath)
+        conn = self._connect()
+        with conn:
+            cur = conn.execute("INSERT INTO sessions(started, source) VALUES (?, ?)", (started, source))
+            session_id = cur.lastrowid
+            conn.executemany("INSERT INTO messages(session_id, ts, role, text) VALUES (?, ?, ?, ?)",
+                             [(session_id, started, role, text.rstrip("\n")) for role, text in messages])
+        return session_id, len(messages)
+
+chat_store = ChatStore()
+
+def import_chat_histories(history_dir=CHAT_HISTORY_DIR):
     try:
-        history_dir = os.path.join(os.path.expanduser("~"), "ChatHistory")
-        filepath = os.path.join(history_dir, filename)
-        
-        if not os.path.exists(filepath):
-            return f"File not found: {filepath}"
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        if not os.path.isdir(history_dir):
+            return f"No chat history folder at {history_dir}"
+        imported = []
+        for name in sorted(os.listdir(history_dir)):
+            if not name.endswith(".txt"):
+                continue
+            session_id, count = chat_store.import_text_file(os.path.join(history_dir, name))
+            if count:
+                imported.append(f"{name} -> session {session_id} ({count} messages)")
+        logging.info("Imported %d chat history files", len(imported))
+        if not imported:
+            return "No new chat history files to import"
+        return f"Imported {len(imported)} chat histories:\n" + "\n".join(imported)
+    except Exception as e:
+        logging.exception("Failed to import chat histories")
+        return f"Error importing chat histories: {e}"
+
+def load_chat_history(filename, page=1):
+    try:
+        if filename.isdigit():
+            session_id = int(filename)
+        else:
+            filepath = os.path.join(CHAT_HISTORY_DIR, filename)
+            if not os.path.exists(filepath):
+                return f"File not found: {filepath}"
+            session_id, _ = chat_store.import_text_file(filepath)
         
-        logging.info(f"Chat history loaded: {filepath}")
-        return content
+        rows, total = chat_store.page(session_id, page)
+        if not total:
+            return f"No messages in chat session {session_id}"
+        pages = (total + CHAT_PAGE_SIZE - 1) // CHAT_PAGE_SIZE
+        content = "\n".join(f"{role}: {text}" for _, role, text in rows)
+        header = f"Chat session {session_id}, page {page}/{pages} ({total} messages)"
+        if page < pages:
+            content += f"\n\n(type 'load chat {session_id} page {page + 1}' for more)"
+        logging.info("Chat history loaded: session %s page %d", session_id, page)
+        return f"{header}\n\n{content}"
     except Exception as e:
         logging.exception("Failed to load chat history")
         return f"Error loading chat history: {e}"
 
-def list_chat_histories():
-    try:
-        history_dir = os.path.join(os.path.expanduser("~"), "ChatHistory")
-        if not os.path.exists(history_dir):
-            return "No chat history found"
-        
-        files = os.listdir(history_dir)
-        if not files:
-            return "No chat history files"
-        
-        history_list = "\n".join([f"{i+1}. {f}" for i, f in enumerate(sorted(files)[:20])])
-        logging.info("Chat histories listed")
-        return f"Available chat histories:\n{history_list}"
-    except Exception as e:
-        logging.exception("Failed to list chat histories")
-        return f"Error listing chat histories: {e}"
+def list_chat_histories():
+    try:
+        sessions = chat_store.sessions()
+        if not sessions:
+            return "No chat history found"
+        
+        history_list = "\n".join(
+            f"{session_id}. {datetime.fromtimestamp(started):%Y-%m-%d %H:%M} - {count} messages ({source})"
+            for session_id, started, source, count in sessions)
+        logging.info("Chat histories listed")
+        return f"Available chat histories (load chat [id]):\n{history_list}"
+    except Exception as e:
+        logging.exception("Failed to list chat histories")
+        return f"Error listing chat histories: {e}"
+
+def search_chat_history(query):
+    try:
+        started = time.time()
+        rows = chat_store.search(query)
+        elapsed = time.time() - started
+        if not rows:
+            return f"No past messages match '{query}'"
+        results = "\n".join(f"[session {session_id}, {datetime.fromtimestamp(ts):%Y-%m-%d %H:%M}] {role}: {text}"
+                            for session_id, ts, role, text in rows)
+        logging.info("Chat history searched for: %s", query)
+        return f"Found {len(rows)} messages matching '{query}' in {elapsed * 1000:.0f} ms:\n\n{results}"
+    except Exception as e:
+        logging.exception("Chat history search failed")
+        return f"Chat search error: {e}"
+
+def check_resource_alerts():
+    try:
+        alerts = []
+        snapshot = metrics_sampler.snapshot()
+        cpu_percent = snapshot["cpu"]
+        memory = snapshot["memory"]
+        disk = snapshot["disk"]
+        
+        if cpu_percent > ALERT_THRESHOLDS["cpu"]:
+            alerts.append(f"🔴 CPU ALERT: {cpu_percent}% (Threshold: {ALERT_THRESHOLDS['cpu']}%)")
+        
+        if memory.percent > ALERT_THRESHOLDS["memory"]:
+            alerts.append(f"🔴 MEMORY ALERT: {memory.percent}% (Threshold: {ALERT_THRESHOLDS['memory']}%)")
+        
+        if not snapshot.get("mounts") and disk.percent > ALERT_THRESHOLDS["disk"]:
+            alerts.append(f"🔴 DISK ALERT: {disk.percent}% (Threshold: {ALERT_THRESHOLDS['disk']}%)")
+        alerts.extend(resource_alerts(snapshot))
+        
+        sustained = [a for a in alert_engine.active_alerts() if a not in alerts]
+        alerts.extend(sustained)
+        if alerts:
+            alert_message = "⚠️ SYSTEM ALERTS:\n" + "\n".join(alerts)
+            if any("DISK ALERT" in a for a in alerts):
+                alert_message += "\n\nType 'disk usage [path]' to see what is using the space."
+            logging.warning("Resource alerts triggered: %s", alerts)
+            return alert_message
+        else:
+            return "✅ All system resources are within normal limits"
+    except Exception as e:
+        logging.exception("Failed to check resource alerts")
+        return f"Alert check error: {e}"
+
+def set_alert_threshold(resource, threshold):
+    try:
+        if resource.lower() in ALERT_THRESHOLDS:
+            ALERT_THRESHOLDS[resource.lower()] = int(threshold)
+            alert_engine.set_default_rule(resource.lower(), int(threshold))
+            logging.info("Alert threshold updated: %s=%s", resource, threshold)
+            return f"Alert threshold updated: {resource}={threshold}{ALERT_UNITS.get(resource.lower(), '%')}"
+        else:
+            return f"Unknown resource: {resource}. Available: {', '.join(ALERT_THRESHOLDS)}"
+    except ValueError:
+        return "Invalid threshold value. Must be a number between 0-100"
+    except Exception as e:
+        logging.exception("Failed to set alert threshold")
+        return f"Error setting threshold: {e}"
+
+class AlertRule:
+    def __init__(self, metric, raise_at, clear_at=None, sustain=0.0, process=None, above=True):
+        table = PROCESS_ALERT_METRICS if process else HOST_ALERT_METRICS
+        device = not process and ":" in metric and metric.split(":", 1)[0] in DEVICE_ALERT_METRICS
+        if metric not in table and not device:
+            available = ", ".join(table) if process else ", ".join(table) + ", " + \
+                ", ".join(f"{m}:DEVICE" for m in DEVICE_ALERT_METRICS)
+            raise ValueError(f"Unknown metric: {metric}. Available: {available}")
+        if clear_at is None:
+            clear_at = raise_at - min(ALERT_HYSTERESIS, raise_at / 10) if above else raise_at + ALERT_HYSTERESIS
+        if (above and clear_at > raise_at) or (not above and clear_at < raise_at):
+            raise ValueError("The clear threshold must be on the safe side of the raise threshold")
+        self.id = None
+        self.metric = metric
+        self.raise_at = float(raise_at)
+        self.clear_at = float(clear_at)
+        self.sustain = float(sustain)
+        self.process = process
+        self.above = above
+        self.field = PROCESS_ALERT_METRICS.get(metric) if process else metric
+        self.matches = re.compile(fnmatch.translate(process.lower())).match if process else None
+
+    def describe(self):
+        subject = f"process {self.process} {self.metric}" if self.process else self.metric
+        text = f"{subject} {'>' if self.above else '<'} {self.raise_at:g}"
+        if self.sustain:
+            text += f" for {self.sustain:g}s"
+        return text + f" clear {self.clear_at:g}"
+
+def parse_alert_rule(text):
+    match = re.fullmatch(r"(?:process\s+(?P<process>\S+)\s+)?(?P<metric>[a-z_]+(?::\S+)?)\s*(?P<op>[<>])=?\s*"
+                         r"(?P<raise>[\d.]+)%?(?:\s+for\s+(?P<sustain>\S+))?"
+                         r"(?:\s+clear(?:\s+at)?\s+(?P<clear>[\d.]+)%?)?", text.strip(), re.IGNORECASE)
+    if not match:
+        raise ValueError("Rule format: [process NAME] METRIC >|< VALUE [for 30s] [clear VALUE]")
+    sustain = 0.0
+    if match.group("sustain"):
+        sustain = parse_duration(match.group("sustain"))
+        if sustain is None:
+            raise ValueError(f"Invalid duration: {match.group('sustain')}")
+    clear = float(match.group("clear")) if match.group("clear") else None
+    metric, _, device = match.group("metric").partition(":")
+    metric = metric.lower() + (":" + device if device else "")
+    process = match.group("process").lower() if match.group("process") else None
+    return AlertRule(metric, float(match.group("raise")), clear, sustain, process, match.group("op") == ">")
+
+def compile_alert_rules(rules, key):
+    groups = {}
+    for rule in rules:
+        groups.setdefault(getattr(rule, key), ([], []))[0 if rule.above else 1].append(rule)
+    compiled = {}
+    for field, (above, below) in groups.items():
+        above.sort(key=lambda r: r.raise_at)
+        below.sort(key=lambda r: r.raise_at)
+        compiled[field] = ([r.raise_at for r in above], above, [r.raise_at for r in below], below)
+    return compiled
+
+def triggered_alert_rules(compiled, values):
+    # Rules are sorted by threshold, so the triggered ones are a prefix (above) or suffix (below)
+    for field, (above_at, above, below_at, below) in compiled.items():
+        value = values.get(field)
+        if value is None:
+            continue
+        yield from above[:bisect.bisect_right(above_at, value)]
+        yield from below[bisect.bisect_left(below_at, value):]
+
+class AlertEngine:
+    def __init__(self, thresholds=ALERT_THRESHOLDS, sustain=ALERT_SUSTAIN,
+                 process_interval=ALERT_PROCESS_INTERVAL):
+        self.lock = threading.Lock()
+        self.rules = {}
+        self.defaults = {}
+        self.next_id = 1
+        self.host_state = {}
+        self.process_state = {}
+        self.host_rules = {}
+        self.process_rules = ()
+        self.name_cache = {}
+        self.process_interval = process_interval
+        self.processes_seen_at = None
+        self.default_sustain = sustain
+        self.outbox = queue.SimpleQueue()
+        self.listeners = []
+        self.dispatcher = None
+        # A private table, so alert sampling never shortens the CPU window list_top_processes reports
+        self.table = ProcessTable()
+        for metric, threshold in thresholds.items():
+            self.set_default_rule(metric, threshold)
+
+    def _compile(self):
+        self.host_rules = compile_alert_rules([r for r in self.rules.values() if not r.process], "metric")
+        self.process_rules = tuple(r for r in self.rules.values() if r.process)
+        self.name_cache = {}
+        self.host_state = {k: v for k, v in self.host_state.items() if k in self.rules}
+        self.process_state = {k: v for k, v in self.process_state.items() if k[0] in self.rules}
+
+    def add(self, rule):
+        with self.lock:
+            rule.id = self.next_id
+            self.next_id += 1
+            self.rules[rule.id] = rule
+            self._compile()
+        return rule
+
+    def remove(self, rule_id):
+        with self.lock:
+            rule = self.rules.pop(rule_id, None)
+            self.defaults = {m: i for m, i in self.defaults.items() if i != rule_id}
+            self._compile()
+        return rule
+
+    def set_default_rule(self, metric, threshold):
+        if metric in self.defaults:
+            self.remove(self.defaults[metric])
+        rule = self.add(AlertRule(metric, threshold, sustain=self.default_sustain))
+        self.defaults[metric] = rule.id
+        return rule
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def attach(self, sampler, table=None):
+        self.table = table or self.table
+        sampler.subscribe(self.on_sample)
+
+    def on_sample(self, snapshot):
+        metrics = alert_metrics(snapshot)
+        processes = None
+        if self.process_rules:
+            with_io = any(r.metric == "io" for r in self.process_rules)
+            current = self.table.current(self.process_interval, with_io)
+            # Process rows only change every process_interval; skip re-evaluating unchanged rows
+            if self.table.refreshed_at != self.processes_seen_at:
+                self.processes_seen_at = self.table.refreshed_at
+                processes = current
+        with perf.span("alerts:evaluate"):
+            events = self.evaluate(metrics, processes)
+        for event in events:
+            self._publish(event)
+
+    def _rules_for(self, name):
+        compiled = self.name_cache.get(name)
+        if compiled is None:
+            lowered = name.lower()
+            matched = [r for r in self.process_rules if r.matches(lowered)]
+            compiled = self.name_cache[name] = compile_alert_rules(matched, "field") if matched else None
+        return compiled
+
+    @staticmethod
+    def _step(states, key, rule, value, now, events, subject):
+        triggered = value >= rule.raise_at if rule.above else value <= rule.raise_at
+        state = states.get(key)
+        if state is None:
+            if not triggered:
+                return
+            state = states[key] = [now, False, subject]
+        if not state[1]:
+            if not triggered:
+                del states[key]
+            elif now - state[0] >= rule.sustain:
+                state[1] = True
+                events.append(("raised", rule, subject, value))
+        elif (value < rule.clear_at) if rule.above else (value > rule.clear_at):
+            del states[key]
+            events.append(("cleared", rule, subject, value))
+
+    def evaluate(self, metrics, processes=None, now=None):
+        now = time.monotonic() if now is None else now
+        events = []
+        step = self._step
+        with self.lock:
+            rules = self.rules
+            states = self.host_state
+            stepped = set(states)
+            for rule_id in stepped:
+                rule = rules[rule_id]
+                value = metrics.get(rule.metric)
+                if value is not None:
+                    step(states, rule_id, rule, value, now, events, None)
+            for rule in triggered_alert_rules(self.host_rules, metrics):
+                if rule.id not in stepped:
+                    step(states, rule.id, rule, metrics[rule.metric], now, events, None)
+            if processes is not None and self.process_rules:
+                states = self.process_state
+                stepped = set(states)
+                seen = {}
+                for proc in processes:
+                    compiled = self._rules_for(proc["name"])
+                    if compiled is not None:
+                        seen[(proc["pid"], proc["create_time"])] = (proc, compiled)
+                for rule_id, key in list(stepped):
+                    if key not in seen:
+                        since, active, subject = states.pop((rule_id, key))
+                        if active:
+                            events.append(("cleared", rules[rule_id], f"{subject} exited", None))
+                        continue
+                    rule = rules[rule_id]
+                    value = seen[key][0].get(rule.field)
+                    if value is not None:
+                        step(states, (rule_id, key), rule, value, now, events, states[(rule_id, key)][2])
+                for key, (proc, compiled) in seen.items():
+                    subject = None
+                    for rule in triggered_alert_rules(compiled, proc):
+                        if (rule.id, key) not in stepped:
+                            subject = subject or f"{proc['name']} (pid={proc['pid']})"
+                            step(states, (rule.id, key), rule, proc[rule.field], now, events, subject)
+        return events
+
+    def active_alerts(self):
+        with self.lock:
+            states = list(self.host_state.items()) + [(k[0], v) for k, v in self.process_state.items()]
+            return [self._describe("raised", self.rules[rule_id], subject, None)
+                    for rule_id, (since, active, subject) in states if active]
+
+    def _describe(self, kind, rule, subject, value):
+        name = subject or rule.metric.upper()
+        if rule.process and subject:
+            name = f"{subject} {rule.metric}"
+        reading = f" {value:.1f}" if value is not None else ""
+        if kind == "raised":
+            return f"🔴 ALERT #{rule.id} {name}{reading} ({rule.describe()})"
+        return f"✅ CLEARED #{rule.id} {name}{reading} ({rule.describe()})"
+
+    def _publish(self, event):
+        if self.dispatcher is None:
+            self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self.dispatcher.start()
+        self.outbox.put(event)
+
+    def _dispatch(self):
+        while True:
+            message = self._describe(*self.outbox.get())
+            logging.warning("%s", message)
+            for callback in self.listeners:
+                try:
+                    callback(message)
+                except Exception:
+                    logging.exception("Alert listener failed")
+
+    def describe_rules(self):
+        with self.lock:
+            rules = list(self.rules.values())
+            active = {rule_id for rule_id, state in self.host_state.items() if state[1]}
+            active.update(rule_id for (rule_id, key), state in self.process_state.items() if state[1])
+        lines = [f"#{r.id} {r.describe()}{' [ACTIVE]' if r.id in active else ''}" for r in rules]
+        return "Alert rules:\n" + "\n".join(lines) if lines else "No alert rules"
+
+alert_engine = AlertEngine()
+
+def add_alert_rule(text):
+    try:
+        rule = alert_engine.add(parse_alert_rule(text))
+    except ValueError as e:
+        return str(e)
+    logging.info("Alert rule added: %s", rule.describe())
+    return f"Alert rule #{rule.id} added: {rule.describe()}"
+
+class Assistant:
+    speak_replies = True
+    llm_priority = PRIORITY_INTERACTIVE
+
+    def __init__(self, chat_session=None):
+        self.current_theme = "dark"
+        self.chat_history = deque(maxlen=CHAT_HISTORY_LIMIT)
+        self.chat_session = chat_session or chat_store.start_session()
+        self.context = ConversationContext()
+        self.capture = None
+        self.search_cancel = threading.Event()
+        self.duplicates = []
+
+    def write(self, text):
+        pass
+
+    def post_ui(self, fn):
+        fn()
+
+    def log(self, text, role="assistant"):
+        self.write(f"{role}: {text}\n\n")
+        self.chat_history.append(f"{role}: {text}")
+        chat_store.append(self.chat_session, role, text)
+
+    def begin_stream(self, role="assistant"):
+        self.write(f"{role}: ")
+
+    def append_stream(self, chunk):
+        self.write(chunk)
+
+    def end_stream(self, text, role="assistant"):
+        self.write("\n\n")
+        self.chat_history.append(f"{role}: {text}")
+        chat_store.append(self.chat_session, role, text)
+
+    def log_line(self, text):
+        # Streamed output is shown but not persisted; the final summary goes through log()
+        self.write(f"    {text}\n")
+        self.chat_history.append(f"    {text}")
+
+    def _parse_search_roots(self, query):
+        roots = None
+        if " in " in query:
+            head, where = query.rsplit(" in ", 1)
+            candidates = [os.path.expanduser(r.strip()) for r in where.split(",") if r.strip()]
+            if candidates and all(os.path.isdir(r) for r in candidates):
+                query, roots = head, candidates
+        return query.strip().strip('"'), roots
+
+    def run_search(self, query):
+        query, roots = self._parse_search_roots(query)
+        self.search_cancel.set()
+        self.search_cancel = threading.Event()
+        self.log(f"Searching for files matching: {query}... (type 'stop search' to cancel)")
+        resp = search_files(query, roots, on_match=self.log_line, cancel=self.search_cancel)
+        self.log(resp)
+
+    def run_content_search(self, query):
+        query, roots = self._parse_search_roots(query)
+        self.search_cancel.set()
+        self.search_cancel = threading.Event()
+        self.log(f"Searching file contents for: {query}... (type 'stop search' to cancel)")
+        resp = search_file_contents(query, roots, on_match=self.log_line, cancel=self.search_cancel)
+        self.log(resp)
+
+    def run_disk_usage(self, path, refresh=False):
+        self.search_cancel.set()
+        self.search_cancel = threading.Event()
+        self.log(f"Analyzing disk usage of {path or '~'}... (type 'stop search' to cancel)")
+        self.log(disk_usage(path, on_progress=self.log_line, cancel=self.search_cancel, refresh=refresh))
+
+    def run_duplicate_search(self, options):
+        min_size = DUPLICATE_MIN_SIZE
+        match = re.search(r"\b(?:over|above|larger than|bigger than)\s+(\d+(?:\.\d+)?\s*[kmgt]?b?)\b", options, re.IGNORECASE)
+        if match:
+            min_size = parse_size(match.group(1))
+            options = options[:match.start()] + options[match.end():]
+        options = options.strip()
+        where = re.search(r"\bin\s+(.+)$", options, re.IGNORECASE)
+        if where:
+            options = options[:where.start()].strip()
+        if options:
+            self.log(f"Unknown option: {options}\nUsage: find duplicates [over SIZE] [in PATH[, PATH...]]")
+            return
+        roots = None
+        if where:
+            roots = [os.path.expanduser(r.strip().strip('"')) for r in where.group(1).split(",") if r.strip()]
+            missing = [r for r in roots if not os.path.isdir(r)]
+            if missing:
+                self.log(f"Not a directory: {', '.join(missing)}")
+                return
+        self.search_cancel.set()
+        self.search_cancel = threading.Event()
+        self.duplicates = []
+
+        def on_group(group):
+            self.duplicates.append(group)
+            if len(self.duplicates) <= DUPLICATE_MAX_LISTED:
+                self.log_line(format_duplicate_group(len(self.duplicates), group))
+
+        self.log(f"Looking for duplicate files in {', '.join(roots or ['~'])}... (type 'stop search' to cancel)")
+        resp, _ = duplicate_files(roots, on_group=on_group, on_progress=self.log_line,
+                                  cancel=self.search_cancel, min_size=min_size)
+        if len(self.duplicates) > DUPLICATE_MAX_LISTED:
+            resp += f"\n(listed the first {DUPLICATE_MAX_LISTED} groups)"
+        if self.duplicates:
+            resp += ("\nType 'delete duplicates [all|1,3-5] [in PATH]' to remove the extra copies; "
+                     "the first path in each group is kept, or with 'in PATH' only copies under PATH are removed.")
+        self.log(resp)
+
+    def remove_duplicates(self, options):
+        if not self.duplicates:
+            self.log("No duplicate search results yet. Type 'duplicates [in PATH]' first.")
+            return
+        under = None
+        where = re.search(r"\bin\s+(.+)$", options.strip(), re.IGNORECASE)
+        if where:
+            under = where.group(1).strip().strip('"')
+            options = options.strip()[:where.start()]
+        try:
+            selection = parse_selection(options, len(self.duplicates))
+        except ValueError as e:
+            self.log(f"{e}\nUsage: delete duplicates [all|1,3-5] [in PATH]")
+            return
+        self.log(delete_duplicates(self.duplicates, selection, under))
+
+    def start_shell_job(self, cmd, timeout=SHELL_TIMEOUT):
+        return run_shell_command(cmd, on_output=lambda job, line: self.log_line(f"[{job.id}] {line}"),
+                                 on_done=lambda job: self.log(job.summary()), timeout=timeout)
+
+    def start_screenshot(self, **kwargs):
+        take_screenshot_async(self.log, **kwargs)
+
+    def toggle_app_theme(self):
+        self.current_theme = "light" if self.current_theme == "dark" else "dark"
+        self.log(f"Theme switched to {self.current_theme.upper()}")
+
+    def handle_prompt(self, prompt):
+        with perf.span("command") as span:
+            command = command_profiler.run(self.dispatch_prompt, prompt)
+            span.name = "command:" + command
+        return command
+
+    def dispatch_prompt(self, prompt):
+        lower = prompt.lower()
+        if lower.startswith("open "):
+            target = prompt[5:].strip()
+            resp = open_application(target)
+            self.log(resp)
+            return "open"
+        if lower.startswith("list processes") or "processes" in lower or re.match(r"top (cpu|mem|memory|io)\b", lower):
+            if re.search(r"\b(mem|memory|ram)\b", lower):
+                sort_by = "memory"
+            elif re.search(r"\b(io|disk)\b", lower):
+                sort_by = "io"
+            else:
+                sort_by = "cpu"
+            resp = list_top_processes(sort_by=sort_by)
+            self.log(resp)
+            return "processes"
+        if lower.startswith("run ") or lower.startswith("exec "):
+            cmd = prompt.split(" ",1)[1]
+            timeout = SHELL_TIMEOUT
+            match = re.match(r"--timeout[= ](\d+)\s+(.*)", cmd, re.DOTALL)
+            if match:
+                timeout, cmd = int(match.group(1)), match.group(2)
+            resp = self.start_shell_job(cmd, timeout)
+            self.log(resp)
+            return "run"
+        if lower == "jobs" or lower.startswith("list jobs"):
+            self.log(job_runner.describe())
+            return "jobs"
+        match = re.match(r"(kill|cancel|stop) job #?(\d+)", lower)
+        if match:
+            self.log(job_runner.cancel(int(match.group(2))))
+            return "kill_job"
+        match = re.match(r"job #?(\d+)", lower)
+        if match:
+            self.log(job_runner.tail(int(match.group(1))))
+            return "job_tail"
+        # Options must follow whitespace, so "find dupes.txt" stays a filename search
+        match = re.match(r"(?:delete|remove) (?:duplicates|duplicate files|dupes)(?:\s+(.*))?$", prompt,
+                         re.IGNORECASE | re.DOTALL)
+        if match:
+            self.remove_duplicates(match.group(1) or "")
+            return "delete_duplicates"
+        match = re.match(r"(?:find |show |list )?(?:duplicates|duplicate files|dupes)(?:\s+(.*))?$", prompt,
+                         re.IGNORECASE | re.DOTALL)
+        if match:
+            self.run_duplicate_search(match.group(1) or "")
+            return "duplicates"
+        if lower.startswith("delete "):
+            path = prompt.split(" ",1)[1]
+            resp = delete_path(path)
+            self.log(resp)
+            return "delete"
+        if lower.startswith("system info") or lower.startswith("sysinfo"):
+            resp = get_system_info()
+            self.log(resp)
+            return "system_info"
+        parts = prompt.split(None, 2)
+        # Only claim the prompt when a metric follows, so "history of Rome" still reaches the LLM
+        if (len(parts) > 1 and parts[0].lower() in ("history", "chart", "peak")
+                and METRIC_ALIASES.get(parts[1].lower(), parts[1].lower()) in METRICS_HISTORY_METRICS):
+            window = parts[2] if len(parts) > 2 else ("today" if lower.startswith("peak ") else "1h")
+            resp = get_metric_history(parts[1], window, with_chart=not lower.startswith("peak "))
+            self.log(resp)
+            return "history"
+        if lower.startswith("health") or lower.startswith("status"):
+            resp = get_health_status()
+            self.log(resp)
+            return "health"
+        if lower in ("stop", "quiet", "stop speaking", "be quiet", "shut up"):
+            stop_speaking()
+            self.log("Speech stopped.")
+            return "stop_speaking"
+        if lower.startswith("stop search") or lower.startswith("cancel search"):
+            self.search_cancel.set()
+            self.log("Search cancelled.")
+            return "stop_search"
+        if lower.startswith("grep ") or lower.startswith("which file contains "):
+            query = prompt[5:] if lower.startswith("grep ") else prompt[len("which file contains "):]
+            self.run_content_search(query)
+            return "grep"
+        match = re.match(r"(?:disk usage|du|what(?:'s| is) (?:eating|using|filling)(?: up)? (?:my )?(?:disk|space))\b"
+                         r"(?:\s+(fresh|rescan))?(?:\s+(?:of|in|for|on))?\s*(.*)", prompt, re.IGNORECASE)
+        if match:
+            path = match.group(2).strip().strip('"').rstrip("?") or None
+            self.run_disk_usage(path, refresh=bool(match.group(1)))
+            return "disk_usage"
+        if lower.startswith("search ") or lower.startswith("find "):
+            query = prompt.split(" ", 1)[1].strip()
+            self.run_search(query)
+            return "search"
+        if lower.startswith("clipboard") or lower.startswith("get clip"):
+            resp = get_clipboard()
+            self.log(resp)
+            return "clipboard_get"
+        if lower.startswith("copy "):
+            text = prompt[5:].strip()
+            resp = set_clipboard(text)
+            self.log(resp)
+            return "clipboard_set"
+        if lower.startswith("clear clip"):
+            resp = clear_clipboard()
+            self.log(resp)
+            return "clipboard_clear"
+        if lower.startswith("stop capture"):
+            if self.capture is not None:
+                self.capture.stop()
+                self.capture = None
+            else:
+                self.log("No interval capture running")
+            return "stop_capture"
+        if lower.startswith("screenshot") or lower.startswith("screen shot") or lower.startswith("snap"):
+            options = parse_screenshot_request(lower)
+            if options["interval"]:
+                if self.capture is not None:
+                    self.capture.stop()
+                self.capture = IntervalCapture(options["interval"], options["duration"], options["region"],
+                                               options["fmt"], options["level"], on_event=self.log).start()
+                self.log(f"Capturing every {options['interval']:g}s, skipping unchanged frames "
+                         f"(type 'stop capture' to end)")
+                return "screenshot"
+            self.start_screenshot(region=options["region"], fmt=options["fmt"], level=options["level"])
+            return "screenshot"
+        if lower.startswith("theme") or lower.startswith("toggle theme") or lower.startswith("dark") or lower.startswith("light"):
+            self.post_ui(self.toggle_app_theme)
+            return "theme"
+        if lower.startswith("save chat") or lower.startswith("save history"):
+            content = "\n".join(self.chat_history)
+            resp = save_chat_history(content)
+            self.log(resp)
+            return "save_chat"
+        if lower.startswith("load chat") or lower.startswith("load history"):
+            filename = prompt.split(" ", 2)[2].strip() if len(prompt.split(" ")) > 2 else None
+            if filename:
+                page = 1
+                match = re.match(r"(.*?)\s+page\s+(\d+)$", filename, re.IGNORECASE)
+                if match:
+                    filename, page = match.group(1), max(1, int(match.group(2)))
+                content = load_chat_history(filename, page)
+                self.log(content)
+            else:
+                self.log("Please specify session or filename: load chat [id|filename] [page N]")
+            return "load_chat"
+        if lower.startswith("chat search "):
+            query = prompt.split(" ", 2)[2].strip()
+            self.log(search_chat_history(query))
+            return "chat_search"
+        if lower.startswith("import chats") or lower.startswith("import history"):
+            self.log(import_chat_histories())
+            return "import_chats"
+        if lower.startswith("chat list") or lower.startswith("list chats"):
+            resp = list_chat_histories()
+            self.log(resp)
+            return "list_chats"
+        if lower in ("perf", "perf stats", "latency"):
+            self.log(perf.report())
+            return "perf"
+        if lower.startswith("perf reset"):
+            perf.reset()
+            self.log("Latency statistics cleared")
+            return "perf"
+        match = re.match(r"profile(?: next)?(?: (\d+))?(?: commands?)?$", lower)
+        if match:
+            self.log(command_profiler.arm(int(match.group(1) or 1), on_done=self.log))
+            return "profile"
+        if lower.startswith("cache stats") or lower.startswith("llm cache"):
+            self.log(llm_cache.stats())
+            return "cache_stats"
+        if lower.startswith("context stats"):
+            self.log(self.context.stats())
+            return "context_stats"
+        if lower.startswith("reset context") or lower.startswith("new topic"):
+            self.context.reset()
+            self.log("Conversation context cleared.")
+            return "reset_context"
+        if lower.startswith("llm stats") or lower.startswith("queue stats"):
+            self.log(llm_scheduler.stats())
+            return "llm_stats"
+        if lower.startswith("clear cache"):
+            llm_cache.clear()
+            self.log("LLM response cache cleared")
+            return "clear_cache"
+        match = re.match(r"(?:alert rule|add alert)\s+(.+)", prompt, re.IGNORECASE)
+        if match:
+            self.log(add_alert_rule(match.group(1)))
+            return "alert_rules"
+        if lower.startswith("alert rules") or lower.startswith("list alerts"):
+            self.log(alert_engine.describe_rules())
+            return "alert_rules"
+        match = re.match(r"remove alert #?(\d+)", lower)
+        if match:
+            rule = alert_engine.remove(int(match.group(1)))
+            self.log(f"Alert rule #{match.group(1)} removed" if rule else f"No alert rule #{match.group(1)}")
+            return "alert_rules"
+        if lower.startswith("alert") or lower.startswith("check alert"):
+            resp = check_resource_alerts()
+            self.log(resp)
+            return "alerts"
+        if lower.startswith("set alert") or lower.startswith("threshold"):
+            parts = prompt.split()
+            if len(parts) >= 3:
+                resource = parts[2]
+                try:
+                    threshold = int(parts[3])
+                    resp = set_alert_threshold(resource, threshold)
+                    self.log(resp)
+                except (ValueError, IndexError):
+                    self.log("Usage: set alert [resource] [threshold]\nResources: cpu, memory, disk (%), disk_io, net_io (MB/s)")
+            else:
+                self.log("Usage: set alert [resource] [threshold]\nResources: cpu, memory, disk (%), disk_io, net_io (MB/s)")
+            return "set_alert"
+        self.log("Thinking...", role="assistant")
+        full_prompt = self.context.build(prompt)
+        if LLM_STREAMING:
+            llm_reply = self.stream_reply(full_prompt)
+        else:
+            llm_reply = call_llm(full_prompt, priority=self.llm_priority)
+            logging.info("LLM reply: %.200s", llm_reply)
+            self.log(llm_reply)
+            if self.speak_replies:
+                try:
+                    speak(llm_reply)
+                except Exception:
+                    pass
+        if not is_llm_error(llm_reply):
+            self.context.add("you", prompt)
+            self.context.add("assistant", llm_reply)
+        return "llm"
+
+    def stream_reply(self, prompt):
+        speaker = speech_worker.stream() if self.speak_replies else None
 
-def check_resource_alerts():
-    try:
-        alerts = []
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        if cpu_percent > ALERT_THRESHOLDS["cpu"]:
-            alerts.append(f"🔴 CPU ALERT: {cpu_percent}% (Threshold: {ALERT_THRESHOLDS['cpu']}%)")
-        
-        if memory.percent > ALERT_THRESHOLDS["memory"]:
-            alerts.append(f"🔴 MEMORY ALERT: {memory.percent}% (Threshold: {ALERT_THRESHOLDS['memory']}%)")
-        
-        if disk.percent > ALERT_THRESHOLDS["disk"]:
-            alerts.append(f"🔴 DISK ALERT: {disk.percent}% (Threshold: {ALERT_THRESHOLDS['disk']}%)")
-        
-        if alerts:
-            alert_message = "⚠️ SYSTEM ALERTS:\n" + "\n".join(alerts)
-            logging.warning(f"Resource alerts triggered: {alerts}")
-            return alert_message
-        else:
-            return "✅ All system resources are within normal limits"
-    except Exception as e:
-        logging.exception("Failed to check resource alerts")
-        return f"Alert check error: {e}"
+        def on_chunk(chunk):
+            self.append_stream(chunk)
+            if speaker is not None:
+                speaker.feed(chunk)
 
-def set_alert_threshold(resource, threshold):
-    try:
-        if resource.lower() in ALERT_THRESHOLDS:
-            ALERT_THRESHOLDS[resource.lower()] = int(threshold)
-            logging.info(f"Alert threshold updated: {resource}={threshold}")
-            return f"Alert threshold updated: {resource}={threshold}%"
-        else:
-            return f"Unknown resource: {resource}. Available: cpu, memory, disk"
-    except ValueError:
-        return "Invalid threshold value. Must be a number between 0-100"
-    except Exception as e:
-        logging.exception("Failed to set alert threshold")
-        return f"Error setting threshold: {e}"
+        self.begin_stream()
+        try:
+            llm_reply = call_llm_stream(prompt, on_chunk, priority=self.llm_priority)
+        finally:
+            if speaker is not None:
+                speaker.close()
+        self.end_stream(llm_reply)
+        logging.info("LLM reply: %.200s", llm_reply)
+        return llm_reply
 
-class AssistantApp:
+class AssistantApp(Assistant):
     def __init__(self, root):
+        load_tk()
+        super().__init__()
         self.root = root
-        self.current_theme = "dark"
-        self.chat_history = []
+        self.ui_queue = queue.SimpleQueue()
+        self.prompt_pool = ThreadPoolExecutor(max_workers=PROMPT_WORKERS, thread_name_prefix="prompt")
+        alert_engine.subscribe(self.log)
         root.title("AI Desktop Assistant")
         root.geometry("900x650")
         
@@ -432,14 +4031,45 @@ class AssistantApp:
         tk.Button(actions, text="Speak", command=lambda: speak("Assistant online. Ready to help.")).pack(side='right')
 
         self.apply_theme("dark")
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
         self.log("Assistant started. Type your prompt and press Enter.")
 
-    def log(self, text, role="assistant"):
+    def write(self, text):
+        self.ui_queue.put(text)
+
+    def post_ui(self, fn):
+        self.ui_queue.put(fn)
+
+    def _drain_ui_queue(self):
+        deadline = time.perf_counter() + UI_FRAME_BUDGET_MS / 1000
+        pending = []
+        while time.perf_counter() < deadline:
+            try:
+                item = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, str):
+                pending.append(item)
+                continue
+            self._write_chat(pending)
+            pending = []
+            try:
+                item()
+            except Exception:
+                logging.exception("UI update failed")
+        self._write_chat(pending)
+        self.root.after(1 if not self.ui_queue.empty() else UI_POLL_MS, self._drain_ui_queue)
+
+    def _write_chat(self, chunks):
+        if not chunks:
+            return
         self.chat.configure(state='normal')
-        self.chat.insert('end', f"{role}: {text}\n\n")
+        self.chat.insert('end', "".join(chunks))
+        lines = int(self.chat.index('end-1c').split('.')[0])
+        if lines > CHAT_MAX_LINES:
+            self.chat.delete('1.0', f"{lines - CHAT_MAX_LINES + 1}.0")
         self.chat.configure(state='disabled')
         self.chat.see('end')
-        self.chat_history.append(f"{role}: {text}")
 
     def apply_theme(self, theme_name):
         self.current_theme = theme_name
@@ -452,7 +4082,7 @@ class AssistantApp:
         for widget in self.root.winfo_children():
             self.apply_theme_recursive(widget, theme)
         
-        logging.info(f"Theme changed to: {theme_name}")
+        logging.info("Theme changed to: %s", theme_name)
 
     def apply_theme_recursive(self, widget, theme):
         if isinstance(widget, tk.Button):
@@ -474,128 +4104,29 @@ class AssistantApp:
         if not prompt:
             return
         self.entry.delete(0,'end')
+        stop_speaking()
         self.log(prompt, role="you")
-        threading.Thread(target=self.handle_prompt, args=(prompt,), daemon=True).start()
-
-    def handle_prompt(self, prompt):
-        lower = prompt.lower()
-        if lower.startswith("open "):
-            target = prompt[5:].strip()
-            resp = open_application(target)
-            self.log(resp)
-            return
-        if lower.startswith("list processes") or "processes" in lower:
-            resp = list_top_processes()
-            self.log(resp)
-            return
-        if lower.startswith("run ") or lower.startswith("exec "):
-            cmd = prompt.split(" ",1)[1]
-            resp = run_shell_command(cmd)
-            self.log(resp)
-            return
-        if lower.startswith("delete "):
-            path = prompt.split(" ",1)[1]
-            resp = delete_path(path)
-            self.log(resp)
-            return
-        if lower.startswith("system info") or lower.startswith("sysinfo"):
-            resp = get_system_info()
-            self.log(resp)
-            return
-        if lower.startswith("health") or lower.startswith("status"):
-            resp = get_health_status()
-            self.log(resp)
-            return
-        if lower.startswith("search ") or lower.startswith("find "):
-            query = prompt.split(" ", 1)[1].strip()
-            self.log(f"Searching for files matching: {query}...")
-            resp = search_files(query)
-            self.log(resp)
-            return
-        if lower.startswith("clipboard") or lower.startswith("get clip"):
-            resp = get_clipboard()
-            self.log(resp)
-            return
-        if lower.startswith("copy "):
-            text = prompt[5:].strip()
-            resp = set_clipboard(text)
-            self.log(resp)
-            return
-        if lower.startswith("clear clip"):
-            resp = clear_clipboard()
-            self.log(resp)
-            return
-        if lower.startswith("screenshot") or lower.startswith("screen shot") or lower.startswith("snap"):
-            resp = take_screenshot()
-            self.log(resp)
-            return
-        if lower.startswith("screenshot region") or lower.startswith("screenshot area"):
-            resp = take_screenshot_region()
-            self.log(resp)
-            return
-        if lower.startswith("theme") or lower.startswith("toggle theme") or lower.startswith("dark") or lower.startswith("light"):
-            self.toggle_app_theme()
-            return
-        if lower.startswith("save chat") or lower.startswith("save history"):
-            content = "\n".join(self.chat_history)
-            resp = save_chat_history(content)
-            self.log(resp)
-            return
-        if lower.startswith("load chat") or lower.startswith("load history"):
-            filename = prompt.split(" ", 2)[2].strip() if len(prompt.split(" ")) > 2 else None
-            if filename:
-                content = load_chat_history(filename)
-                self.log(content)
-            else:
-                self.log("Please specify filename: load chat [filename]")
-            return
-        if lower.startswith("chat list") or lower.startswith("list chats"):
-            resp = list_chat_histories()
-            self.log(resp)
-            return
-        if lower.startswith("alert") or lower.startswith("check alert"):
-            resp = check_resource_alerts()
-            self.log(resp)
-            return
-        if lower.startswith("set alert") or lower.startswith("threshold"):
-            parts = prompt.split()
-            if len(parts) >= 3:
-                resource = parts[2]
-                try:
-                    threshold = int(parts[3])
-                    resp = set_alert_threshold(resource, threshold)
-                    self.log(resp)
-                except (ValueError, IndexError):
-                    self.log("Usage: set alert [resource] [threshold]\nResources: cpu, memory, disk")
-            else:
-                self.log("Usage: set alert [resource] [threshold]\nResources: cpu, memory, disk")
-            return
-        self.log("Thinking...", role="assistant")
-        llm_reply = call_llm(prompt)
-        logging.info(f"LLM reply: {llm_reply[:200]}")
-        self.log(llm_reply)
-        try:
-            speak(llm_reply)
-        except Exception:
-            pass
+        self.prompt_pool.submit(self.handle_prompt, prompt)
 
     def gui_open_app(self):
         path = filedialog.askopenfilename(title="Select executable or file")
         if path:
             self.log(f"Opening: {path}")
-            resp = open_application(path)
+            with perf.span("gui:open_app"):
+                resp = open_application(path)
             self.log(resp)
 
     def gui_list_processes(self):
         self.log("Listing processes...")
-        resp = list_top_processes()
-        self.log(resp)
+        # A stale process table is resampled with a blocking interval, so keep it off the Tk thread
+        self.prompt_pool.submit(perf_timed("gui:list_processes")(lambda: self.log(list_top_processes())))
 
     def gui_run_command(self):
         cmd = tk.simpledialog.askstring("Run command", "Enter shell command to run (will prompt for confirmation):")
         if cmd:
             self.log(f"Running: {cmd}")
-            resp = run_shell_command(cmd)
+            with perf.span("gui:run_command"):
+                resp = self.start_shell_job(cmd)
             self.log(resp)
 
     def gui_delete_path(self):
@@ -604,14 +4135,17 @@ class AssistantApp:
             path = filedialog.askdirectory(title="Select directory to delete")
         if path:
             self.log(f"Deleting: {path}")
-            resp = delete_path(path)
+            with perf.span("gui:delete_path"):
+                resp = delete_path(path)
             self.log(resp)
 
+    @perf_timed("gui:system_info")
     def gui_system_info(self):
         self.log("Fetching system information...")
         resp = get_system_info()
         self.log(resp)
 
+    @perf_timed("gui:health_status")
     def gui_health_status(self):
         self.log("Checking system health...")
         resp = get_health_status()
@@ -620,10 +4154,10 @@ class AssistantApp:
     def gui_search_files(self):
         filename = tk.simpledialog.askstring("Search Files", "Enter filename or pattern to search:")
         if filename:
-            self.log(f"Searching for: {filename}...")
-            resp = search_files(filename)
-            self.log(resp)
+            threading.Thread(target=perf_timed("gui:search_files")(self.run_search), args=(filename,),
+                             daemon=True).start()
 
+    @perf_timed("gui:get_clipboard")
     def gui_get_clipboard(self):
         self.log("Reading clipboard...")
         resp = get_clipboard()
@@ -632,48 +4166,457 @@ class AssistantApp:
     def gui_copy_clipboard(self):
         text = tk.simpledialog.askstring("Copy to Clipboard", "Enter text to copy:")
         if text:
-            resp = set_clipboard(text)
+            with perf.span("gui:copy_clipboard"):
+                resp = set_clipboard(text)
             self.log(resp)
 
     def gui_clear_clipboard(self):
         if messagebox.askyesno("Clear Clipboard", "Clear clipboard content?"):
-            resp = clear_clipboard()
+            with perf.span("gui:clear_clipboard"):
+                resp = clear_clipboard()
             self.log(resp)
 
     def gui_screenshot(self):
         choice = messagebox.askyesnocancel("Screenshot", "Capture full screen?\n\nYes = Full Screen\nNo = Region")
         if choice is True:
-            resp = take_screenshot()
-            self.log(resp)
+            take_screenshot_async(self.log)
         elif choice is False:
-            resp = take_screenshot_region()
-            self.log(resp)
+            default = ",".join(str(v) for v in SCREENSHOT_REGION)
+            region = tk.simpledialog.askstring("Screenshot Region", "Region as x,y,width,height:", initialvalue=default)
+            if region:
+                try:
+                    take_screenshot_async(self.log, region=tuple(int(v) for v in region.replace(" ", "").split(",")))
+                except ValueError:
+                    self.log("Invalid region. Use x,y,width,height")
 
+    @perf_timed("gui:save_chat")
     def gui_save_chat(self):
         content = "\n".join(self.chat_history)
         resp = save_chat_history(content)
         self.log(resp)
 
     def gui_load_chat(self):
-        filename = tk.simpledialog.askstring("Load Chat", "Enter filename to load:")
+        filename = tk.simpledialog.askstring("Load Chat", "Enter session id or filename to load:")
         if filename:
-            content = load_chat_history(filename)
+            with perf.span("gui:load_chat"):
+                content = load_chat_history(filename)
             self.log(content)
 
+    @perf_timed("gui:list_chats")
     def gui_list_chats(self):
         self.log("Loading chat history list...")
         resp = list_chat_histories()
         self.log(resp)
 
+    @perf_timed("gui:check_alerts")
     def gui_check_alerts(self):
         self.log("Checking system resource alerts...")
         resp = check_resource_alerts()
         self.log(resp)
 
-def main():
+def warm_up():
+    steps = [
+        ("llm", getattr(llm_backend, "warm_up", None)),
+        ("tts", speech_worker.start),
+        ("screenshot", lambda: __import__("PIL.ImageGrab")),
+        ("clipboard", lambda: __import__("pyperclip")),
+    ]
+    for name, step in steps:
+        if step is None:
+            continue
+        started = time.perf_counter()
+        try:
+            step()
+            logging.info("Warmed up %s", name, extra={"duration_ms": (time.perf_counter() - started) * 1000})
+        except Exception as e:
+            logging.warning("Warm-up of %s failed: %s", name, e)
+
+def start_background_services():
+    file_index.start()
+    metrics_sampler.subscribe(metrics_history.record)
+    alert_engine.attach(metrics_sampler)
+    metrics_sampler.start()
+    threading.Thread(target=warm_up, daemon=True).start()
+
+# Replies must be complete when handle_prompt returns, so jobs and captures run inline
+class HeadlessSession(Assistant):
+    speak_replies = False
+
+    def start_shell_job(self, cmd, timeout=SHELL_TIMEOUT):
+        return run_shell_command(cmd, timeout=timeout)
+
+    def start_screenshot(self, **kwargs):
+        self.log(take_screenshot(**kwargs))
+
+class DaemonSession(HeadlessSession):
+
+    def __init__(self, loop, output):
+        super().__init__()
+        self.loop = loop
+        self.output = output
+
+    def write(self, text):
+        try:
+            self.loop.call_soon_threadsafe(self.output.put_nowait, text)
+        except RuntimeError:
+            pass  # client went away and the loop is closed; late job output is dropped
+
+class AssistantDaemon:
+    def __init__(self, max_concurrent=DAEMON_MAX_CONCURRENT, max_pending=DAEMON_MAX_PENDING):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="daemon")
+        self.slots = None
+        self.pending = 0
+        self.clients = 0
+        self.served = 0
+        self.rejected = 0
+        self.server = None
+        self.token = None
+
+    async def _send(self, output, writer):
+        while True:
+            item = await output.get()
+            if item is None:
+                return
+            message = {"text": item} if isinstance(item, str) else item
+            writer.write(json.dumps(message).encode("utf-8") + b"\n")
+            # Slow readers stall their own session here instead of buffering without limit
+            await writer.drain()
+
+    async def _handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        output = asyncio.Queue()
+        session = DaemonSession(loop, output)
+        sender = asyncio.create_task(self._send(output, writer))
+        self.clients += 1
+        try:
+            if self.token is not None and not await self._authenticate(reader):
+                logging.warning("Daemon connection rejected: missing or wrong token")
+                await output.put({"error": "unauthorized", "done": True})
+                return
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    prompt = str(request["prompt"]).strip()
+                except (ValueError, KeyError, TypeError):
+                    await output.put({"error": "expected a JSON line with a 'prompt' field", "done": True})
+                    continue
+                request_id = request.get("id")
+                if self.pending >= self.max_pending:
+                    self.rejected += 1
+                    await output.put({"id": request_id, "error": "busy", "done": True})
+                    continue
+                self.pending += 1
+                started = time.perf_counter()
+                try:
+                    async with self.slots:
+                        command = await loop.run_in_executor(self.executor, session.handle_prompt, prompt)
+                    reply = {"id": request_id, "command": command, "done": True}
+                except Exception as e:
+                    logging.exception("Daemon request failed")
+                    reply = {"id": request_id, "error": str(e), "done": True}
+                finally:
+                    self.pending -= 1
+                self.served += 1
+                reply["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                await output.put(reply)
+        finally:
+            self.clients -= 1
+            await output.put(None)
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def _authenticate(self, reader):
+        # The first line of a TCP connection must carry the token from DAEMON_TOKEN_FILE
+        try:
+            hello = json.loads(await reader.readline())
+            return hmac.compare_digest(str(hello["token"]).encode("utf-8"), self.token.encode("utf-8"))
+        except (ValueError, KeyError, TypeError, ConnectionError):
+            return False
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=DAEMON_PORT, token_path=DAEMON_TOKEN_FILE):
+        self.slots = asyncio.Semaphore(self.max_concurrent)
+        if socket_path:
+            os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            # Bind under a private umask so the socket is never reachable by other users, even briefly
+            old_umask = os.umask(0o077)
+            try:
+                self.server = await asyncio.start_unix_server(self._handle_client, path=socket_path,
+                                                              limit=DAEMON_MAX_LINE)
+            finally:
+                os.umask(old_umask)
+            address = socket_path
+        else:
+            # Any local user can reach a loopback port, so only holders of the owner-readable token get in
+            self.token = write_daemon_token(token_path)
+            self.server = await asyncio.start_server(self._handle_client, host, port, limit=DAEMON_MAX_LINE)
+            address = "%s:%d" % self.server.sockets[0].getsockname()[:2]
+        logging.info("Daemon listening on %s", address)
+        return address
+
+    async def serve(self, socket_path=None, host="127.0.0.1", port=DAEMON_PORT):
+        await self.start(socket_path, host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self, timeout=5.0):
+        self.server.close()
+        await self.server.wait_closed()
+        deadline = time.monotonic() + timeout
+        while self.clients and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return (f"Daemon: {self.clients} clients, {self.pending} pending, {self.served} served, "
+                f"{self.rejected} rejected as busy (limit {self.max_concurrent} running, {self.max_pending} queued)")
+
+def write_daemon_token(path=DAEMON_TOKEN_FILE):
+    token = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+def read_daemon_token(path=DAEMON_TOKEN_FILE):
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+def daemon_address(socket_path=None, port=None):
+    if port is None and (socket_path or hasattr(socket, "AF_UNIX")):
+        return socket_path or DAEMON_SOCKET, None
+    return None, port or DAEMON_PORT
+
+def run_daemon(socket_path=None, port=DAEMON_PORT, confirm="deny", allow=()):
+    set_confirm_policy(make_confirm_policy(confirm, allow))
+    start_background_services()
+    daemon = AssistantDaemon()
+    try:
+        asyncio.run(daemon.serve(socket_path, port=port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+def send_prompt(prompt, socket_path=None, port=DAEMON_PORT, on_text=None, timeout=SHELL_TIMEOUT,
+                token_path=DAEMON_TOKEN_FILE):
+    if socket_path:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+    else:
+        conn = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+    with conn, conn.makefile("rwb") as stream:
+        if not socket_path:
+            stream.write(json.dumps({"token": read_daemon_token(token_path)}).encode("utf-8") + b"\n")
+        stream.write(json.dumps({"prompt": prompt}).encode("utf-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "text" in message and on_text:
+                on_text(message["text"])
+            if message.get("done"):
+                return message
+    raise ConnectionError("daemon closed the connection before replying")
+
+class BatchSession(HeadlessSession):
+    llm_priority = PRIORITY_BACKGROUND
+
+    def __init__(self, chat_session):
+        super().__init__(chat_session)
+        self.parts = []
+
+    def log(self, text, role="assistant"):
+        super().log(text, role)
+        if text != "Thinking...":
+            self.parts.append(text)
+
+    def end_stream(self, text, role="assistant"):
+        super().end_stream(text, role)
+        self.parts.append(text)
+
+    def log_line(self, text):
+        super().log_line(text)
+        self.parts.append(text)
+
+    def output(self):
+        return "\n".join(self.parts)
+
+def read_batch_items(input_path):
+    with open(input_path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield {"id": f"line:{number}", "line": number, "error": "invalid JSON"}
+                continue
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not str(item.get("prompt", "")).strip():
+                yield {"id": f"line:{number}", "line": number, "error": "missing prompt"}
+                continue
+            yield {"id": str(item.get("id", f"line:{number}")), "line": number, "prompt": str(item["prompt"])}
+
+def load_batch_checkpoint(output_path, retry_errors=False):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        # A crash can leave half a line at the end; cut it so appends start clean
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("ok") or not retry_errors:
+            done.add(record["id"])
+    return done
+
+def run_batch_item(item, chat_session, queued):
+    started = time.perf_counter()
+    record = {"id": item["id"], "line": item["line"], "prompt": item.get("prompt")}
+    if "error" in item:
+        record.update(ok=False, error=item["error"])
+    else:
+        session = BatchSession(chat_session)
+        try:
+            record["command"] = session.handle_prompt(item["prompt"])
+            record["output"] = session.output()
+            record["ok"] = not is_llm_error(record["output"])
+        except Exception as e:
+            logging.exception("Batch item %s failed", item["id"])
+            record.update(ok=False, error=str(e), output=session.output())
+    record["queued_ms"] = round((started - queued) * 1000, 3)
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return record
+
+def run_batch(input_path, output_path, concurrency=BATCH_CONCURRENCY, restart=False, retry_errors=False,
+              on_progress=None):
+    if restart and os.path.exists(output_path):
+        os.remove(output_path)
+    done = load_batch_checkpoint(output_path, retry_errors)
+    chat_session = chat_store.start_session(f"batch:{os.path.abspath(input_path)}:{time.time():.0f}:{uuid.uuid4().hex}")
+    counts = {"skipped": 0, "ok": 0, "failed": 0}
+    started = time.perf_counter()
+    window = threading.BoundedSemaphore(concurrency * 2)
+    write_lock = threading.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        def finished(future):
+            window.release()
+            if future.cancelled():
+                return
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                counts["ok" if record.get("ok") else "failed"] += 1
+            if on_progress:
+                on_progress(record)
+
+        try:
+            for item in read_batch_items(input_path):
+                if item["id"] in done:
+                    counts["skipped"] += 1
+                    continue
+                # Bounded read-ahead keeps memory flat for very large input files
+                window.acquire()
+                pool.submit(run_batch_item, item, chat_session, time.perf_counter()).add_done_callback(finished)
+        except KeyboardInterrupt:
+            logging.warning("Batch interrupted; waiting for running items to finish")
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            with write_lock:
+                os.fsync(out.fileno())
+    elapsed = time.perf_counter() - started
+    processed = counts["ok"] + counts["failed"]
+    logging.info("Batch %s: %d ok, %d failed, %d skipped", input_path, counts["ok"], counts["failed"],
+                 counts["skipped"], extra={"duration_ms": elapsed * 1000})
+    return (f"Batch finished in {elapsed:.1f}s: {counts['ok']} ok, {counts['failed']} failed, "
+            f"{counts['skipped']} already done ({processed / elapsed if elapsed else 0:.1f} items/s)")
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="AI Desktop Assistant")
+    parser.add_argument("--daemon", action="store_true", help="serve prompts without a window")
+    parser.add_argument("--send", metavar="PROMPT", help="send one prompt to a running daemon and print the reply")
+    parser.add_argument("--batch", metavar="INPUT", help="run the prompts in a JSONL file and exit")
+    parser.add_argument("--output", metavar="OUTPUT", help="batch results JSONL (default INPUT.out.jsonl); "
+                                                         "existing results are skipped so a rerun resumes")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="batch items run at once")
+    parser.add_argument("--restart", action="store_true", help="discard existing batch results")
+    parser.add_argument("--retry-errors", action="store_true", help="rerun batch items that failed")
+    parser.add_argument("--socket", help=f"Unix socket path (default {DAEMON_SOCKET})")
+    parser.add_argument("--port", type=int, help=f"serve on localhost TCP instead (default {DAEMON_PORT} "
+                                                 "where Unix sockets are unavailable)")
+    parser.add_argument("--confirm", choices=("deny", "allow", "ask"), default="deny",
+                        help="policy for open/run/delete requests in daemon and batch mode")
+    parser.add_argument("--allow", action="append", default=[], metavar="PATTERN",
+                        help="glob of actions to approve under the deny policy, e.g. 'Run shell command: ls*'")
+    args = parser.parse_args(argv)
+    socket_path, port = daemon_address(args.socket, args.port)
+    if args.send:
+        reply = send_prompt(args.send, socket_path, port,
+                            on_text=lambda text: print(text, end="", flush=True))
+        return 1 if reply.get("error") else 0
+    listener = setup_logging()
+    if args.batch:
+        output = args.output or os.path.splitext(args.batch)[0] + ".out.jsonl"
+        set_confirm_policy(make_confirm_policy(args.confirm, args.allow))
+        try:
+            print(run_batch(args.batch, output, args.concurrency, args.restart, args.retry_errors,
+                            on_progress=lambda r: print(f"{r['id']}: {'ok' if r.get('ok') else 'FAILED'} "
+                                                        f"{r['elapsed_ms']:.0f} ms", flush=True)))
+        except KeyboardInterrupt:
+            print(f"Interrupted; rerun the same command to resume from {output}")
+            return 130
+        finally:
+            chat_store.close()
+            listener.stop()
+        return 0
+    if args.daemon:
+        try:
+            run_daemon(socket_path, port, args.confirm, args.allow)
+        finally:
+            chat_store.close()
+            listener.stop()
+        return 0
+    load_tk()
     root = tk.Tk()
     app = AssistantApp(root)
+    root.after(200, start_background_services)
     root.mainloop()
+    chat_store.close()
+    listener.stop()
+    return 0
 
 if __name__ == "__main__":
-    main()
+    multiprocessing.freeze_support()
+    sys.exit(main())
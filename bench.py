@@ -0,0 +1,773 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import app
+
+
+def make_tree(root, file_count, files_per_dir=100, fanout=100):
+    made = 0
+    top = 0
+    while made < file_count:
+        for sub in range(fanout):
+            if made >= file_count:
+                break
+            d = os.path.join(root, f"dir_{top:04d}", f"sub_{sub:04d}")
+            os.makedirs(d, exist_ok=True)
+            for i in range(min(files_per_dir, file_count - made)):
+                open(os.path.join(d, f"file_{made + i:08d}.txt"), "w").close()
+            made += min(files_per_dir, file_count - made)
+        top += 1
+    return made
+
+
+def rglob_search(pattern, root, max_results):
+    results = []
+    for path in Path(root).rglob(f"*{pattern}*"):
+        if len(results) >= max_results:
+            break
+        try:
+            if path.is_file():
+                results.append(f"{path} ({path.stat().st_size / (1024**2):.2f} MB)")
+            elif path.is_dir():
+                results.append(f"{path}/ [FOLDER]")
+        except (PermissionError, OSError):
+            pass
+    return results
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def bench_search(args):
+    root = args.root or tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        if not os.listdir(root):
+            print(f"Building synthetic tree with {args.files} files in {root}...")
+            elapsed, made = timed(make_tree, root, args.files)
+            print(f"  created {made} files in {elapsed:.1f}s")
+        # A pattern that never matches forces both walkers over the whole tree
+        for label, pattern, limit in (("full walk (no match)", "no-such-file", args.max_results),
+                                      ("early stop", "file_", args.max_results)):
+            rglob_time, _ = timed(rglob_search, pattern, root, limit)
+            first = []
+            started = time.perf_counter()
+            on_match = lambda line: first or first.append(time.perf_counter() - started)
+            walk_time, found = timed(app.find_files, pattern, [root], on_match=on_match,
+                                     max_results=limit, workers=args.workers)
+            print(f"{label}:")
+            print(f"  rglob:          {rglob_time:8.3f}s")
+            print(f"  parallel walk:  {walk_time:8.3f}s  ({args.workers} workers, {len(found)} matches)")
+            if first:
+                print(f"  first match:    {first[0]:8.3f}s")
+            print(f"  speedup:        {rglob_time / walk_time:8.2f}x")
+    finally:
+        if not args.root and not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def serial_disk_usage(root):
+    total = 0
+    for path, _, files in os.walk(root):
+        for name in files:
+            try:
+                total += app.allocated_size(os.lstat(os.path.join(path, name)))
+            except OSError:
+                pass
+    return total
+
+
+def bench_disk_usage(args):
+    root = args.root or tempfile.mkdtemp(prefix="bench_du_")
+    cache_dir = tempfile.mkdtemp(prefix="bench_du_cache_")
+    try:
+        if not os.listdir(root):
+            print(f"Building synthetic tree with {args.files} files in {root}...")
+            elapsed, made = timed(make_tree, root, args.files)
+            print(f"  created {made} files in {elapsed:.1f}s")
+        cache = app.DiskUsageCache(os.path.join(cache_dir, "disk_usage.db"))
+        analyze = lambda: app.analyze_disk_usage(root, workers=args.workers, cache=cache)
+        serial_time, _ = timed(serial_disk_usage, root)
+        print(f"  os.walk + lstat:       {serial_time:8.3f}s")
+        cold_time, result = timed(analyze)
+        print(f"  parallel, cold cache:  {cold_time:8.3f}s  ({result['dirs']} dirs, {result['files']} files)")
+        warm_time, result = timed(analyze)
+        print(f"  parallel, warm cache:  {warm_time:8.3f}s  ({result['rescanned']} dirs rescanned)")
+        # Simulate a cleanup touching a slice of the tree
+        dirs = sorted(path for path, _, _ in os.walk(root))
+        for path in dirs[::max(1, int(1 / args.changed))]:
+            open(os.path.join(path, "bench_touch.tmp"), "w").close()
+        changed_time, result = timed(analyze)
+        print(f"  after {args.changed:.0%} changed:     {changed_time:8.3f}s  ({result['rescanned']} dirs rescanned)")
+        print(f"  warm speedup:          {serial_time / warm_time:8.2f}x")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        if not args.root and not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+        elif args.root:
+            for path, _, files in os.walk(root):
+                if "bench_touch.tmp" in files:
+                    os.remove(os.path.join(path, "bench_touch.tmp"))
+
+
+def make_duplicate_tree(root, files, size, duplicate_share, seed):
+    rng = random.Random(seed)
+    originals = []
+    for i in range(files):
+        d = os.path.join(root, f"dir_{i // 100:04d}")
+        os.makedirs(d, exist_ok=True)
+        if originals and rng.random() < duplicate_share:
+            data = rng.choice(originals)
+        else:
+            # Equal sizes force every file through the hashing stages
+            data = rng.randbytes(size)
+            originals.append(data)
+        with open(os.path.join(d, f"file_{i:06d}.bin"), "wb") as f:
+            f.write(data)
+
+
+def naive_duplicates(root):
+    by_hash = {}
+    for path, _, files in os.walk(root):
+        for name in files:
+            full = os.path.join(path, name)
+            by_hash.setdefault(app.full_hash(full), []).append(full)
+    return [paths for paths in by_hash.values() if len(paths) > 1]
+
+
+def bench_duplicates(args):
+    root = tempfile.mkdtemp(prefix="bench_dupes_")
+    try:
+        print(f"Building {args.files} files of {args.size // 1024} KB ({args.duplicates:.0%} duplicates)...")
+        make_duplicate_tree(root, args.files, args.size, args.duplicates, args.seed)
+        cache = app.HashCache(os.path.join(root, "hashes.db"))
+        naive_time, naive = timed(naive_duplicates, root)
+        print(f"  full hash of every file:  {naive_time:8.3f}s  ({len(naive)} groups)")
+        for label in ("staged, cold cache", "staged, warm cache"):
+            elapsed, result = timed(app.find_duplicates, [root], workers=args.workers, cache=cache)
+            print(f"  {label + ':':25} {elapsed:8.3f}s  ({len(result['groups'])} groups, "
+                  f"hashed {result['hashed_bytes'] / 1024**2:.1f} MB)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    reply = ("This is a canned reply from the fake model server. "
+             "It streams one word at a time so clients can be tested offline. "
+             "Nothing here was generated by a real model.")
+    chunk_delay = 0.02
+    fail_after = None
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if request.get("stream") else "application/json")
+        self.end_headers()
+        if not request.get("stream"):
+            time.sleep(self.chunk_delay * len(self.reply.split()))
+            self.wfile.write(json.dumps({"text": self.reply}).encode("utf-8"))
+            return
+        for i, word in enumerate(self.reply.split(" ")):
+            if self.fail_after is not None and i >= self.fail_after:
+                return
+            time.sleep(self.chunk_delay)
+            self.wfile.write(json.dumps({"text": word if i == 0 else " " + word}).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        self.wfile.write(b'{"done": true}\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_llm(port=0, chunk_delay=0.02, fail_after=None):
+    handler = type("Handler", (FakeLLMHandler,), {"chunk_delay": chunk_delay, "fail_after": fail_after})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/generate"
+
+
+def bench_fake_llm(args):
+    server, url = start_fake_llm(args.port, args.chunk_delay, args.fail_after)
+    print(f"Fake model server listening on {url} (set LLM_BACKEND_URL to use it)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def bench_stream(args):
+    server, url = start_fake_llm(chunk_delay=args.chunk_delay)
+    backend = app.HTTPBackend(url)
+    app.set_llm_backend(backend)
+    try:
+        blocking, _ = timed(app.call_llm, "bench", use_cache=False)
+        first = []
+        started = time.perf_counter()
+        on_chunk = lambda chunk: first or first.append(time.perf_counter() - started)
+        streaming, _ = timed(app.call_llm_stream, "bench", on_chunk, use_cache=False)
+        print(f"blocking reply:      {blocking:8.3f}s to first word")
+        print(f"streaming reply:     {first[0]:8.3f}s to first word, {streaming:.3f}s total")
+    finally:
+        server.shutdown()
+
+
+def bench_context(args):
+    context = app.ConversationContext(budget=args.budget, summarizer=lambda text: text[:300], background=False)
+    rng = __import__("random").Random(1)
+    words = ["disk", "process", "memory", "report", "folder", "python", "network", "error", "backup", "screen"]
+    checkpoints = {10, 100, 1000, args.turns}
+    print(f"{'turns':>8} {'build ms (avg of 20)':>22} {'prompt tokens':>14} {'full history tokens':>20}")
+    history_tokens = 0
+    for turn in range(1, args.turns + 1):
+        user = " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+        reply = " ".join(rng.choice(words) for _ in range(rng.randint(20, 200)))
+        history_tokens += app.estimate_tokens(user) + app.estimate_tokens(reply)
+        if turn in checkpoints:
+            started = time.perf_counter()
+            for _ in range(20):
+                prompt = context.build(user)
+            build_ms = (time.perf_counter() - started) / 20 * 1000
+            print(f"{turn:8d} {build_ms:22.3f} {app.estimate_tokens(prompt):14d} {history_tokens:20d}")
+        context.add("you", user)
+        context.add("assistant", reply)
+
+
+def synthetic_screen(width, height):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (width, height), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    rng = __import__("random").Random(1)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + rng.randint(20, 300), y + rng.randint(10, 60)), fill=color)
+    for row in range(0, height, 18):
+        draw.text((10, row), "lorem ipsum dolor sit amet " * 8, fill=(20, 20, 20))
+    return image
+
+
+def bench_screenshot(args):
+    import io
+    image = synthetic_screen(args.width, args.height)
+    raw_mb = args.width * args.height * 3 / 1024**2
+    print(f"{'format':>6} {'level':>6} {'ms/frame':>10} {'MB/s (raw)':>11} {'size KB':>9}")
+    for fmt, levels in (("png", (1, 6, 9)), ("jpeg", (60, 85, 95)), ("webp", (60, 80))):
+        for level in levels:
+            try:
+                samples = []
+                for _ in range(args.frames):
+                    buffer = io.BytesIO()
+                    elapsed, _ = timed(app.encode_image, image, buffer, fmt, level)
+                    samples.append(elapsed)
+            except (KeyError, OSError) as e:
+                print(f"{fmt:>6} {level:6d} skipped ({e})")
+                continue
+            per_frame = statistics.median(samples)
+            print(f"{fmt:>6} {level:6d} {per_frame * 1000:10.1f} {raw_mb / per_frame:11.1f} "
+                  f"{buffer.tell() / 1024:9.0f}")
+    changed = image.copy()
+    changed.paste((0, 0, 0), (0, 0, args.width // 4, args.height // 4))
+    elapsed, _ = timed(lambda: [app.image_hash(image) for _ in range(args.frames)])
+    blocks = app.changed_blocks(app.image_hash(image), app.image_hash(changed))
+    print(f"frame hash: {elapsed / args.frames * 1000:.1f} ms/frame, {blocks} blocks differ in a changed frame")
+
+
+def time_log_calls(count, call):
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.fmean(samples) * 1e6, samples[int(count * 0.999)] * 1e6
+
+
+def bench_logging(args):
+    import logging
+    workdir = tempfile.mkdtemp(prefix="bench_logging_")
+    root = logging.getLogger()
+    reply = "word " * 400
+    action = lambda i: logging.info("User approved action: %s", f"run command {i}")
+    print(f"{'pipeline':<26} {'mean us':>9} {'p99.9 us':>9} {'filtered debug us':>18}")
+    try:
+        for label in ("sync FileHandler", "queue text", "queue json"):
+            logfile = os.path.join(workdir, label.replace(" ", "_") + ".log")
+            listener = None
+            if label == "sync FileHandler":
+                for old in root.handlers[:]:
+                    root.removeHandler(old)
+                handler = logging.FileHandler(logfile)
+                handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+                root.addHandler(handler)
+                root.setLevel(logging.INFO)
+            else:
+                listener = app.setup_logging(logfile, json_format=label == "queue json")
+            per_record, tail = time_log_calls(args.records, action)
+            filtered, _ = time_log_calls(args.records, lambda i: logging.debug("LLM reply: %.200s", reply))
+            if listener:
+                listener.stop()
+            for old in root.handlers[:]:
+                old.close()
+                root.removeHandler(old)
+            print(f"{label:<26} {per_record:9.2f} {tail:9.1f} {filtered:18.3f}")
+        eager, _ = time_log_calls(args.records, lambda i: logging.debug(f"LLM reply: {reply[:200]} {i}"))
+        print(f"{'eager f-string (filtered)':<26} {'':>9} {'':>9} {eager:18.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+DEFAULT_PROMPT_MIX = [
+    (10, "what is the difference between a process and a thread?"),
+    (5, "summarize the last error in one sentence"),
+    (6, "system info"),
+    (6, "health"),
+    (5, "processes by memory"),
+    (3, "top cpu"),
+    (4, "history cpu 1h"),
+    (3, "peak memory today"),
+    (4, "search file_00 in {tree}"),
+    (3, "grep needle in {tree}"),
+    (4, "clipboard"),
+    (3, "copy benchmark text"),
+    (2, "screenshot jpg 80"),
+    (2, "cache stats"),
+    (2, "context stats"),
+    (2, "alerts"),
+    (2, "jobs"),
+    (1, "run echo benchmark"),
+    (1, "delete {tree}/nothing"),
+    (1, "perf"),
+]
+
+
+class FakeLLMBackend:
+    model = "fake"
+
+    def __init__(self, delay=0.0, words=60):
+        self.delay = delay
+        self.reply = " ".join(f"word{i}." if i % 12 == 11 else f"word{i}" for i in range(words))
+
+    def generate(self, prompt):
+        time.sleep(self.delay)
+        return self.reply
+
+    def stream(self, prompt):
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.delay / len(words))
+            yield word if i == 0 else " " + word
+
+
+class FakeSpeechEngine:
+    def say(self, text):
+        pass
+
+    def runAndWait(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def install_fakes(workdir, llm_delay, allow_actions):
+    import logging
+    logging.getLogger().addHandler(logging.NullHandler())
+    clipboard = {"text": "recorded clipboard text"}
+    sys.modules["pyperclip"] = types.SimpleNamespace(paste=lambda: clipboard["text"],
+                                                     copy=lambda text: clipboard.update(text=text))
+    screen = synthetic_screen(1280, 720)
+    app.capture_screen = lambda region=None: screen if region is None else screen.crop(
+        (region[0], region[1], region[0] + region[2], region[1] + region[3]))
+    app.SCREENSHOT_DIR = os.path.join(workdir, "screenshots")
+    app.set_llm_backend(FakeLLMBackend(llm_delay))
+    app.set_confirm_policy(lambda action_desc: allow_actions)
+    app.speech_worker = app.SpeechWorker(engine_factory=FakeSpeechEngine)
+    app.llm_scheduler = app.LLMScheduler(requests_per_minute=1e9, burst=1e6)
+    app.llm_cache = app.LLMCache(db_path=None)
+    app.chat_store = app.ChatStore(os.path.join(workdir, "chat_history.db"))
+    # Keep every store the assistant would create under APP_DATA_DIR inside the workdir
+    data_dir = os.path.join(workdir, "data")
+    app.APP_DATA_DIR = data_dir
+    app.file_index = app.FileIndex(os.path.join(data_dir, "file_index.db"))
+    app.metrics_history = app.MetricsHistory(os.path.join(data_dir, "metrics_history.bin"))
+    app.disk_usage_cache.db_path = os.path.join(data_dir, "disk_usage.db")
+    app.hash_cache.db_path = os.path.join(data_dir, "file_hashes.db")
+    app.job_runner.spill_dir = os.path.join(data_dir, "jobs")
+    app.command_profiler.profile_dir = os.path.join(data_dir, "profiles")
+    app.metrics_sampler.start()
+
+
+def load_prompt_mix(args, tree):
+    if args.mix:
+        mix = []
+        with open(args.mix, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    mix.append((item.get("weight", 1), item["prompt"]))
+    elif args.from_history:
+        import sqlite3
+        conn = sqlite3.connect(args.from_history)
+        rows = conn.execute("SELECT text FROM messages WHERE role = 'you' ORDER BY id").fetchall()
+        conn.close()
+        mix = [(1, text) for (text,) in rows]
+    else:
+        mix = DEFAULT_PROMPT_MIX
+    if not mix:
+        raise SystemExit("prompt mix is empty")
+    return [(weight, prompt.replace("{tree}", tree)) for weight, prompt in mix]
+
+
+def rss_mb():
+    import psutil
+    return psutil.Process().memory_info().rss / 1024**2
+
+
+def bench_replay(args):
+    workdir = tempfile.mkdtemp(prefix="bench_replay_")
+    try:
+        tree = os.path.join(workdir, "tree")
+        make_tree(tree, args.tree_files, files_per_dir=50, fanout=20)
+        with open(os.path.join(tree, "needle.txt"), "w") as f:
+            f.write("a needle in the haystack\n")
+        install_fakes(workdir, args.llm_delay, args.allow_actions)
+        mix = load_prompt_mix(args, tree)
+        weights, prompts = zip(*mix)
+        rng = random.Random(args.seed)
+        schedule = rng.choices(prompts, weights=weights, k=args.commands)
+        # Runs jobs and screenshots inline, so latencies cover the work rather than the hand-off
+        assistant = app.HeadlessSession()
+        for prompt in prompts[:args.warmup]:
+            assistant.handle_prompt(prompt)
+        app.perf.reset()
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        if args.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(assistant.handle_prompt, schedule))
+        else:
+            for prompt in schedule:
+                assistant.handle_prompt(prompt)
+        elapsed = time.perf_counter() - started
+        rss_after = rss_mb()
+        app.chat_store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commands = {}
+    for name in sorted(app.perf.latencies):
+        if name.startswith("command:"):
+            pct = app.perf.percentiles(name)
+            commands[name[len("command:"):]] = {"count": app.perf.counts[name],
+                                                "p50_ms": pct[50] * 1000, "p95_ms": pct[95] * 1000,
+                                                "p99_ms": pct[99] * 1000}
+    result = {"time": time.time(), "commands": args.commands, "concurrency": args.concurrency,
+              "throughput": args.commands / elapsed, "rss_growth_mb": rss_after - rss_before,
+              "per_command": commands}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.loads(f.read().strip().splitlines()[-1])
+
+    def delta(key, value, reference):
+        if not reference or key not in reference or not reference[key]:
+            return ""
+        return f" ({(value - reference[key]) / reference[key] * 100:+.0f}%)"
+
+    print(f"{args.commands} commands in {elapsed:.2f}s: {result['throughput']:.1f} commands/s"
+          f"{delta('throughput', result['throughput'], baseline)}")
+    print(f"RSS growth: {result['rss_growth_mb']:+.1f} MB ({rss_before:.1f} -> {rss_after:.1f} MB)")
+    print(f"{'command':<16} {'count':>6} {'p50 ms':>14} {'p95 ms':>14} {'p99 ms':>14}")
+    regressions = []
+    for name, stats in commands.items():
+        reference = baseline["per_command"].get(name) if baseline else None
+        cells = [f"{stats[k]:8.2f}{delta(k, stats[k], reference):>6}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:<16} {stats['count']:6d} {cells[0]:>14} {cells[1]:>14} {cells[2]:>14}")
+        if (reference and reference.get("p95_ms")
+                and stats["p95_ms"] > reference["p95_ms"] * (1 + args.max_regression)
+                and stats["p95_ms"] - reference["p95_ms"] > args.min_regression_ms):
+            regressions.append(name)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    if regressions:
+        print(f"p95 regressed more than {args.max_regression:.0%} for: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def start_daemon_thread(daemon, socket_path):
+    import asyncio
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(daemon.start(socket_path))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return loop
+
+
+async def daemon_client(socket_path, prompts, latencies, errors):
+    import asyncio
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=app.DAEMON_MAX_LINE)
+    try:
+        for prompt in prompts:
+            started = time.perf_counter()
+            writer.write(json.dumps({"prompt": prompt}).encode("utf-8") + b"\n")
+            await writer.drain()
+            while True:
+                message = json.loads(await reader.readline())
+                if message.get("done"):
+                    break
+            if message.get("error"):
+                errors[message["error"]] = errors.get(message["error"], 0) + 1
+            else:
+                latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+def bench_daemon(args):
+    import asyncio
+    workdir = tempfile.mkdtemp(prefix="bench_daemon_")
+    try:
+        tree = os.path.join(workdir, "tree")
+        make_tree(tree, args.tree_files, files_per_dir=50, fanout=20)
+        install_fakes(workdir, args.llm_delay, allow_actions=False)
+        mix = load_prompt_mix(args, tree)
+        weights, prompts = zip(*mix)
+        rng = random.Random(args.seed)
+        socket_path = os.path.join(workdir, "assistant.sock")
+        daemon = app.AssistantDaemon(args.max_concurrent, args.max_pending)
+        loop = start_daemon_thread(daemon, socket_path)
+        print(f"{'clients':>8} {'requests/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'busy':>6}")
+        for clients in args.clients:
+            latencies, errors = [], {}
+            schedules = [rng.choices(prompts, weights=weights, k=args.requests) for _ in range(clients)]
+
+            async def run_clients():
+                await asyncio.gather(*(daemon_client(socket_path, schedule, latencies, errors)
+                                       for schedule in schedules))
+
+            started = time.perf_counter()
+            asyncio.run(run_clients())
+            elapsed = time.perf_counter() - started
+            latencies.sort()
+            pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+            print(f"{clients:8d} {(len(latencies) + sum(errors.values())) / elapsed:11.1f} {pct(0.5):9.2f} "
+                  f"{pct(0.95):9.2f} {pct(0.99):9.2f} {errors.get('busy', 0):6d}")
+        asyncio.run_coroutine_threadsafe(daemon.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        app.chat_store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_alerts(args):
+    rng = random.Random(args.seed)
+    names = [f"proc{i % 97}" for i in range(args.processes)]
+    processes = [{"pid": i, "name": name, "create_time": 0.0, "cpu_percent": 0.0, "memory_percent": 0.0,
+                  "io_rate": 0.0} for i, name in enumerate(names)]
+    print(f"{'host rules':>10} {'proc rules':>10} {'us/sample':>10} {'events':>7}")
+    for host_rules, process_rules in args.sizes:
+        engine = app.AlertEngine(thresholds={})
+        for _ in range(host_rules):
+            metric = rng.choice(app.HOST_ALERT_METRICS)
+            engine.add(app.AlertRule(metric, rng.uniform(50, 99), sustain=rng.choice((0, 5, 30))))
+        for _ in range(process_rules):
+            pattern = rng.choice([f"proc{rng.randrange(97)}", f"proc{rng.randrange(10)}*", "*"])
+            engine.add(app.AlertRule(rng.choice(list(app.PROCESS_ALERT_METRICS)), rng.uniform(5, 50),
+                                     sustain=rng.choice((0, 5)), process=pattern))
+        metrics = {"cpu": 50.0, "memory": 60.0, "disk": 70.0, "load": 1.0}
+        events = 0
+        started = time.perf_counter()
+        for step in range(args.samples):
+            for key in metrics:
+                metrics[key] = min(100.0, max(0.0, metrics[key] + rng.uniform(-5, 5)))
+            for proc in processes[::10]:
+                proc["cpu_percent"] = rng.expovariate(1 / 5)
+                proc["memory_percent"] = rng.expovariate(1 / 2)
+            events += len(engine.evaluate(metrics, processes if process_rules else (), now=float(step)))
+        per_sample = (time.perf_counter() - started) / args.samples * 1e6
+        print(f"{host_rules:10d} {process_rules:10d} {per_sample:10.1f} {events:7d}")
+
+
+IMPORT_PROBE = """
+import time
+started = time.perf_counter()
+import app
+print(time.perf_counter() - started)
+"""
+
+PAINT_PROBE = """
+import time
+started = time.perf_counter()
+import tkinter as tk
+import app
+root = tk.Tk()
+assistant = app.AssistantApp(root)
+root.update()
+print(time.perf_counter() - started)
+root.destroy()
+"""
+
+
+def run_probe(code):
+    here = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return None, completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+    return float(completed.stdout.strip().splitlines()[-1]), None
+
+
+def bench_startup(args):
+    results = {}
+    for label, probe, budget in (("import", IMPORT_PROBE, args.max_import),
+                                 ("first_paint", PAINT_PROBE, args.max_paint)):
+        samples = []
+        error = None
+        for _ in range(args.runs):
+            elapsed, error = run_probe(probe)
+            if elapsed is None:
+                break
+            samples.append(elapsed)
+        if not samples:
+            print(f"{label:12s} skipped ({error})")
+            continue
+        median = statistics.median(samples)
+        results[label] = median
+        status = "ok" if median <= budget else "OVER BUDGET"
+        print(f"{label:12s} median {median * 1000:7.1f} ms over {len(samples)} runs "
+              f"(budget {budget * 1000:.0f} ms) {status}")
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), **results}) + "\n")
+    over = [k for k, v in results.items() if v > {"import": args.max_import, "first_paint": args.max_paint}[k]]
+    return 1 if over else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Desktop assistant benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    search = sub.add_parser("search", help="parallel walker vs rglob on a synthetic tree")
+    search.add_argument("--files", type=int, default=1_000_000)
+    search.add_argument("--root", help="reuse an existing tree instead of building one")
+    search.add_argument("--keep", action="store_true", help="keep the generated tree")
+    search.add_argument("--workers", type=int, default=app.SEARCH_WORKERS)
+    search.add_argument("--max-results", type=int, default=20)
+    search.set_defaults(func=bench_search)
+
+    du = sub.add_parser("disk-usage", help="cached parallel disk usage vs a serial os.walk")
+    du.add_argument("--files", type=int, default=1_000_000)
+    du.add_argument("--root", help="reuse an existing tree instead of building one")
+    du.add_argument("--keep", action="store_true", help="keep the generated tree")
+    du.add_argument("--workers", type=int, default=app.SEARCH_WORKERS)
+    du.add_argument("--changed", type=float, default=0.01, help="fraction of directories touched between runs")
+    du.set_defaults(func=bench_disk_usage)
+
+    dupes = sub.add_parser("duplicates", help="staged duplicate finder vs hashing every file")
+    dupes.add_argument("--files", type=int, default=2000)
+    dupes.add_argument("--size", type=int, default=1024 * 1024)
+    dupes.add_argument("--duplicates", type=float, default=0.1, help="share of files that copy another")
+    dupes.add_argument("--workers", type=int, default=app.DUPLICATE_WORKERS)
+    dupes.add_argument("--seed", type=int, default=1)
+    dupes.set_defaults(func=bench_duplicates)
+
+    fake = sub.add_parser("fake-llm", help="serve canned replies over the HTTPBackend protocol")
+    fake.add_argument("--port", type=int, default=8765)
+    fake.add_argument("--chunk-delay", type=float, default=0.02)
+    fake.add_argument("--fail-after", type=int, help="drop the stream after this many chunks")
+    fake.set_defaults(func=bench_fake_llm)
+
+    stream = sub.add_parser("stream", help="time to first word, blocking vs streaming")
+    stream.add_argument("--chunk-delay", type=float, default=0.02)
+    stream.set_defaults(func=bench_stream)
+
+    context = sub.add_parser("context", help="per-request context cost as a session grows")
+    context.add_argument("--turns", type=int, default=5000)
+    context.add_argument("--budget", type=int, default=app.CONTEXT_TOKEN_BUDGET)
+    context.set_defaults(func=bench_context)
+
+    screenshot = sub.add_parser("screenshot", help="encode throughput per format and level")
+    screenshot.add_argument("--width", type=int, default=1920)
+    screenshot.add_argument("--height", type=int, default=1080)
+    screenshot.add_argument("--frames", type=int, default=5)
+    screenshot.set_defaults(func=bench_screenshot)
+
+    logs = sub.add_parser("logging", help="per-record logging cost on the calling thread")
+    logs.add_argument("--records", type=int, default=50_000)
+    logs.set_defaults(func=bench_logging)
+
+    replay = sub.add_parser("replay", help="replay a prompt mix through the headless assistant with fakes")
+    replay.add_argument("--commands", type=int, default=2000)
+    replay.add_argument("--concurrency", type=int, default=1)
+    replay.add_argument("--mix", help="JSONL file of {\"prompt\": ..., \"weight\": ...} lines")
+    replay.add_argument("--from-history", help="replay the user prompts recorded in a chat_history.db")
+    replay.add_argument("--seed", type=int, default=1)
+    replay.add_argument("--warmup", type=int, default=20, help="distinct prompts to run before measuring")
+    replay.add_argument("--llm-delay", type=float, default=0.0, help="seconds per fake LLM reply")
+    replay.add_argument("--tree-files", type=int, default=2000)
+    replay.add_argument("--allow-actions", action="store_true", help="approve open/run/delete instead of denying")
+    replay.add_argument("--output", help="append results as JSON lines to this file")
+    replay.add_argument("--baseline", help="compare against the last result in this JSON lines file")
+    replay.add_argument("--max-regression", type=float, default=0.25, help="allowed p95 slowdown vs baseline")
+    replay.add_argument("--min-regression-ms", type=float, default=1.0,
+                        help="ignore p95 slowdowns smaller than this, to skip noise on sub-ms commands")
+    replay.set_defaults(func=bench_replay)
+
+    daemon = sub.add_parser("daemon", help="throughput of the socket daemon with many concurrent clients")
+    daemon.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 200])
+    daemon.add_argument("--requests", type=int, default=20, help="requests per client")
+    daemon.add_argument("--max-concurrent", type=int, default=app.DAEMON_MAX_CONCURRENT)
+    daemon.add_argument("--max-pending", type=int, default=app.DAEMON_MAX_PENDING)
+    daemon.add_argument("--llm-delay", type=float, default=0.05, help="seconds per fake LLM reply")
+    daemon.add_argument("--tree-files", type=int, default=2000)
+    daemon.add_argument("--mix", help="JSONL file of {\"prompt\": ..., \"weight\": ...} lines")
+    daemon.add_argument("--from-history", help="replay the user prompts recorded in a chat_history.db")
+    daemon.add_argument("--seed", type=int, default=1)
+    daemon.set_defaults(func=bench_daemon)
+
+    alerts = sub.add_parser("alerts", help="alert rule evaluation cost per metrics sample")
+    alerts.add_argument("--sizes", type=lambda v: tuple(int(x) for x in v.split(",")), nargs="+",
+                        default=[(3, 0), (1000, 0), (5000, 0), (1000, 100), (5000, 1000)],
+                        help="host_rules,process_rules pairs")
+    alerts.add_argument("--processes", type=int, default=400)
+    alerts.add_argument("--samples", type=int, default=200)
+    alerts.add_argument("--seed", type=int, default=1)
+    alerts.set_defaults(func=bench_alerts)
+
+    startup = sub.add_parser("startup", help="import time and time to first paint against a budget")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--max-import", type=float, default=0.5, help="seconds")
+    startup.add_argument("--max-paint", type=float, default=1.5, help="seconds")
+    startup.add_argument("--output", help="append results as JSON lines to this file")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeLLMBackend:
+    model = "fake"
+
+    def __init__(self, reply="a fake reply.", error=None):
+        self.reply = reply
+        self.error = error
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        return self.reply
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        yield self.reply
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    """Keep every store the assistant touches under tmp_path and swap in a fake LLM."""
+    backend = FakeLLMBackend()
+    monkeypatch.setattr(app, "llm_backend", backend)
+    monkeypatch.setattr(app, "llm_cache", app.LLMCache(db_path=None))
+    monkeypatch.setattr(app, "llm_scheduler", app.LLMScheduler(requests_per_minute=1e9, burst=1e6, max_attempts=1))
+    monkeypatch.setattr(app, "metrics_history", app.MetricsHistory(path=None))
+    store = app.ChatStore(str(tmp_path / "chat_history.db"))
+    monkeypatch.setattr(app, "chat_store", store)
+    yield backend
+    store.close()
+
+
+@pytest.fixture
+def session(isolated):
+    return app.BatchSession(None)
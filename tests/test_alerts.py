@@ -0,0 +1,54 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def engine():
+    return app.AlertEngine(thresholds={})
+
+
+def kinds(events):
+    return [kind for kind, *_ in events]
+
+
+def test_hysteresis_holds_alert_until_clear_threshold(engine):
+    engine.add(app.AlertRule("cpu", 90, clear_at=80))
+    assert kinds(engine.evaluate({"cpu": 95}, now=0)) == ["raised"]
+    assert engine.evaluate({"cpu": 85}, now=1) == []
+    assert engine.evaluate({"cpu": 92}, now=2) == []
+    assert kinds(engine.evaluate({"cpu": 79}, now=3)) == ["cleared"]
+    assert kinds(engine.evaluate({"cpu": 91}, now=4)) == ["raised"]
+
+
+def test_sustain_window_requires_continuous_breach(engine):
+    engine.add(app.AlertRule("memory", 80, sustain=10))
+    assert engine.evaluate({"memory": 85}, now=0) == []
+    assert engine.evaluate({"memory": 85}, now=5) == []
+    # Dropping below the raise threshold restarts the window
+    assert engine.evaluate({"memory": 70}, now=6) == []
+    assert engine.evaluate({"memory": 85}, now=7) == []
+    assert engine.evaluate({"memory": 85}, now=16) == []
+    assert kinds(engine.evaluate({"memory": 85}, now=17)) == ["raised"]
+
+
+def test_below_rules_raise_on_low_values(engine):
+    engine.add(app.parse_alert_rule("disk < 10 clear 20"))
+    assert kinds(engine.evaluate({"disk": 5}, now=0)) == ["raised"]
+    assert engine.evaluate({"disk": 15}, now=1) == []
+    assert kinds(engine.evaluate({"disk": 25}, now=2)) == ["cleared"]
+
+
+def test_process_rule_clears_when_process_exits(engine):
+    engine.add(app.parse_alert_rule("process chrome* cpu > 50"))
+    proc = {"pid": 10, "name": "chrome.exe", "create_time": 1.0, "cpu_percent": 75.0, "memory_percent": 1.0,
+            "io_rate": 0.0}
+    raised = engine.evaluate({}, [proc], now=0)
+    assert kinds(raised) == ["raised"] and "chrome.exe (pid=10)" in raised[0][2]
+    assert engine.evaluate({}, [proc], now=1) == []
+    assert kinds(engine.evaluate({}, [], now=2)) == ["cleared"]
+
+
+def test_clear_threshold_must_be_on_the_safe_side():
+    with pytest.raises(ValueError):
+        app.AlertRule("cpu", 80, clear_at=90)
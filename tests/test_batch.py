@@ -0,0 +1,21 @@
+import app
+
+
+def test_batch_run_captures_job_output(session, monkeypatch):
+    monkeypatch.setattr(app, "confirm_and_run", lambda desc, action: action())
+    assert session.dispatch_prompt("run echo batch-output") == "run"
+    output = session.output()
+    assert "Started job" not in output
+    assert "Return code: 0" in output and "batch-output" in output
+
+
+def test_rerunning_a_batch_persists_both_runs(isolated, tmp_path):
+    batch = tmp_path / "prompts.jsonl"
+    batch.write_text('{"id": "a", "prompt": "jobs"}\n{"id": "b", "prompt": "list jobs"}\n')
+    output = str(tmp_path / "prompts.out.jsonl")
+    app.run_batch(str(batch), output)
+    app.run_batch(str(batch), output, restart=True)
+    app.chat_store.flush(timeout=2)
+    runs = [row for row in app.chat_store.sessions() if row[2].startswith("batch:")]
+    assert len(runs) == 2
+    assert all(count > 0 for _, _, _, count in runs)
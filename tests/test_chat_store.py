@@ -0,0 +1,61 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = app.ChatStore(str(tmp_path / "chat.db"))
+    yield store
+    store.close()
+
+
+def test_failed_session_insert_does_not_block_later_writes(store):
+    first = store.start_session("same-source")
+    duplicate = store.start_session("same-source")
+    store.append(duplicate, "you", "lost message")
+    later = store.start_session("other-source")
+    store.append(first, "you", "first message")
+    store.append(later, "you", "later message")
+    store.flush(timeout=2)
+
+    with pytest.raises(Exception):
+        duplicate.result(timeout=2)
+    assert [row[1:] for row in store.page(first.result(timeout=2))[0]] == [("you", "first message")]
+    assert [row[1:] for row in store.page(later.result(timeout=2))[0]] == [("you", "later message")]
+
+
+def test_pages_return_messages_in_order(store):
+    session = store.start_session("paged")
+    for n in range(7):
+        store.append(session, "you", f"message {n}")
+    store.flush(timeout=2)
+    session_id = session.result(timeout=2)
+    first, total = store.page(session_id, page=1, page_size=3)
+    last, _ = store.page(session_id, page=3, page_size=3)
+    assert total == 7
+    assert [text for _, _, text in first] == ["message 0", "message 1", "message 2"]
+    assert [text for _, _, text in last] == ["message 6"]
+
+
+def test_search_finds_words_across_sessions(store):
+    for source, text in (("one", "the quarterly budget report"), ("two", "lunch plans"),
+                         ("three", "send the budget to finance")):
+        store.append(store.start_session(source), "you", text)
+    store.flush(timeout=2)
+    hits = store.search("budget")
+    assert len(hits) == 2
+    assert all("budget" in snippet for _, _, _, snippet in hits)
+    assert store.search("nonexistentword") == []
+
+
+def test_import_text_file_is_idempotent(store, tmp_path):
+    path = tmp_path / "chat_20240102_030405.txt"
+    path.write_text("you: hello\nassistant: hi there\nsecond line\nyou: bye\n", encoding="utf-8")
+    session_id, count = store.import_text_file(str(path))
+    assert count == 3
+    rows, total = store.page(session_id)
+    assert total == 3
+    assert [(role, text) for _, role, text in rows] == [
+        ("you", "hello"), ("assistant", "hi there\nsecond line"), ("you", "bye")]
+    assert store.import_text_file(str(path)) == (session_id, 0)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS_IMPORT = """
+import sys
+
+class NoTk:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] in ("tkinter", "_tkinter"):
+            raise ImportError("No module named 'tkinter'")
+
+sys.meta_path.insert(0, NoTk())
+import app
+assert app.tk is None
+"""
+
+
+def test_app_imports_without_tkinter():
+    completed = subprocess.run([sys.executable, "-c", HEADLESS_IMPORT], cwd=REPO, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+
+
+@pytest.fixture
+def daemon(isolated):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    daemon = app.AssistantDaemon(max_concurrent=4, max_pending=16)
+
+    def start(*args, **kwargs):
+        return asyncio.run_coroutine_threadsafe(daemon.start(*args, **kwargs), loop).result(timeout=5)
+
+    daemon.start_in_thread = start
+    yield daemon
+    if daemon.server is not None:
+        asyncio.run_coroutine_threadsafe(daemon.close(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_unix_socket_is_private_from_the_start(daemon, tmp_path):
+    socket_path = str(tmp_path / "assistant.sock")
+    old_umask = os.umask(0o022)
+    try:
+        daemon.start_in_thread(socket_path)
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077 == 0
+    assert app.send_prompt("jobs", socket_path)["command"] == "jobs"
+
+
+def test_tcp_clients_need_the_token(daemon, tmp_path):
+    token_path = str(tmp_path / "daemon.token")
+    address = daemon.start_in_thread(port=0, token_path=token_path)
+    port = int(address.rsplit(":", 1)[1])
+    if os.name == "posix":
+        assert stat.S_IMODE(os.stat(token_path).st_mode) == 0o600
+    assert app.send_prompt("jobs", port=port, token_path=token_path)["command"] == "jobs"
+
+    wrong = tmp_path / "wrong.token"
+    wrong.write_text("not-the-token")
+    assert app.send_prompt("jobs", port=port, token_path=str(wrong)) == {"error": "unauthorized", "done": True}
+
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn, conn.makefile("rwb") as stream:
+        stream.write(json.dumps({"prompt": "jobs"}).encode("utf-8") + b"\n")
+        stream.flush()
+        assert json.loads(stream.readline()) == {"error": "unauthorized", "done": True}
+        assert stream.readline() == b""
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_concurrent_clients_are_served_in_parallel(daemon, isolated, tmp_path, monkeypatch):
+    def slow_stream(prompt):
+        time.sleep(0.3)
+        yield "slow reply."
+
+    monkeypatch.setattr(isolated, "stream", slow_stream)
+    socket_path = str(tmp_path / "assistant.sock")
+    daemon.start_in_thread(socket_path)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        replies = list(pool.map(lambda n: app.send_prompt(f"question {n}", socket_path, timeout=10), range(4)))
+    elapsed = time.monotonic() - started
+    assert [reply["command"] for reply in replies] == ["llm"] * 4
+    assert elapsed < 1.0
+    assert daemon.served == 4
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_malformed_requests_get_an_error_and_the_connection_stays_open(daemon, tmp_path):
+    socket_path = str(tmp_path / "assistant.sock")
+    daemon.start_in_thread(socket_path)
+    with socket.socket(socket.AF_UNIX) as conn:
+        conn.settimeout(5)
+        conn.connect(socket_path)
+        with conn.makefile("rwb") as stream:
+            stream.write(b"not json\n" + json.dumps({"id": 7, "prompt": "jobs"}).encode("utf-8") + b"\n")
+            stream.flush()
+            assert "error" in json.loads(stream.readline())
+            messages = []
+            while not messages or not messages[-1].get("done"):
+                messages.append(json.loads(stream.readline()))
+            assert messages[-1]["id"] == 7 and messages[-1]["command"] == "jobs"
@@ -0,0 +1,58 @@
+import os
+import threading
+
+import app
+
+
+def make_tree(root, dirs=20, size=100_000):
+    for d in range(dirs):
+        os.makedirs(root / f"d{d}")
+        (root / f"d{d}" / "data.bin").write_bytes(b"x" * size)
+
+
+def test_cached_rerun_matches_full_scan(tmp_path):
+    tree = tmp_path / "tree"
+    make_tree(tree)
+    cache = app.DiskUsageCache(str(tmp_path / "du.db"))
+    first = app.analyze_disk_usage(str(tree), cache=cache)
+    second = app.analyze_disk_usage(str(tree), cache=cache)
+    assert (second["total"], second["dirs"], second["files"]) == (first["total"], first["dirs"], first["files"])
+    assert second["rescanned"] == 0
+
+
+def test_cancelled_scan_does_not_hide_unvisited_subtrees(tmp_path, monkeypatch):
+    tree = tmp_path / "tree"
+    make_tree(tree)
+    expected = app.analyze_disk_usage(str(tree), cache=None)
+    cache = app.DiskUsageCache(str(tmp_path / "du.db"))
+    cancel = threading.Event()
+    scandir = os.scandir
+    calls = []
+
+    def cancelling_scandir(path):
+        calls.append(path)
+        if len(calls) == 3:
+            cancel.set()
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", cancelling_scandir)
+    partial = app.analyze_disk_usage(str(tree), cancel=cancel, workers=1, cache=cache)
+    monkeypatch.setattr(os, "scandir", scandir)
+    assert partial["cancelled"]
+
+    result = app.analyze_disk_usage(str(tree), cache=cache)
+    assert not result["cancelled"]
+    assert (result["total"], result["dirs"]) == (expected["total"], expected["dirs"])
+
+
+def test_changed_directory_is_rescanned(tmp_path):
+    tree = tmp_path / "tree"
+    make_tree(tree, dirs=3)
+    cache = app.DiskUsageCache(str(tmp_path / "du.db"))
+    before = app.analyze_disk_usage(str(tree), cache=cache)
+    (tree / "d1" / "more.bin").write_bytes(b"y" * 50_000)
+    os.utime(tree / "d1", ns=(0, 1))
+    after = app.analyze_disk_usage(str(tree), cache=cache)
+    assert after["files"] == before["files"] + 1
+    assert after["total"] > before["total"]
+    assert after["rescanned"] == 1
@@ -0,0 +1,20 @@
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("prompt", [
+    "history of the roman empire",
+    "peak performance tips",
+    "chart a course across the atlantic",
+])
+def test_metric_words_without_metric_reach_llm(session, isolated, prompt):
+    assert session.dispatch_prompt(prompt) == "llm"
+    assert "Unknown metric" not in session.output()
+    assert any(prompt in sent for sent in isolated.prompts)
+
+
+@pytest.mark.parametrize("prompt", ["history cpu", "chart memory 6h", "peak ram today", "history disk 30m"])
+def test_metric_queries_route_to_history(session, isolated, prompt):
+    assert session.dispatch_prompt(prompt) == "history"
+    assert isolated.prompts == []
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+import app
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_groups_identical_files_only(tmp_path):
+    data = os.urandom(300_000)
+    a = write(tmp_path / "a", data)
+    b = write(tmp_path / "b", data)
+    # Same size and same first/last blocks, different middle
+    write(tmp_path / "c", data[:150_000] + b"!" + data[150_001:])
+    write(tmp_path / "small", b"tiny")
+    result = app.find_duplicates([str(tmp_path)], cache=None)
+    assert result["groups"] == [(300_000, sorted([a, b]))]
+    assert result["wasted"] == 300_000
+
+
+def test_unreadable_member_does_not_drop_group(tmp_path, monkeypatch):
+    data = os.urandom(300_000)
+    a = write(tmp_path / "a", data)
+    b = write(tmp_path / "b", data)
+    write(tmp_path / "c", data[:150_000] + b"!" + data[150_001:])
+    full_hash = app.full_hash
+
+    def failing_hash(path, *args):
+        if path.endswith(os.sep + "c"):
+            raise PermissionError(path)
+        return full_hash(path, *args)
+
+    monkeypatch.setattr(app, "full_hash", failing_hash)
+    result = app.find_duplicates([str(tmp_path)], cache=None)
+    assert result["groups"] == [(300_000, sorted([a, b]))]
+
+
+def test_hash_cache_is_reused(tmp_path):
+    tree = tmp_path / "tree"
+    tree.mkdir()
+    data = os.urandom(300_000)
+    write(tree / "a", data)
+    write(tree / "b", data)
+    cache = app.HashCache(str(tmp_path / "hashes.db"))
+    first = app.find_duplicates([str(tree)], cache=cache)
+    second = app.find_duplicates([str(tree)], cache=cache)
+    assert second["groups"] == first["groups"]
+    assert second["cached"] == 2
+    assert second["hashed_bytes"] == 0
+
+
+def test_delete_skips_copies_whose_content_changed(tmp_path, monkeypatch):
+    data = os.urandom(10_000)
+    keep = write(tmp_path / "a", data)
+    changed = write(tmp_path / "b", data)
+    same = write(tmp_path / "c", data)
+    groups = app.find_duplicates([str(tmp_path)], cache=None)["groups"]
+    write(tmp_path / "b", data[:-1] + bytes([data[-1] ^ 1]))
+    monkeypatch.setattr(app, "confirm_and_run", lambda desc, action: action())
+    report = app.delete_duplicates(groups)
+    assert os.path.exists(keep)
+    assert os.path.exists(changed)
+    assert not os.path.exists(same)
+    assert "Removed 1 duplicate files" in report
+
+
+def test_filenames_starting_with_dupes_are_searched_not_hashed(session, monkeypatch):
+    searched = []
+    monkeypatch.setattr(session, "run_search", searched.append)
+    monkeypatch.setattr(app, "duplicate_files", lambda *args, **kwargs: pytest.fail("duplicate search started"))
+    assert session.dispatch_prompt("find dupes.txt") == "search"
+    assert session.dispatch_prompt("find duplicates.csv") == "search"
+    assert searched == ["dupes.txt", "duplicates.csv"]
+
+
+def test_duplicate_search_rejects_unknown_options(session, monkeypatch):
+    monkeypatch.setattr(app, "duplicate_files", lambda *args, **kwargs: pytest.fail("duplicate search started"))
+    assert session.dispatch_prompt("find duplicates quickly") == "duplicates"
+    assert "Unknown option: quickly" in session.output()
+
+
+def test_duplicate_search_accepts_size_and_path(session, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "duplicate_files",
+                        lambda roots, **kwargs: calls.append((roots, kwargs["min_size"])) or ("done", []))
+    assert session.dispatch_prompt(f"find duplicates over 1MB in {tmp_path}") == "duplicates"
+    assert calls == [([str(tmp_path)], 1024 * 1024)]
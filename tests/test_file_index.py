@@ -0,0 +1,57 @@
+import os
+
+import app
+
+
+def make_tree(root, dirs=5, files=4):
+    for d in range(dirs):
+        os.makedirs(root / f"d{d}")
+        for f in range(files):
+            (root / f"d{d}" / f"file{f}.txt").write_text("x")
+
+
+def test_full_refresh_indexes_every_file(tmp_path):
+    tree = tmp_path / "tree"
+    make_tree(tree)
+    index = app.FileIndex(str(tmp_path / "index.db"), roots=[str(tree)])
+    index.refresh(str(tree))
+    assert index.covers(str(tree))
+    assert len(index.query("file", str(tree), max_results=100)) == 20
+
+
+def test_interrupted_refresh_resumes_unvisited_dirs(tmp_path):
+    tree = tmp_path / "tree"
+    make_tree(tree)
+    index = app.FileIndex(str(tmp_path / "index.db"), roots=[str(tree)])
+    scan_dir = index._scan_dir
+    scanned = []
+
+    def interrupting_scan(conn, path):
+        scanned.append(path)
+        if len(scanned) == 2:
+            index.stop_event.set()
+        return scan_dir(conn, path)
+
+    index._scan_dir = interrupting_scan
+    index.refresh(str(tree))
+    assert not index.covers(str(tree))
+
+    index.stop_event.clear()
+    index._scan_dir = scan_dir
+    index.refresh(str(tree))
+    assert index.covers(str(tree))
+    assert len(index.query("file", str(tree), max_results=100)) == 20
+
+
+def test_refresh_picks_up_new_and_removed_files(tmp_path):
+    tree = tmp_path / "tree"
+    make_tree(tree, dirs=2, files=2)
+    index = app.FileIndex(str(tmp_path / "index.db"), roots=[str(tree)])
+    index.refresh(str(tree))
+    os.remove(tree / "d0" / "file0.txt")
+    (tree / "d1" / "extra.txt").write_text("x")
+    os.utime(tree / "d0", ns=(0, 1))
+    os.utime(tree / "d1", ns=(0, 1))
+    index.refresh(str(tree))
+    assert index.query("file0", str(tree / "d0")) == []
+    assert len(index.query("extra", str(tree))) == 1
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+
+import pytest
+
+import app
+
+
+def python_cmd(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return app.JobRunner(max_concurrent=2, spill_dir=str(tmp_path / "jobs"))
+
+
+def wait_running(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.process is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.process is not None
+
+
+def test_output_streams_and_job_finishes(runner):
+    lines = []
+    job = runner.submit(python_cmd("print('one'); print('two')"), on_output=lambda job, line: lines.append(line))
+    assert job.wait(10)
+    assert job.status == "finished" and job.returncode == 0
+    assert lines == ["one", "two"]
+
+
+def test_long_output_spills_to_disk(runner):
+    count = app.JOB_BUFFER_LINES + 250
+    job = runner.submit(python_cmd(f"[print(i) for i in range({count})]"))
+    assert job.wait(10)
+    assert len(job.lines) == app.JOB_BUFFER_LINES
+    assert job.spilled == 250 and job.total_lines == count
+    with open(job.spill_path, encoding="utf-8") as f:
+        assert f.read().splitlines() == [str(i) for i in range(250)]
+    assert os.path.dirname(job.spill_path) == runner.spill_dir
+
+
+def test_timeout_kills_the_job(runner):
+    started = time.monotonic()
+    job = runner.submit(python_cmd("import time; time.sleep(30)"), timeout=0.5)
+    assert job.wait(10)
+    assert job.status == "timed out"
+    assert time.monotonic() - started < 10
+    assert "Job timed out." in job.result_text()
+
+
+def test_cancel_stops_a_running_job(runner):
+    job = runner.submit(python_cmd("import time; time.sleep(30)"))
+    wait_running(job)
+    assert runner.cancel(job.id) == f"Cancelling job #{job.id}"
+    assert job.wait(10)
+    assert job.status == "cancelled"
+    assert runner.cancel(job.id) == f"Job #{job.id} already cancelled"
+
+
+def test_queued_job_cancelled_before_it_starts(tmp_path):
+    runner = app.JobRunner(max_concurrent=1, spill_dir=str(tmp_path))
+    blocker = runner.submit(python_cmd("import time; time.sleep(30)"))
+    wait_running(blocker)
+    queued = runner.submit(python_cmd("print('never')"))
+    runner.cancel(queued.id)
+    runner.cancel(blocker.id)
+    assert queued.wait(10) and blocker.wait(10)
+    assert queued.status == "cancelled" and queued.total_lines == 0
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+
+
+def test_stream_failure_before_first_chunk_shows_error(session, isolated, monkeypatch):
+    monkeypatch.setattr(app, "LLM_STREAMING", True)
+    isolated.error = RuntimeError("backend down")
+    written = []
+    monkeypatch.setattr(session, "write", written.append)
+    assert session.dispatch_prompt("what is the weather") == "llm"
+    assert "[LLM error] backend down" in "".join(written)
+
+
+def test_cache_single_flight_shares_one_computation():
+    cache = app.LLMCache(db_path=None)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "shared answer"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get_or_compute, "same  prompt", "m", compute) for _ in range(8)]
+        time.sleep(0.2)
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+    assert results == ["shared answer"] * 8
+    assert len(calls) == 1
+    assert cache.misses == 1 and cache.shared == 7
+
+
+def test_cache_evicts_least_recently_used():
+    cache = app.LLMCache(capacity=2, db_path=None)
+    for prompt in ("a", "b"):
+        cache.get_or_compute(prompt, "m", lambda prompt=prompt: f"answer {prompt}")
+    cache.get_or_compute("a", "m", lambda: pytest.fail("a should be cached"))
+    cache.get_or_compute("c", "m", lambda: "answer c")
+    assert cache.get_or_compute("a", "m", lambda: pytest.fail("a was evicted")) == "answer a"
+    assert cache.get_or_compute("b", "m", lambda: "recomputed b") == "recomputed b"
+
+
+def test_cache_persists_and_skips_errors(tmp_path):
+    db = str(tmp_path / "llm_cache.db")
+    cache = app.LLMCache(db_path=db)
+    cache.get_or_compute("q", "m", lambda: "stored")
+    cache.get_or_compute("bad", "m", lambda: "[LLM error] boom")
+    reopened = app.LLMCache(db_path=db)
+    assert reopened.get_or_compute("Q ", "m", lambda: pytest.fail("not persisted")) == "stored"
+    assert reopened.get_or_compute("bad", "m", lambda: "fresh") == "fresh"
+    assert reopened.disk_hits == 1
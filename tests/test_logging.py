@@ -0,0 +1,37 @@
+import logging
+import os
+import time
+
+import app
+
+
+def record(message="entry"):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, (), None)
+
+
+def test_restarts_do_not_push_back_time_rotation(tmp_path):
+    path = str(tmp_path / "assistant.log")
+    handler = app.RotatingLogHandler(path, interval=3600)
+    deadline = handler.rollover_at
+    handler.emit(record())
+    handler.close()
+
+    restarted = app.RotatingLogHandler(path, interval=3600)
+    restarted.emit(record())
+    assert restarted.rollover_at == deadline
+    restarted.close()
+
+
+def test_rotates_once_the_period_since_last_rotation_elapsed(tmp_path):
+    path = str(tmp_path / "assistant.log")
+    handler = app.RotatingLogHandler(path, interval=3600)
+    handler.emit(record("old"))
+    handler.close()
+    with open(path + ".rotated", "w") as f:
+        f.write(repr(time.time() - 7200))
+
+    restarted = app.RotatingLogHandler(path, interval=3600)
+    restarted.emit(record("new"))
+    restarted.close()
+    assert os.path.exists(path + ".1")
+    assert restarted.rollover_at > time.time() + 3500
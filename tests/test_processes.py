@@ -0,0 +1,27 @@
+import threading
+import time
+
+import app
+
+
+def test_priming_sleep_does_not_hold_the_table_lock(monkeypatch):
+    monkeypatch.setattr(app, "PROCESS_PRIME_INTERVAL", 0.5)
+    table = app.ProcessTable()
+    worker = threading.Thread(target=table.top, args=(5,))
+    worker.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    rows = table.current(max_age=60)
+    waited = time.monotonic() - started
+    worker.join()
+    assert rows
+    assert waited < 0.3
+
+
+def test_top_reports_cpu_deltas_after_priming(monkeypatch):
+    monkeypatch.setattr(app, "PROCESS_PRIME_INTERVAL", 0.05)
+    table = app.ProcessTable()
+    top, started, exited, total = table.top(5)
+    assert 0 < len(top) <= 5 and total >= len(top)
+    assert any(entry["cpu_percent"] is not None for entry in top)
+    assert started == [] and exited == []
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import app
+
+
+def test_interactive_requests_jump_ahead_of_background():
+    scheduler = app.LLMScheduler(requests_per_minute=1e9, burst=1e6, workers=1)
+    release = threading.Event()
+    order = []
+    blocker = scheduler.submit(lambda: release.wait(5))
+    time.sleep(0.1)
+    futures = [scheduler.submit(lambda n=n: order.append(f"background {n}"), app.PRIORITY_BACKGROUND)
+               for n in range(3)]
+    futures.append(scheduler.submit(lambda: order.append("interactive"), app.PRIORITY_INTERACTIVE))
+    release.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+    assert order == ["interactive", "background 0", "background 1", "background 2"]
+
+
+def test_token_bucket_allows_a_burst_then_waits_for_refill():
+    bucket = app.TokenBucket(rate=10.0, capacity=2)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    started = time.monotonic()
+    waited = bucket.acquire()
+    assert waited > 0.05
+    assert time.monotonic() - started >= 0.05
+
+
+def test_token_bucket_pause_blocks_until_it_expires():
+    bucket = app.TokenBucket(rate=1000.0, capacity=5)
+    bucket.pause(0.2)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_rate_limited_calls_are_retried():
+    scheduler = app.LLMScheduler(requests_per_minute=1e9, burst=1e6, workers=1, max_attempts=3, base_delay=0.01)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("429 Resource exhausted")
+        return "ok"
+
+    assert scheduler.submit(flaky).result(timeout=5) == "ok"
+    assert len(attempts) == 3 and scheduler.retries == 2
@@ -0,0 +1,7 @@
+import app
+
+
+def test_speech_chunks_break_at_commas():
+    chunks = app.chunk_for_speech("alpha beta, gamma delta epsilon zeta eta theta", 30)
+    assert chunks[0] == "alpha beta,"
+    assert all(len(chunk) <= 30 for chunk in chunks)